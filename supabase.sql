@@ -27,6 +27,9 @@ CREATE TABLE IF NOT EXISTS chunks (
 
 CREATE INDEX IF NOT EXISTS idx_chunks_document ON chunks(document_id);
 CREATE INDEX IF NOT EXISTS idx_chunks_hash ON chunks(hash);
+CREATE INDEX IF NOT EXISTS idx_chunks_text_tsv ON chunks USING gin (to_tsvector('english'::regconfig, text));
+-- Metadata filters (meta_filter jsonpath in the match_* functions) use meta @? path.
+CREATE INDEX IF NOT EXISTS idx_chunks_meta_gin ON chunks USING gin (meta jsonb_path_ops);
 GRANT ALL ON TABLE chunks TO service_role;
 ALTER TABLE chunks DISABLE ROW LEVEL SECURITY;
 
@@ -63,7 +66,17 @@ CREATE INDEX IF NOT EXISTS idx_snapshots_created ON index_snapshots(created_at D
 GRANT ALL ON TABLE index_snapshots TO service_role;
 ALTER TABLE index_snapshots DISABLE ROW LEVEL SECURITY;
 
--- Embeddings with model metadata (1536 for OpenAI, 768 for many others)
+-- Retrieval searches one (embedding_model, snapshot) at a time: the active one.
+ALTER TABLE index_snapshots ADD COLUMN IF NOT EXISTS is_active BOOLEAN NOT NULL DEFAULT false;
+ALTER TABLE index_snapshots ADD COLUMN IF NOT EXISTS promoted_at TIMESTAMPTZ;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_snapshots_active ON index_snapshots(embedding_model) WHERE is_active;
+
+-- Embeddings with model metadata. The column width must equal the API's
+-- EMBEDDING_DIMENSIONS (1536 by default; text-embedding-3-* can be asked for
+-- 256/512/1024). To shrink an existing table, truncate in place:
+--   ALTER TABLE embeddings
+--     ALTER COLUMN vector TYPE vector(512) USING l2_normalize(subvector(vector, 1, 512))::vector(512),
+--     ALTER COLUMN vector_half TYPE halfvec(512) USING l2_normalize(subvector(vector, 1, 512))::halfvec(512);
 CREATE TABLE IF NOT EXISTS embeddings (
   id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
   chunk_id BIGINT NOT NULL REFERENCES chunks(id) ON DELETE CASCADE,
@@ -77,10 +90,81 @@ CREATE TABLE IF NOT EXISTS embeddings (
 CREATE INDEX IF NOT EXISTS idx_embeddings_chunk ON embeddings(chunk_id);
 CREATE INDEX IF NOT EXISTS idx_embeddings_model ON embeddings(model_name);
 CREATE INDEX IF NOT EXISTS idx_embeddings_snapshot ON embeddings(snapshot_id);
+-- One vector per chunk and scope; NULLS NOT DISTINCT (Postgres 15+) so
+-- unsnapshotted rows cannot repeat either.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_embeddings_chunk_scope
+  ON embeddings(chunk_id, model_name, snapshot_id) NULLS NOT DISTINCT;
 GRANT ALL ON TABLE embeddings TO service_role;
 ALTER TABLE embeddings DISABLE ROW LEVEL SECURITY;
--- Add vector index after you have some data (needs ~1000 rows for good performance)
--- CREATE INDEX idx_embeddings_vector ON embeddings USING hnsw (vector vector_cosine_ops);
+-- HNSW needs no training data, so it can be created up front. On a populated
+-- table run it outside a transaction as CREATE INDEX CONCURRENTLY instead.
+-- float32 mode only; halfvec mode swaps it for idx_embeddings_vector_half below.
+CREATE INDEX IF NOT EXISTS idx_embeddings_vector ON embeddings
+  USING hnsw (vector vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+
+-- Half-precision copy of vector for ANN scans (pgvector >= 0.7), as wide as
+-- vector (i.e. EMBEDDING_DIMENSIONS); match_chunks_tuned rescores its shortlist
+-- on vector.
+DO $$
+DECLARE
+  dim integer;
+BEGIN
+  SELECT atttypmod INTO dim FROM pg_attribute
+  WHERE attrelid = 'embeddings'::regclass AND attname = 'vector' AND NOT attisdropped;
+  EXECUTE format('ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS vector_half halfvec(%s)', dim);
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION embeddings_sync_vector_half() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  NEW.vector_half := NEW.vector::halfvec;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_embeddings_vector_half ON embeddings;
+CREATE TRIGGER trg_embeddings_vector_half
+  BEFORE INSERT OR UPDATE OF vector ON embeddings
+  FOR EACH ROW EXECUTE FUNCTION embeddings_sync_vector_half();
+
+-- Backfill existing rows; on a large table repeat with a LIMITed id subquery.
+UPDATE embeddings SET vector_half = vector::halfvec WHERE vector_half IS NULL;
+
+-- EMBEDDING_STORAGE=halfvec: replace the float32 graph with a halfvec one, which
+-- is where the memory saving comes from. Rescoring reads vector from the heap, so
+-- keeping both graphs would only add size and write cost:
+--   CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_embeddings_vector_half ON embeddings
+--     USING hnsw (vector_half halfvec_cosine_ops) WITH (m = 16, ef_construction = 64);
+--   DROP INDEX CONCURRENTLY IF EXISTS idx_embeddings_vector;
+
+-- One partial HNSW index per snapshot, so a scoped search walks a graph of a
+-- single vector space. Build it before promoting (CONCURRENTLY cannot run inside
+-- a function or transaction); use vector_half/halfvec_cosine_ops in halfvec mode:
+--   CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_embeddings_vector_snap_<short id>
+--     ON embeddings USING hnsw (vector vector_cosine_ops) WITH (m = 16, ef_construction = 64)
+--     WHERE snapshot_id = '<snapshot uuid>';
+
+-- Switch the active snapshot for its model in one transaction: searches see the
+-- old snapshot or the new one, never neither.
+CREATE OR REPLACE FUNCTION promote_index_snapshot(target_snapshot uuid)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  target_model TEXT;
+BEGIN
+  SELECT embedding_model INTO target_model FROM index_snapshots WHERE id = target_snapshot FOR UPDATE;
+  IF target_model IS NULL THEN
+    RAISE EXCEPTION 'index snapshot % does not exist', target_snapshot;
+  END IF;
+  UPDATE index_snapshots SET is_active = false
+  WHERE embedding_model = target_model AND is_active AND id <> target_snapshot;
+  UPDATE index_snapshots SET is_active = true, promoted_at = NOW() WHERE id = target_snapshot;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION promote_index_snapshot(uuid) TO service_role;
 
 -- Competitive features per deal
 CREATE TABLE IF NOT EXISTS comp_features (
@@ -107,14 +191,23 @@ CREATE TABLE IF NOT EXISTS evidence_packs (
 CREATE INDEX IF NOT EXISTS idx_evidence_snapshot ON evidence_packs(snapshot_id);
 CREATE INDEX IF NOT EXISTS idx_evidence_deal ON evidence_packs(deal_id);
 CREATE INDEX IF NOT EXISTS idx_evidence_created ON evidence_packs(created_at DESC);
+-- Cache key + evidence version (chunk count / max chunk id at save time)
+ALTER TABLE evidence_packs ADD COLUMN IF NOT EXISTS query_hash TEXT;
+ALTER TABLE evidence_packs ADD COLUMN IF NOT EXISTS chunk_count INTEGER;
+ALTER TABLE evidence_packs ADD COLUMN IF NOT EXISTS max_chunk_id BIGINT;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_evidence_key ON evidence_packs(deal_id, snapshot_id, query_hash);
 GRANT ALL ON TABLE evidence_packs TO service_role;
 ALTER TABLE evidence_packs DISABLE ROW LEVEL SECURITY;
 
--- Vector search RPC used by the API (match top-k chunks)
+-- Vector search RPC used by the API (match top-k chunks).
+-- query_embedding is an unsized vector so the functions follow the column width.
+-- meta_filter is a jsonpath predicate over chunks.meta, e.g. '$ ? (@."sector" == "SaaS")'.
+DROP FUNCTION IF EXISTS match_chunks(vector, integer, bigint);
 CREATE OR REPLACE FUNCTION match_chunks(
-  query_embedding vector(1536),
+  query_embedding vector,
   match_count integer DEFAULT 5,
-  target_deal_id bigint DEFAULT NULL
+  target_deal_id bigint DEFAULT NULL,
+  meta_filter jsonpath DEFAULT NULL
 )
 RETURNS TABLE (
   chunk_id BIGINT,
@@ -138,13 +231,14 @@ BEGIN
   FROM embeddings e
   JOIN chunks c ON c.id = e.chunk_id
   JOIN documents d ON d.id = c.document_id
-  WHERE target_deal_id IS NULL OR d.deal_id = target_deal_id
+  WHERE (target_deal_id IS NULL OR d.deal_id = target_deal_id)
+    AND (meta_filter IS NULL OR c.meta @? meta_filter)
   ORDER BY e.vector <=> query_embedding
   LIMIT match_count;
 END;
 $$;
 
-GRANT EXECUTE ON FUNCTION match_chunks(vector, integer, bigint) TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION match_chunks(vector, integer, bigint, jsonpath) TO anon, authenticated, service_role;
 
 
 
@@ -292,3 +386,154 @@ SELECT * FROM pipeline_runs WHERE id = '...'
 SELECT * FROM evidence_packs WHERE deal_id = '...' ORDER BY created_at DESC LIMIT 1
 
 SELECT * FROM lineage_events WHERE analysis_id = ...
+
+-- match_chunks with per-call ANN knobs. set_config(..., true) is transaction-local,
+-- so the settings only apply to this RPC call. NULL leaves the server default.
+-- With rescore_factor set, the ANN scan runs on vector_half for
+-- match_count * rescore_factor rows, which are rescored on the full vector.
+-- target_model / target_snapshot scope the search to one vector space; given
+-- only a model, its active snapshot is used, or its unsnapshotted rows while
+-- none has been promoted. iterative_scan
+-- (pgvector >= 0.8) keeps the HNSW scan going while filters reject rows.
+-- return_vectors fills the embedding column so the caller can run MMR on it.
+DROP FUNCTION IF EXISTS match_chunks_tuned(vector, integer, bigint, integer, integer);
+DROP FUNCTION IF EXISTS match_chunks_tuned(vector, integer, bigint, integer, integer, integer);
+DROP FUNCTION IF EXISTS match_chunks_tuned(vector, integer, bigint, integer, integer, integer, text, uuid);
+DROP FUNCTION IF EXISTS match_chunks_tuned(vector, integer, bigint, integer, integer, integer, text, uuid, jsonpath, text);
+CREATE OR REPLACE FUNCTION match_chunks_tuned(
+  query_embedding vector,
+  match_count integer DEFAULT 5,
+  target_deal_id bigint DEFAULT NULL,
+  ef_search integer DEFAULT NULL,
+  ivfflat_probes integer DEFAULT NULL,
+  rescore_factor integer DEFAULT NULL,
+  target_model text DEFAULT NULL,
+  target_snapshot uuid DEFAULT NULL,
+  meta_filter jsonpath DEFAULT NULL,
+  iterative_scan text DEFAULT NULL,
+  return_vectors boolean DEFAULT false
+)
+RETURNS TABLE (
+  chunk_id BIGINT,
+  document_id BIGINT,
+  source_name TEXT,
+  text TEXT,
+  meta JSONB,
+  similarity FLOAT,
+  embedding vector
+)
+LANGUAGE plpgsql
+-- Plan every call with its actual arguments; a generic plan cannot match the
+-- snapshot's partial index predicate.
+SET plan_cache_mode = force_custom_plan
+AS $$
+DECLARE
+  scope_snapshot uuid := target_snapshot;
+BEGIN
+  IF scope_snapshot IS NULL AND target_model IS NOT NULL THEN
+    SELECT id INTO scope_snapshot FROM index_snapshots WHERE embedding_model = target_model AND is_active;
+  END IF;
+  IF ef_search IS NOT NULL THEN
+    PERFORM set_config('hnsw.ef_search', ef_search::text, true);
+  END IF;
+  IF ivfflat_probes IS NOT NULL THEN
+    PERFORM set_config('ivfflat.probes', ivfflat_probes::text, true);
+  END IF;
+  IF iterative_scan IS NOT NULL THEN
+    PERFORM set_config('hnsw.iterative_scan', iterative_scan, true);
+  END IF;
+
+  IF rescore_factor IS NOT NULL THEN
+    RETURN QUERY
+    WITH shortlist AS (
+      SELECT e.chunk_id, e.vector
+      FROM embeddings e
+      JOIN chunks c ON c.id = e.chunk_id
+      JOIN documents d ON d.id = c.document_id
+      WHERE (target_deal_id IS NULL OR d.deal_id = target_deal_id)
+        AND (target_model IS NULL OR e.model_name = target_model)
+        AND (target_model IS NULL OR e.snapshot_id = scope_snapshot OR (scope_snapshot IS NULL AND e.snapshot_id IS NULL))
+        AND (meta_filter IS NULL OR c.meta @? meta_filter)
+      ORDER BY e.vector_half <=> query_embedding::halfvec
+      LIMIT match_count * rescore_factor
+    )
+    SELECT
+      c.id,
+      c.document_id,
+      d.source_name,
+      c.text,
+      c.meta,
+      1 - (s.vector <=> query_embedding) AS similarity,
+      CASE WHEN return_vectors THEN s.vector END AS embedding
+    FROM shortlist s
+    JOIN chunks c ON c.id = s.chunk_id
+    JOIN documents d ON d.id = c.document_id
+    ORDER BY s.vector <=> query_embedding
+    LIMIT match_count;
+    RETURN;
+  END IF;
+
+  RETURN QUERY
+  SELECT
+    c.id,
+    c.document_id,
+    d.source_name,
+    c.text,
+    c.meta,
+    1 - (e.vector <=> query_embedding) AS similarity,
+    CASE WHEN return_vectors THEN e.vector END AS embedding
+  FROM embeddings e
+  JOIN chunks c ON c.id = e.chunk_id
+  JOIN documents d ON d.id = c.document_id
+  WHERE (target_deal_id IS NULL OR d.deal_id = target_deal_id)
+    AND (target_model IS NULL OR e.model_name = target_model)
+    AND (target_model IS NULL OR e.snapshot_id = scope_snapshot OR (scope_snapshot IS NULL AND e.snapshot_id IS NULL))
+    AND (meta_filter IS NULL OR c.meta @? meta_filter)
+  ORDER BY e.vector <=> query_embedding
+  LIMIT match_count;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION match_chunks_tuned(vector, integer, bigint, integer, integer, integer, text, uuid, jsonpath, text, boolean) TO anon, authenticated, service_role;
+
+-- Full-text ranking over chunks.text for hybrid / lexical-only retrieval.
+-- lexical_query is a to_tsquery() string built by the API (terms OR-joined).
+DROP FUNCTION IF EXISTS match_chunks_lexical(text, integer, bigint);
+CREATE OR REPLACE FUNCTION match_chunks_lexical(
+  lexical_query text,
+  match_count integer DEFAULT 5,
+  target_deal_id bigint DEFAULT NULL,
+  meta_filter jsonpath DEFAULT NULL
+)
+RETURNS TABLE (
+  chunk_id BIGINT,
+  document_id BIGINT,
+  source_name TEXT,
+  text TEXT,
+  meta JSONB,
+  rank FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  q tsquery := to_tsquery('english'::regconfig, lexical_query);
+BEGIN
+  RETURN QUERY
+  SELECT
+    c.id,
+    c.document_id,
+    d.source_name,
+    c.text,
+    c.meta,
+    ts_rank_cd(to_tsvector('english'::regconfig, c.text), q)::float AS rank
+  FROM chunks c
+  JOIN documents d ON d.id = c.document_id
+  WHERE to_tsvector('english'::regconfig, c.text) @@ q
+    AND (target_deal_id IS NULL OR d.deal_id = target_deal_id)
+    AND (meta_filter IS NULL OR c.meta @? meta_filter)
+  ORDER BY rank DESC
+  LIMIT match_count;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION match_chunks_lexical(text, integer, bigint, jsonpath) TO anon, authenticated, service_role;
@@ -2,6 +2,7 @@ from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessi
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy import text
 from sqlalchemy.engine import make_url
+from .integrations.vector_codec import register_vector_codecs
 from .settings import settings
 
 
@@ -26,6 +27,7 @@ else:
     )
 
 engine: AsyncEngine = create_async_engine(settings.database_url, **engine_kwargs)
+register_vector_codecs(engine)
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
 
 
@@ -39,3 +41,5 @@ async def init_db():
     async with engine.begin() as conn:
         await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
         await conn.execute(text("SELECT 1"))
+    # Connections opened before the extension existed have no pgvector codecs.
+    await engine.dispose()
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import importlib.util
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+import structlog
+
+from app.settings import settings
+
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class UpstreamConfig:
+    """Pool sizing for one upstream; timeouts stay with the calling module."""
+
+    max_connections: int
+    max_keepalive_connections: int
+
+
+UPSTREAMS: dict[str, UpstreamConfig] = {
+    "openai": UpstreamConfig(max_connections=50, max_keepalive_connections=20),
+    "deepseek": UpstreamConfig(max_connections=20, max_keepalive_connections=10),
+    "cohere": UpstreamConfig(max_connections=20, max_keepalive_connections=10),
+    "bge": UpstreamConfig(max_connections=10, max_keepalive_connections=5),
+    "supabase": UpstreamConfig(max_connections=50, max_keepalive_connections=20),
+}
+
+
+class HTTPClientRegistry:
+    """Process-wide registry holding one long-lived AsyncClient per upstream.
+
+    Clients are created lazily so scripts and tests work without the FastAPI
+    lifespan; the app opens them eagerly on startup and closes them on shutdown.
+    """
+
+    def __init__(self) -> None:
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._loops: dict[str, asyncio.AbstractEventLoop] = {}
+        self._requests: Counter[str] = Counter()
+        self._responses: dict[str, Counter[str]] = {}
+        self._closing: set[asyncio.Task] = set()
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        if name not in UPSTREAMS:
+            raise KeyError(f"Unknown upstream: {name}")
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(name)
+        # A client is bound to the loop that opened its connections; rebuild when
+        # the loop changes (e.g. successive asyncio.run calls in scripts).
+        if client is None or client.is_closed or self._loops.get(name) is not loop:
+            if client is not None and not client.is_closed:
+                self._retire(name, client, self._loops.get(name))
+            client = self._build(name)
+            self._clients[name] = client
+            self._loops[name] = loop
+        return client
+
+    def open(self) -> None:
+        for name in UPSTREAMS:
+            self.get(name)
+        logger.info("http_clients_opened", upstreams=sorted(self._clients), http2=_http2_enabled())
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.items())
+        self._clients.clear()
+        self._loops.clear()
+        for name, client in clients:
+            await self._close(name, client)
+        logger.info("http_clients_closed", upstreams=[name for name, _ in clients])
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        result: dict[str, dict[str, Any]] = {}
+        for name in UPSTREAMS:
+            limits = _limits_for(name)
+            entry: dict[str, Any] = {
+                "open": name in self._clients and not self._clients[name].is_closed,
+                "max_connections": limits.max_connections,
+                "max_keepalive_connections": limits.max_keepalive_connections,
+                "requests": self._requests.get(name, 0),
+                "responses": dict(self._responses.get(name, {})),
+            }
+            entry.update(_pool_snapshot(self._clients.get(name)))
+            result[name] = entry
+        return result
+
+    def _retire(self, name: str, client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop | None) -> None:
+        """Close a client replaced after a loop change without blocking ``get``.
+
+        Its connections belong to the old loop, so it is closed there while that
+        loop still runs (another thread); otherwise on the current loop.
+        """
+        if loop is not None and loop.is_running() and loop is not asyncio.get_running_loop():
+            asyncio.run_coroutine_threadsafe(self._close(name, client), loop)
+            return
+        task = asyncio.get_running_loop().create_task(self._close(name, client))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, name: str, client: httpx.AsyncClient) -> None:
+        try:
+            await client.aclose()
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("http_client_close_failed", upstream=name, error=str(exc))
+
+    def _build(self, name: str) -> httpx.AsyncClient:
+        limits = _limits_for(name)
+        self._responses.setdefault(name, Counter())
+
+        async def on_request(_request: httpx.Request) -> None:
+            self._requests[name] += 1
+
+        async def on_response(response: httpx.Response) -> None:
+            self._responses[name][f"{response.status_code // 100}xx"] += 1
+
+        return httpx.AsyncClient(
+            limits=limits,
+            http2=_http2_enabled(),
+            event_hooks={"request": [on_request], "response": [on_response]},
+        )
+
+
+def _limits_for(name: str) -> httpx.Limits:
+    config = UPSTREAMS[name]
+    max_connections = settings.http_upstream_max_connections.get(name, config.max_connections)
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=min(config.max_keepalive_connections, max_connections),
+        keepalive_expiry=settings.http_keepalive_expiry_seconds,
+    )
+
+
+def _http2_enabled() -> bool:
+    return settings.http2_enabled and _h2_installed()
+
+
+@functools.cache
+def _h2_installed() -> bool:
+    # Cached, so the warning is logged once rather than for every client built.
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("http2_unavailable", reason="h2 package not installed")
+        return False
+    return True
+
+
+def _pool_snapshot(client: httpx.AsyncClient | None) -> dict[str, int]:
+    # httpx does not expose pool state publicly; read httpcore's pool defensively.
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []) or [])
+    idle = sum(1 for conn in connections if _safe_call(conn, "is_idle"))
+    return {
+        "connections": len(connections),
+        "idle_connections": idle,
+        "active_connections": len(connections) - idle,
+    }
+
+
+def _safe_call(obj: Any, method: str) -> bool:
+    try:
+        return bool(getattr(obj, method)())
+    except Exception:  # noqa: BLE001
+        return False
+
+
+http_clients = HTTPClientRegistry()
+
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    return http_clients.get(name)
@@ -1,18 +1,20 @@
 from __future__ import annotations
 
 import json
+from functools import lru_cache
 from typing import Iterable, Mapping, Sequence
 
 import httpx
+import numpy as np
 import structlog
 
+from app.integrations.http_clients import get_http_client
 from app.settings import settings
 
 
 logger = structlog.get_logger(__name__)
 
 HTTP_TIMEOUT = httpx.Timeout(connect=3.0, read=25.0, write=10.0, pool=3.0)
-HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
 
 
 def get_supabase_client() -> "SupabaseClient | None":
@@ -46,28 +48,29 @@ class SupabaseClient:
         if not rows:
             return
 
-        async with httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS) as client:
-            for start in range(0, len(rows), chunk_size):
-                batch = rows[start : start + chunk_size]
-                resp = await client.post(
-                    f"{self.base_url}/rest/v1/{table}",
-                    params={"on_conflict": on_conflict},
-                    headers={
-                        **self._headers,
-                        "Prefer": "resolution=merge-duplicates,return=representation",
-                    },
-                    content=json.dumps(batch),
+        client = get_http_client("supabase")
+        for start in range(0, len(rows), chunk_size):
+            batch = rows[start : start + chunk_size]
+            resp = await client.post(
+                f"{self.base_url}/rest/v1/{table}",
+                params={"on_conflict": on_conflict},
+                headers={
+                    **self._headers,
+                    "Prefer": "resolution=merge-duplicates,return=representation",
+                },
+                content=json.dumps(batch),
+                timeout=HTTP_TIMEOUT,
+            )
+            try:
+                resp.raise_for_status()
+            except httpx.HTTPStatusError as exc:
+                logger.error(
+                    "supabase_upsert_failed",
+                    table=table,
+                    status=exc.response.status_code,
+                    body=exc.response.text,
                 )
-                try:
-                    resp.raise_for_status()
-                except httpx.HTTPStatusError as exc:
-                    logger.error(
-                        "supabase_upsert_failed",
-                        table=table,
-                        status=exc.response.status_code,
-                        body=exc.response.text,
-                    )
-                    raise
+                raise
 
     async def call_function(
         self,
@@ -75,13 +78,14 @@ class SupabaseClient:
         *,
         payload: Mapping[str, object],
     ) -> list[dict[str, object]]:
-        async with httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS) as client:
-            resp = await client.post(
-                f"{self.base_url}/rest/v1/rpc/{name}",
-                headers=self._headers,
-                content=json.dumps(payload),
-            )
-            resp.raise_for_status()
+        client = get_http_client("supabase")
+        resp = await client.post(
+            f"{self.base_url}/rest/v1/rpc/{name}",
+            headers=self._headers,
+            content=json.dumps(payload),
+            timeout=HTTP_TIMEOUT,
+        )
+        resp.raise_for_status()
 
         data = resp.json()
         if isinstance(data, list):
@@ -92,9 +96,26 @@ class SupabaseClient:
 
 
 def vector_to_pg(values: Iterable[float]) -> str:
-    # pgvector expects a string literal like "[0.1,0.2]"
-    return "[" + ",".join(_format_float(v) for v in values) + "]"
+    """Format a vector as the pgvector text literal ``"[0.1,0.2]"``.
+
+    pgvector stores float32, and nine significant digits round-trip any float32
+    exactly, so longer representations only add bytes. The whole vector goes
+    through a single ``%`` format call rather than one format per element.
+    """
+    if isinstance(values, np.ndarray):
+        values = values.tolist()
+    elif not isinstance(values, (list, tuple)):
+        values = list(values)
+    return "[" + _vector_format(len(values)) % tuple(values) + "]"
+
+
+@lru_cache(maxsize=8)
+def _vector_format(dim: int) -> str:
+    return ",".join(["%.9g"] * dim)
 
 
-def _format_float(value: float) -> str:
-    return f"{value:.12g}"
+def pg_to_vector(value: str | Sequence[float]) -> np.ndarray:
+    """Parse a pgvector value from PostgREST (its ``"[0.1,0.2]"`` text form) as float32."""
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
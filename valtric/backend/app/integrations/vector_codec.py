@@ -0,0 +1,83 @@
+"""Binary pgvector transport for asyncpg.
+
+pgvector's SQLAlchemy types serialise every bind value to a ``"[0.1,0.2,...]"``
+text literal. On asyncpg we register pgvector's binary codecs per connection and
+bind vectors as float32 arrays instead: 4 bytes per dimension and no float
+formatting or parsing on either side. Other drivers (and SQLite in tests) keep
+the text path.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+import structlog
+from pgvector.asyncpg import register_vector
+from pgvector.sqlalchemy import HALFVEC as _HALFVEC
+from pgvector.sqlalchemy import Vector as _Vector
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.settings import settings
+
+
+logger = structlog.get_logger(__name__)
+
+
+def _binary_enabled(dialect: Any) -> bool:
+    return settings.pg_binary_vectors and dialect.driver == "asyncpg"
+
+
+def _binary_bind_processor(dim: int | None):
+    def process(value: Any) -> Any:
+        if value is None:
+            return None
+        array = np.asarray(value, dtype=np.float32)
+        if array.ndim != 1:
+            raise ValueError("expected a 1-d vector")
+        if dim is not None and array.shape[0] != dim:
+            raise ValueError(f"expected {dim} dimensions, not {array.shape[0]}")
+        return array
+
+    return process
+
+
+class Vector(_Vector):
+    """``pgvector.sqlalchemy.Vector`` that binds float32 arrays on asyncpg."""
+
+    cache_ok = True
+    # An explicit ::vector cast lets asyncpg pick the binary codec even where the
+    # server cannot infer the parameter type (e.g. inside a VALUES list).
+    render_bind_cast = True
+
+    def bind_processor(self, dialect):
+        if _binary_enabled(dialect):
+            return _binary_bind_processor(self.dim)
+        return super().bind_processor(dialect)
+
+
+class HALFVEC(_HALFVEC):
+    """``pgvector.sqlalchemy.HALFVEC`` that binds float32 arrays on asyncpg."""
+
+    cache_ok = True
+    render_bind_cast = True
+
+    def bind_processor(self, dialect):
+        if _binary_enabled(dialect):
+            return _binary_bind_processor(self.dim)
+        return super().bind_processor(dialect)
+
+
+def register_vector_codecs(engine: AsyncEngine) -> None:
+    """Install pgvector's binary codecs on every new asyncpg connection."""
+    if not _binary_enabled(engine.dialect):
+        return
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record) -> None:  # noqa: ARG001
+        try:
+            dbapi_connection.run_async(register_vector)
+        except ValueError as exc:
+            # The vector extension is not installed yet (e.g. before init_db runs).
+            logger.warning("pgvector_codec_registration_failed", error=str(exc))
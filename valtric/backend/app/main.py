@@ -5,6 +5,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from app.settings import settings
 from app.db import init_db
+from app.integrations.http_clients import http_clients
 from app.routers import health as health_router
 from app.routers import deals as deals_router
 from app.routers import analyze as analyze_router
@@ -15,7 +16,11 @@ from app.routers import foundry as foundry_router
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
-    yield
+    http_clients.open()
+    try:
+        yield
+    finally:
+        await http_clients.aclose()
 
 
 app = FastAPI(title="Valtric Consulting AI", lifespan=lifespan)
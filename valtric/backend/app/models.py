@@ -1,9 +1,11 @@
 from typing import List, Optional
 
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, Float, Text, JSON, ForeignKey, TIMESTAMP, func
-from pgvector.sqlalchemy import Vector
+from sqlalchemy import String, Integer, Float, Text, JSON, Boolean, ForeignKey, Index, TIMESTAMP, UniqueConstraint, func, text
+from sqlalchemy.dialects.postgresql import JSONB
 from .db import Base
+from .integrations.vector_codec import HALFVEC, Vector
+from .settings import settings
 
 
 class Deal(Base):
@@ -34,15 +36,54 @@ class Chunk(Base):
     document_id: Mapped[int] = mapped_column(ForeignKey("documents.id", ondelete="CASCADE"), index=True)
     ord: Mapped[int] = mapped_column(Integer)
     text: Mapped[str] = mapped_column(Text)
-    meta: Mapped[dict] = mapped_column(JSON, default={})
+    # JSONB on Postgres so metadata filters can use the GIN index on meta.
+    meta: Mapped[dict] = mapped_column(JSON().with_variant(JSONB(), "postgresql"), default={})
     hash: Mapped[str] = mapped_column(String(64), index=True)
 
 
 class Embedding(Base):
     __tablename__ = "embeddings"
+    __table_args__ = (
+        # One vector per chunk and scope. A plain unique constraint would treat
+        # NULL snapshot ids as distinct and admit duplicate unsnapshotted rows.
+        Index(
+            "uq_embeddings_chunk_scope",
+            "chunk_id",
+            "model_name",
+            func.coalesce(text("snapshot_id"), ""),
+            unique=True,
+        ),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True)
-    chunk_id: Mapped[int] = mapped_column(ForeignKey("chunks.id", ondelete="CASCADE"), unique=True)
-    vector: Mapped[list[float]] = mapped_column(Vector(1536))
+    chunk_id: Mapped[int] = mapped_column(ForeignKey("chunks.id", ondelete="CASCADE"))
+    vector: Mapped[list[float]] = mapped_column(Vector(settings.embedding_dimensions))
+    model_name: Mapped[str] = mapped_column(String(100))
+    # Re-embedding runs write under a new snapshot; retrieval reads the active one only.
+    snapshot_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    # Maintained by a trigger from ``vector``; ANN scans use it when EMBEDDING_STORAGE=halfvec.
+    vector_half: Mapped[Optional[list[float]]] = mapped_column(HALFVEC(settings.embedding_dimensions), nullable=True)
+
+
+class IndexSnapshot(Base):
+    __tablename__ = "index_snapshots"
+    __table_args__ = (
+        # At most one active snapshot per embedding model.
+        Index(
+            "uq_index_snapshots_active",
+            "embedding_model",
+            unique=True,
+            postgresql_where=text("is_active"),
+            sqlite_where=text("is_active"),
+        ),
+    )
+
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    embedding_model: Mapped[str] = mapped_column(String(100))
+    is_active: Mapped[bool] = mapped_column(Boolean, default=False, server_default=text("false"))
+    notes: Mapped[str | None] = mapped_column(Text)
+    created_at: Mapped[str] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now())
+    promoted_at: Mapped[str | None] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
 
 
 class Analysis(Base):
@@ -64,6 +105,20 @@ class Lineage(Base):
     rank: Mapped[int]
 
 
+class EvidencePack(Base):
+    __tablename__ = "evidence_packs"
+    __table_args__ = (UniqueConstraint("deal_id", "snapshot_id", "query_hash", name="uq_evidence_packs_key"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    deal_id: Mapped[int] = mapped_column(ForeignKey("deals.id", ondelete="CASCADE"), index=True)
+    snapshot_id: Mapped[str] = mapped_column(String(64), default="default")
+    query_hash: Mapped[str] = mapped_column(String(64))
+    chunk_count: Mapped[int] = mapped_column(Integer)
+    max_chunk_id: Mapped[int] = mapped_column(Integer)
+    top_k: Mapped[list] = mapped_column(JSON)
+    created_at: Mapped[str] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), index=True)
+
+
 class Conversation(Base):
     __tablename__ = "conversations"
 
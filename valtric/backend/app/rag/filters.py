@@ -0,0 +1,48 @@
+"""Structured filters over ``chunks.meta``, compiled to a SQL/JSON path predicate."""
+
+from __future__ import annotations
+
+import json
+import math
+import re
+from typing import Any, Mapping
+
+
+_KEY = re.compile(r"^[A-Za-z_][A-Za-z0-9_]{0,63}$")
+
+
+def meta_filter_path(filters: Mapping[str, Any] | None) -> str | None:
+    """Compile ``{"sector": "SaaS", "year": [2023, 2024]}`` to a jsonpath predicate.
+
+    Keys are ANDed and list values ORed. The result is evaluated as
+    ``meta @? path``, which the ``jsonb_path_ops`` GIN index on ``chunks.meta``
+    answers directly. Integers also match their string form, since ingest
+    sources disagree on whether a year is ``2023`` or ``"2023"``.
+    """
+    if not filters:
+        return None
+    clauses: list[str] = []
+    for key in sorted(filters):
+        if not _KEY.match(key):
+            raise ValueError(f"Invalid metadata filter key: {key!r}")
+        value = filters[key]
+        options = list(value) if isinstance(value, (list, tuple, set, frozenset)) else [value]
+        if not options:
+            raise ValueError(f"Metadata filter {key!r} has no values")
+        tests = [f'@."{key}" == {literal}' for option in options for literal in _literals(key, option)]
+        clauses.append(tests[0] if len(tests) == 1 else "(" + " || ".join(tests) + ")")
+    return "$ ? (" + " && ".join(clauses) + ")"
+
+
+def _literals(key: str, value: Any) -> list[str]:
+    if value is None:
+        return ["null"]
+    if isinstance(value, bool):
+        return ["true" if value else "false"]
+    if isinstance(value, int):
+        return [str(value), json.dumps(str(value))]
+    if isinstance(value, float) and math.isfinite(value):
+        return [repr(value)]
+    if isinstance(value, str):
+        return [json.dumps(value)]
+    raise ValueError(f"Unsupported value for metadata filter {key!r}: {value!r}")
@@ -0,0 +1,145 @@
+"""Retrieval hit types.
+
+``ChunkHit`` is the single record a retrieved chunk travels as, from vector or
+lexical search through fusion, reranking, MMR, prompt rendering and citations.
+It is a frozen slotted dataclass: one small object per hit, attribute access on
+the hot path, and stage-specific scores added with ``replace`` rather than by
+copying a dict. It also reads as a mapping of its set fields, so callers and
+stored evidence packs written against plain hit dicts (``hit["text"]``,
+``hit.get("meta")``, ``"text" in hit``, ``dict(hit)``) keep working.
+
+``HitBatch`` is the columnar form of id-and-score results for many queries at
+once: parallel ``chunk_ids``/``scores`` arrays, with query ``q`` owning
+``[offsets[q], offsets[q + 1])``.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, Sequence
+
+import numpy as np
+
+
+_FIELDS = ("chunk_id", "score", "text", "meta", "document_id", "source", "hash", "rrf_score", "rerank_score")
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class ChunkHit(Mapping):
+    """One retrieved chunk. ``text`` is ``None`` until an id-only hit is hydrated.
+
+    ``vector`` is the chunk's stored embedding when the search returned it (MMR
+    compares candidates with it); it is not part of the mapping view, so packs
+    and prompts never carry it.
+    """
+
+    chunk_id: Any
+    score: float | None = None
+    text: str | None = None
+    meta: Mapping[str, Any] | None = None
+    document_id: int | None = None
+    source: str | None = None
+    hash: str | None = None
+    rrf_score: float | None = None
+    rerank_score: float | None = None
+    vector: Any = field(default=None, repr=False)
+
+    @classmethod
+    def from_mapping(cls, data: Mapping[str, Any]) -> ChunkHit:
+        chunk_id = data.get("chunk_id")
+        return cls(
+            chunk_id=data.get("id") if chunk_id is None else chunk_id,
+            score=data.get("score"),
+            text=data.get("text"),
+            meta=data.get("meta"),
+            document_id=data.get("document_id"),
+            source=data.get("source"),
+            hash=data.get("hash"),
+            rrf_score=data.get("rrf_score"),
+            rerank_score=data.get("rerank_score"),
+        )
+
+    def replace(self, **changes: Any) -> ChunkHit:
+        return dataclasses.replace(self, **changes)
+
+    def with_row(self, row: Mapping[str, Any]) -> ChunkHit:
+        """This hit with text, meta and source filled in from a chunk row."""
+        return dataclasses.replace(
+            self,
+            text=row["text"],
+            meta=dict(row.get("meta") or {}),
+            document_id=row.get("document_id"),
+            source=row.get("source"),
+            hash=row.get("hash"),
+        )
+
+    @property
+    def section(self) -> str | None:
+        return (self.meta or {}).get("section")
+
+    @property
+    def citation_name(self) -> str | None:
+        """Human-readable origin for citations: the document source, else its section."""
+        return self.source or self.section
+
+    def as_dict(self) -> dict[str, Any]:
+        return {name: value for name in _FIELDS if (value := getattr(self, name)) is not None}
+
+    # Read-only mapping view over the fields that are set.
+    def __getitem__(self, key: str) -> Any:
+        value = getattr(self, key, None) if key in _FIELDS else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name in _FIELDS if getattr(self, name) is not None)
+
+    def __len__(self) -> int:
+        return sum(1 for name in _FIELDS if getattr(self, name) is not None)
+
+
+def as_hits(hits: Iterable[ChunkHit | Mapping[str, Any]]) -> list[ChunkHit]:
+    """Hits as ``ChunkHit``s; ones that already are pass through untouched."""
+    return [hit if type(hit) is ChunkHit else ChunkHit.from_mapping(hit) for hit in hits]
+
+
+@dataclass(frozen=True, slots=True)
+class HitBatch:
+    """Ranked ``(chunk_id, score)`` lists for a batch of queries, stored as parallel arrays."""
+
+    chunk_ids: np.ndarray
+    scores: np.ndarray
+    offsets: np.ndarray
+
+    @classmethod
+    def from_ranked(cls, ranked: Sequence[tuple[Sequence[int], Sequence[float]]]) -> HitBatch:
+        """Build from one ``(chunk_ids, scores)`` pair per query, e.g. ``DealVectorIndex.search`` results."""
+        offsets = np.zeros(len(ranked) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(ids) for ids, _ in ranked])
+        if not ranked or not offsets[-1]:
+            return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), offsets)
+        return cls(
+            np.concatenate([np.asarray(ids, dtype=np.int64) for ids, _ in ranked]),
+            np.concatenate([np.asarray(scores, dtype=np.float32) for _, scores in ranked]),
+            offsets,
+        )
+
+    def __len__(self) -> int:
+        return int(self.offsets.shape[0]) - 1
+
+    def unique_ids(self) -> list[int]:
+        return list(dict.fromkeys(self.chunk_ids.tolist()))
+
+    def hits(self, query: int) -> list[ChunkHit]:
+        """Id-only hits for one query, best first."""
+        start, end = int(self.offsets[query]), int(self.offsets[query + 1])
+        return [
+            ChunkHit(chunk_id=chunk_id, score=score)
+            for chunk_id, score in zip(self.chunk_ids[start:end].tolist(), self.scores[start:end].tolist())
+        ]
+
+    def to_lists(self) -> list[list[ChunkHit]]:
+        return [self.hits(query) for query in range(len(self))]
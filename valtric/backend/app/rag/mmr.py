@@ -0,0 +1,94 @@
+"""Maximal-marginal-relevance selection over retrieved chunks."""
+
+from __future__ import annotations
+
+import re
+import zlib
+from typing import Sequence
+
+import numpy as np
+
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def mmr_select(
+    relevance: Sequence[float],
+    vectors: np.ndarray,
+    *,
+    lambda_mult: float = 0.7,
+    max_items: int | None = None,
+    token_counts: Sequence[int] | None = None,
+    token_budget: int | None = None,
+    duplicate_threshold: float | None = None,
+) -> list[int]:
+    """Greedily pick candidate indexes trading relevance against redundancy.
+
+    ``relevance`` should be on a comparable scale (see ``normalize_relevance``).
+    Pairwise cosine similarities are computed once as a single matrix product;
+    each step is then a vectorised update over the remaining candidates.
+    Candidates that would exceed ``token_budget`` are skipped (the first pick is
+    always kept), and those at least ``duplicate_threshold`` similar to a picked
+    chunk are dropped outright.
+    """
+    n = len(relevance)
+    if n == 0:
+        return []
+    limit = n if max_items is None else min(max_items, n)
+
+    rel = np.asarray(relevance, dtype=np.float32)
+    unit = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+    similarity = unit @ unit.T
+
+    tokens = np.asarray(token_counts if token_counts is not None else np.zeros(n), dtype=np.int64)
+    remaining_budget = token_budget
+    available = np.ones(n, dtype=bool)
+    max_similarity = np.zeros(n, dtype=np.float32)
+    selected: list[int] = []
+
+    while len(selected) < limit:
+        candidates = available.copy()
+        if selected and remaining_budget is not None:
+            candidates &= tokens <= remaining_budget
+        if not candidates.any():
+            break
+        scores = lambda_mult * rel - (1.0 - lambda_mult) * max_similarity
+        scores[~candidates] = -np.inf
+        choice = int(np.argmax(scores))
+        selected.append(choice)
+        available[choice] = False
+        if remaining_budget is not None:
+            remaining_budget -= int(tokens[choice])
+        np.maximum(max_similarity, similarity[choice], out=max_similarity)
+        if duplicate_threshold is not None:
+            available &= similarity[choice] < duplicate_threshold
+    return selected
+
+
+def normalize_relevance(scores: Sequence[float | None]) -> np.ndarray:
+    """Min-max scale scores to [0, 1]; falls back to rank order when they are missing or flat."""
+    n = len(scores)
+    rank_based = np.linspace(1.0, 0.0, num=n, dtype=np.float32) if n > 1 else np.ones(n, dtype=np.float32)
+    if n == 0 or any(score is None for score in scores):
+        return rank_based
+    values = np.asarray(scores, dtype=np.float32)
+    spread = float(values.max() - values.min())
+    if spread <= 0.0:
+        return rank_based
+    return (values - values.min()) / spread
+
+
+def hashed_term_vectors(texts: Sequence[str], dim: int = 512) -> np.ndarray:
+    """Bag-of-words vectors via feature hashing, for candidates without stored embeddings."""
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        buckets = [zlib.crc32(token.encode("utf-8")) % dim for token in _TOKEN.findall(text.lower())]
+        if buckets:
+            np.add.at(matrix[row], buckets, 1.0)
+    return matrix
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0.0] = 1.0
+    return matrix / norms
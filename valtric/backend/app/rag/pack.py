@@ -1,3 +1,140 @@
-"""Context packing utilities placeholder."""
+"""Context packing utilities.
 
-# TODO: manage token budgeting and citation assembly.
+``pack_context`` turns ranked retrieval hits into the comparable set a prompt
+carries: only the fields the model reads (citation handle, origin, text),
+snippets clipped to a per-snippet cap, duplicates dropped, and the whole set
+fitted to a token budget in rank order. Each snippet is keyed by a stable
+``chunk:<id>`` handle, the same ``source_id`` the response schema cites.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Iterable, Mapping
+
+from app.rag.hits import ChunkHit, as_hits
+
+
+# A snippet is dropped rather than clipped below this many tokens.
+MIN_SNIPPET_TOKENS = 24
+_WHITESPACE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English prose)."""
+    return len(text) // 4 + 1
+
+
+def citation_handle(chunk_id: Any) -> str:
+    return f"chunk:{chunk_id}"
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """``text`` cut to about ``max_tokens``, at a word boundary where one is near."""
+    limit = max(max_tokens - 1, 0) * 4
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    space = cut.rfind(" ")
+    if space > limit * 0.8:
+        cut = cut[:space]
+    return cut.rstrip() + "…"
+
+
+@dataclass(frozen=True, slots=True)
+class Snippet:
+    handle: str
+    text: str
+    source: str | None = None
+    section: str | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        data: dict[str, Any] = {"source_id": self.handle}
+        if self.source:
+            data["source"] = self.source
+        if self.section and self.section != self.source:
+            data["section"] = self.section
+        data["text"] = self.text
+        return data
+
+
+@dataclass(frozen=True, slots=True)
+class PackedContext:
+    snippets: tuple[Snippet, ...]
+    budget: int | None
+    tokens: int
+    dropped: int
+    truncated: int
+
+    def render(self) -> str:
+        return json.dumps([snippet.as_dict() for snippet in self.snippets], ensure_ascii=False)
+
+    def usage(self, prefix: str) -> dict[str, float]:
+        """Budget figures keyed for the consultant timings, e.g. ``final_context_tokens``."""
+        return {
+            f"{prefix}_context_tokens": float(self.tokens),
+            f"{prefix}_context_budget": float(self.budget or 0),
+            f"{prefix}_context_snippets": float(len(self.snippets)),
+            f"{prefix}_context_dropped": float(self.dropped),
+        }
+
+
+def pack_context(
+    hits: Iterable[ChunkHit | Mapping[str, Any]],
+    *,
+    budget: int | None,
+    snippet_max_tokens: int | None = None,
+) -> PackedContext:
+    """Fit ranked ``hits`` into ``budget`` tokens (``None`` => unbounded), best first.
+
+    Hits without an id or text cannot be cited and are skipped; so are repeats
+    of an already packed chunk id, content hash or normalised text. The first
+    snippet that overflows the budget is clipped into what is left when that is
+    at least ``MIN_SNIPPET_TOKENS``; everything after it is dropped.
+    """
+    snippets: list[Snippet] = []
+    seen: set[Any] = set()
+    used = 2  # the enclosing brackets
+    dropped = truncated = 0
+    exhausted = False
+
+    for hit in as_hits(hits):
+        if hit.chunk_id is None or not hit.text:
+            continue
+        text = _WHITESPACE.sub(" ", hit.text).strip()
+        keys = {("id", str(hit.chunk_id)), ("text", text.lower())}
+        if hit.hash:
+            keys.add(("hash", hit.hash))
+        if not text or keys & seen:
+            continue
+        seen |= keys
+        if exhausted:
+            dropped += 1
+            continue
+
+        clipped = text
+        if snippet_max_tokens is not None:
+            clipped = truncate_to_tokens(text, snippet_max_tokens)
+        snippet = Snippet(citation_handle(hit.chunk_id), clipped, hit.source, hit.section)
+        # Field names, quotes and separators cost about as much as the handle and origin.
+        overhead = estimate_tokens(json.dumps(snippet.as_dict(), ensure_ascii=False)) - estimate_tokens(clipped) + 1
+        cost = overhead + estimate_tokens(clipped)
+
+        if budget is not None and used + cost > budget:
+            exhausted = True
+            room = budget - used - overhead
+            if room < MIN_SNIPPET_TOKENS:
+                dropped += 1
+                continue
+            clipped = truncate_to_tokens(clipped, room)
+            snippet = Snippet(snippet.handle, clipped, snippet.source, snippet.section)
+            cost = overhead + estimate_tokens(clipped)
+
+        if clipped != text:
+            truncated += 1
+        snippets.append(snippet)
+        used += cost
+
+    return PackedContext(tuple(snippets), budget, used, dropped, truncated)
@@ -1,3 +1,120 @@
-"""Cross-encoder reranking placeholder."""
+"""CPU-local reranker used for ``rerank_provider=local`` and when BGE is unreachable.
 
-# TODO: plug in reranker to refine retrieved chunks.
+Scores are a fixed linear blend of lexical features computed over the whole
+candidate set at once, so results are deterministic and cost well under a
+millisecond per candidate.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Sequence
+
+import numpy as np
+
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.'][a-z0-9]+)*")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_ENTITY = re.compile(r"\b(?:[A-Z][a-z0-9&]+|[A-Z0-9&]{2,})\b")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can could did do does for from had has have how i if in into is it its "
+    "me my of on or our should so than that the their them there these they this to was we were what "
+    "when where which who why will with would you your".split()
+)
+
+# coverage, bigram proximity, numeric match, entity match
+FEATURE_WEIGHTS = np.array([0.55, 0.15, 0.15, 0.15], dtype=np.float32)
+
+# Substring of ``meta.section`` (lowercased) -> additive prior.
+SECTION_PRIORS: dict[str, float] = {
+    "financial": 0.08,
+    "summary": 0.05,
+    "valuation": 0.05,
+    "risk": 0.04,
+    "appendix": -0.04,
+    "disclaimer": -0.08,
+    "legal notice": -0.08,
+}
+SECTION_MATCH_BONUS = 0.05
+
+
+def score_candidates(
+    query: str,
+    documents: Sequence[str],
+    *,
+    sections: Sequence[str | None] | None = None,
+) -> np.ndarray:
+    """Return one relevance score per document (higher is better)."""
+    n_docs = len(documents)
+    if not n_docs:
+        return np.empty(0, dtype=np.float32)
+
+    terms = _terms(query)
+    bigrams = list(zip(terms, terms[1:]))
+    numbers = {_normalize_number(n) for n in _NUMBER.findall(query)}
+    entities = {e.lower() for e in _ENTITY.findall(query)} - _STOPWORDS
+
+    doc_tokens = [_TOKEN.findall(doc.lower()) for doc in documents]
+    doc_sets = [set(tokens) for tokens in doc_tokens]
+
+    features = np.zeros((n_docs, FEATURE_WEIGHTS.shape[0]), dtype=np.float32)
+    if terms:
+        unique_terms = list(dict.fromkeys(terms))
+        present = np.array([[term in tokens for term in unique_terms] for tokens in doc_sets], dtype=np.float32)
+        # IDF over the candidate set: terms every candidate shares carry little signal.
+        df = present.sum(axis=0)
+        idf = np.log((n_docs + 1.0) / (df + 1.0)) + 1.0
+        features[:, 0] = (present @ idf) / idf.sum()
+    if bigrams:
+        doc_bigrams = [set(zip(tokens, tokens[1:])) for tokens in doc_tokens]
+        features[:, 1] = [sum(bg in pairs for bg in bigrams) / len(bigrams) for pairs in doc_bigrams]
+    if numbers:
+        features[:, 2] = [
+            len(numbers & {_normalize_number(n) for n in _NUMBER.findall(doc)}) / len(numbers) for doc in documents
+        ]
+    if entities:
+        features[:, 3] = [len(entities & tokens) / len(entities) for tokens in doc_sets]
+
+    scores = features @ FEATURE_WEIGHTS
+    if sections is not None:
+        scores += np.array([_section_prior(section, terms) for section in sections], dtype=np.float32)
+    return scores
+
+
+def local_rerank(
+    query: str,
+    documents: Sequence[str],
+    top_k: int,
+    *,
+    sections: Sequence[str | None] | None = None,
+) -> list[dict[str, Any]]:
+    """Rank documents in the same shape as ``rerank_documents``; ties keep the input order."""
+    scores = score_candidates(query, documents, sections=sections)
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    return [
+        {"index": int(idx), "document": documents[idx], "relevance_score": round(float(scores[idx]), 6)}
+        for idx in order
+    ]
+
+
+def _terms(text: str) -> list[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+def _normalize_number(value: str) -> str:
+    cleaned = value.replace(",", "")
+    try:
+        number = float(cleaned)
+    except ValueError:  # e.g. dotted version strings
+        return cleaned
+    return str(int(number)) if number.is_integer() else repr(number)
+
+
+def _section_prior(section: str | None, terms: Sequence[str]) -> float:
+    if not section:
+        return 0.0
+    lowered = section.lower()
+    prior = sum(weight for key, weight in SECTION_PRIORS.items() if key in lowered)
+    if set(_TOKEN.findall(lowered)) & set(terms):
+        prior += SECTION_MATCH_BONUS
+    return prior
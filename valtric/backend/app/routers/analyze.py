@@ -8,7 +8,9 @@ from app import models
 from app.db import SessionLocal, get_db
 from app.schemas import AnalysisRequest, AnalysisV1
 from app.services.analyzer import analyze_core
+from app.services.cache import analyses_cache
 from app.services.enforce import enforce_evidence_rule
+from app.services.streaming import EventStream, StreamError, sse_response
 from app.settings import settings
 import structlog
 
@@ -19,13 +21,10 @@ logger = structlog.get_logger(__name__)
 @router.post("", response_model=AnalysisV1)
 async def analyze(body: AnalysisRequest, db: AsyncSession = Depends(get_db)):
     boundary_start = time.perf_counter()
-    res = await db.execute(select(models.Deal).where(models.Deal.id == body.deal_id))
-    deal = res.scalar_one_or_none()
-    if not deal:
-        raise HTTPException(404, "deal not found")
+    deal = await _load_deal(db, body.deal_id)
 
     try:
-        analysis, meta = await analyze_core(deal, body.question, db)
+        analysis, meta = await analyze_core(deal, body.question, db, use_cache=not body.bypass_cache)
         enforce_evidence_rule(analysis, meta.get("retrieval_hits", 0))
     except ValueError as exc:
         logger.error(
@@ -36,6 +35,52 @@ async def analyze(body: AnalysisRequest, db: AsyncSession = Depends(get_db)):
         )
         raise HTTPException(status_code=409, detail=str(exc)) from exc
 
+    await _record_analysis(deal, body, analysis, meta, boundary_start)
+    return analysis
+
+
+@router.post("/stream")
+async def analyze_stream(body: AnalysisRequest, db: AsyncSession = Depends(get_db)):
+    """Server-Sent Events: ``retrieval`` and ``triage`` stage events, ``token`` deltas
+    from the model calls, then ``analysis`` (an ``AnalysisV1``) or ``error``."""
+    boundary_start = time.perf_counter()
+    deal = await _load_deal(db, body.deal_id)
+
+    async def work() -> dict:
+        # The request session is closed once the response starts; the stream needs its own.
+        async with SessionLocal() as session:
+            try:
+                analysis, meta = await analyze_core(deal, body.question, session, use_cache=not body.bypass_cache)
+                enforce_evidence_rule(analysis, meta.get("retrieval_hits", 0))
+            except ValueError as exc:
+                logger.error(
+                    "analysis_evidence_violation",
+                    deal_id=deal.id,
+                    retrieval_hits=meta.get("retrieval_hits") if "meta" in locals() else None,
+                    detail=str(exc),
+                )
+                raise StreamError(409, str(exc)) from exc
+        await _record_analysis(deal, body, analysis, meta, boundary_start)
+        return analysis.model_dump(mode="json")
+
+    return sse_response(EventStream().run(work, final_event="analysis"))
+
+
+async def _load_deal(db: AsyncSession, deal_id: int) -> models.Deal:
+    res = await db.execute(select(models.Deal).where(models.Deal.id == deal_id))
+    deal = res.scalar_one_or_none()
+    if not deal:
+        raise HTTPException(404, "deal not found")
+    return deal
+
+
+async def _record_analysis(
+    deal: models.Deal,
+    body: AnalysisRequest,
+    analysis: AnalysisV1,
+    meta: dict,
+    boundary_start: float,
+) -> None:
     analysis_dict = analysis.model_dump()
     async with SessionLocal() as session:
         session.add(models.Analysis(deal_id=deal.id, kind="valuation", prompt="valuation-agent", output=analysis_dict))
@@ -51,6 +96,9 @@ async def analyze(body: AnalysisRequest, db: AsyncSession = Depends(get_db)):
         confidence=analysis.confidence,
         path=meta.get("path"),
         consultant_ms=meta.get("overall_ms"),
+        llm_cache=meta.get("llm_cache"),
+        analysis_cache=meta.get("analysis_cache"),
+        analysis_cache_stats=analyses_cache.stats(),
         schema_version=settings.response_schema_version,
     )
     boundary_ms = (time.perf_counter() - boundary_start) * 1000.0
@@ -60,4 +108,3 @@ async def analyze(body: AnalysisRequest, db: AsyncSession = Depends(get_db)):
         question_len=len(body.question or ""),
         overall_ms=boundary_ms,
     )
-    return analysis
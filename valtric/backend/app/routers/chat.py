@@ -9,9 +9,10 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models
-from app.db import get_db
+from app.db import SessionLocal, get_db
 from app.services import chat_agent
 from app.services.chat_agent import ChatAgentError
+from app.services.streaming import EventStream, StreamError, sse_response
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 logger = structlog.get_logger(__name__)
@@ -50,6 +51,30 @@ async def create_chat_message(
     return ChatResponse(**result)
 
 
+@router.post("/stream")
+async def stream_chat_message(request: ChatRequest):
+    """Server-Sent Events: stage events and model ``token`` deltas, then ``message`` (a ``ChatResponse``)."""
+
+    async def work() -> dict:
+        # Own session: a dependency session is closed once the response starts.
+        async with SessionLocal() as session:
+            try:
+                result = await chat_agent.chat(
+                    message=request.message,
+                    conversation_id=request.conversation_id,
+                    deal_id=request.deal_id,
+                    session=session,
+                )
+            except ChatAgentError as exc:
+                raise StreamError(400, str(exc)) from exc
+            except Exception as exc:  # noqa: BLE001
+                logger.error("chat_endpoint_error", error=str(exc))
+                raise StreamError(500, "chat_processing_failed") from exc
+        return ChatResponse(**result).model_dump()
+
+    return sse_response(EventStream().run(work, final_event="message"))
+
+
 @router.get("/conversations/{conversation_id}")
 async def get_conversation(
     conversation_id: str,
@@ -1,12 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_db
 from app.services.foundry import ingest_deal_payload, IngestError
+from app.services.snapshots import SnapshotError, SnapshotIncomplete, create_snapshot, promote_snapshot
 
 router = APIRouter(prefix="/foundry", tags=["foundry"])
 
 
+class SnapshotIn(BaseModel):
+    id: str | None = None  # UUID; generated when omitted
+    embedding_model: str | None = None
+    notes: str | None = None
+
+
 @router.post("/ingest")
 async def ingest_foundry_payload(payload: dict, db: AsyncSession = Depends(get_db)):
     try:
@@ -14,3 +22,23 @@ async def ingest_foundry_payload(payload: dict, db: AsyncSession = Depends(get_d
     except IngestError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     return result
+
+
+@router.post("/snapshots")
+async def register_snapshot(body: SnapshotIn, db: AsyncSession = Depends(get_db)):
+    try:
+        snapshot = await create_snapshot(db, body.id, embedding_model=body.embedding_model, notes=body.notes)
+    except SnapshotError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {"id": snapshot.id, "embedding_model": snapshot.embedding_model, "is_active": snapshot.is_active}
+
+
+@router.post("/snapshots/{snapshot_id}/promote")
+async def promote_index_snapshot(snapshot_id: str, allow_partial: bool = False, db: AsyncSession = Depends(get_db)):
+    try:
+        snapshot = await promote_snapshot(db, snapshot_id, allow_partial=allow_partial)
+    except SnapshotIncomplete as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    except SnapshotError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    return {"id": snapshot.id, "embedding_model": snapshot.embedding_model, "is_active": snapshot.is_active}
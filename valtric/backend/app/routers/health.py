@@ -1,8 +1,30 @@
 from fastapi import APIRouter
 
+from app.integrations.http_clients import http_clients
+from app.services.chunk_store import chunk_text_cache
+from app.services.embed import embedding_batcher, embedding_cache
+from app.services.rerank import rerank_cache
+from app.services.vector_index import vector_index
+
 router = APIRouter()
 
 
 @router.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@router.get("/health/upstreams")
+async def upstream_pools():
+    return {"upstreams": http_clients.stats()}
+
+
+@router.get("/health/caches")
+async def cache_stats():
+    return {
+        "embeddings": embedding_cache.stats(),
+        "embedding_batches": embedding_batcher.stats(),
+        "vector_index": vector_index.stats(),
+        "rerank": rerank_cache.stats(),
+        "chunk_text": chunk_text_cache.stats(),
+    }
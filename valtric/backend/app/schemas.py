@@ -19,6 +19,7 @@ class DealOut(DealIn):
 class AnalysisRequest(BaseModel):
     deal_id: int
     question: str = "Is this valuation reasonable?"
+    bypass_cache: bool = False  # skip cached LLM completions (fresh ones are still stored)
 
 
 Conclusion = Literal["cheap", "fair", "rich", "expensive", "uncertain", "undetermined"]
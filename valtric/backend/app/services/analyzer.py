@@ -1,14 +1,30 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
 import time
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Hashable, Tuple
 
+import structlog
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.db import SessionLocal
+from app.rag.hits import ChunkHit, as_hits
 from app.schemas import AnalysisV1, CompCitation
+from app.services.cache import analyses_cache, make_analysis_cache_key, semantic_analysis_cache
 from app.services.consultant import analyze_valuation
-from app.services.retrieve import get_similar_chunks
+from app.services.evidence_packs import EvidenceLookup, deal_evidence_version
+from app.services.retrieve import embed_question_and_query, get_similar_chunks, lookup_evidence_pack
+from app.services.streaming import emit
 from app.services.validation import sanitize_analysis_payload
+from app.settings import settings
+
+
+logger = structlog.get_logger(__name__)
+
+# Keys with a background refresh in flight, so a stale entry is recomputed once.
+_REFRESHING: set[str] = set()
+_PENDING_REFRESHES: set[asyncio.Task] = set()
 
 _RETRIEVAL_HARD_TERMS = [
     "comp",
@@ -33,41 +49,108 @@ def _should_require_retrieval(question: str | None) -> bool:
     return any(term in text for term in _RETRIEVAL_HARD_TERMS)
 
 
-def _fallback_citations(comps: list[dict[str, Any]], limit: int = 3) -> list[CompCitation]:
+def _fallback_citations(comps: list[ChunkHit], limit: int = 3) -> list[CompCitation]:
     citations: list[CompCitation] = []
-    for comp in comps:
-        chunk_id = comp.get("chunk_id") or comp.get("id")
-        if not chunk_id:
+    for comp in as_hits(comps):
+        if not comp.chunk_id:
             continue
-        citation = CompCitation(source_id=f"chunk:{chunk_id}")
-        source_name = comp.get("source") or comp.get("meta", {}).get("section")
-        if source_name:
-            citation.name = source_name
+        citation = CompCitation(source_id=f"chunk:{comp.chunk_id}")
+        if comp.citation_name:
+            citation.name = comp.citation_name
         citations.append(citation)
         if len(citations) >= limit:
             break
     return citations
 
 
-async def analyze_core(deal: Any, question: str, db: AsyncSession | None) -> Tuple[AnalysisV1, Dict[str, Any]]:
-    """Run retrieval + consultant analysis and return structured output plus metadata."""
+async def analyze_core(
+    deal: Any,
+    question: str,
+    db: AsyncSession | None,
+    *,
+    use_cache: bool = True,
+) -> Tuple[AnalysisV1, Dict[str, Any]]:
+    """Run retrieval + consultant analysis and return structured output plus metadata.
+
+    The same question (up to case and whitespace) is answered from
+    ``analyses_cache``; past its TTL the entry is still served while a
+    background task recomputes it. A paraphrase of a question already answered
+    for the deal, with the deal's evidence unchanged, is served from
+    ``semantic_analysis_cache``. ``use_cache=False`` skips both tiers and cached
+    LLM completions for this call; its result still refreshes the caches.
+    """
     t0 = time.perf_counter()
 
     retrieval_required = _should_require_retrieval(question)
     deal_payload = _coerce_deal_payload(deal)
 
+    cache_key: str | None = None
+    cache_status = "bypass" if not use_cache else "off"
+    if settings.analysis_cache_enabled and deal_payload.get("id") is not None:
+        cache_key = make_analysis_cache_key(deal_payload["id"], question)
+        if use_cache:
+            cached_entry = analyses_cache.lookup(cache_key)
+            cache_status = "miss"
+            if cached_entry is not None:
+                (analysis_data, cached_meta), stale = cached_entry
+                if stale:
+                    _schedule_refresh(cache_key, deal_payload, question)
+                emit("cache", {"tier": "exact", "stale": stale})
+                meta = {
+                    **cached_meta,
+                    "llm_cache": {},
+                    "analysis_cache": "stale" if stale else "hit",
+                    "overall_ms": (time.perf_counter() - t0) * 1000.0,
+                }
+                return AnalysisV1.model_validate(analysis_data), meta
+
+    question_vector = query_vector = evidence = pack_lookup = None
+    if _semantic_cache_applies(deal_payload, question, db):
+        pack_lookup = await lookup_evidence_pack(deal_payload, question=question, db=db)
+        # A pack hit answers retrieval without embedding anything; only a miss pays for the probe.
+        if pack_lookup is None or not pack_lookup.hits:
+            question_vector, query_vector, evidence = await _semantic_probe(deal_payload, question, db, pack_lookup)
+        if use_cache and question_vector is not None and evidence is not None:
+            cached = semantic_analysis_cache.lookup(deal_payload["id"], question_vector, evidence)
+            cache_status = "miss"
+            if cached is not None:
+                (analysis_data, cached_meta), similarity = cached
+                logger.info("semantic_cache_hit", deal_id=deal_payload["id"], similarity=round(similarity, 4))
+                emit("cache", {"tier": "semantic", "similarity": similarity})
+                meta = {
+                    **cached_meta,
+                    "llm_cache": {},
+                    "analysis_cache": "semantic_hit",
+                    "semantic_similarity": similarity,
+                    "overall_ms": (time.perf_counter() - t0) * 1000.0,
+                }
+                if cache_key is not None:
+                    analyses_cache.set(cache_key, (analysis_data, cached_meta))
+                return AnalysisV1.model_validate(analysis_data), meta
+
     comps = await get_similar_chunks(
         deal_payload,
         question=question,
         db=db,
+        query_vector=query_vector,
+        pack_lookup=pack_lookup,
     )
     retrieval_hits = len(comps)
     retrieval_required = retrieval_required or bool(retrieval_hits)
+    emit(
+        "retrieval",
+        {
+            "hits": retrieval_hits,
+            "sources": [comp.citation_name for comp in as_hits(comps)],
+            "retrieval_ms": (time.perf_counter() - t0) * 1000.0,
+        },
+    )
 
     raw_output, consultant_meta = await analyze_valuation(
         deal_payload,
         comps,
         question,
+        use_cache=use_cache,
     )
 
     baseline_multiple = deal_payload["price"] / deal_payload["ebitda"] if deal_payload["ebitda"] > 0 else 0.0
@@ -105,14 +188,84 @@ async def analyze_core(deal: Any, question: str, db: AsyncSession | None) -> Tup
         "path": consultant_meta.get("path", "easy"),
         "timings": consultant_meta.get("timings", {}),
         "triage_confidence": consultant_meta.get("triage_confidence"),
+        "llm_cache": consultant_meta.get("llm_cache", {}),
+        "analysis_cache": cache_status,
         "retrieval_hits": retrieval_hits,
         "retrieval_required": retrieval_required,
         "overall_ms": overall_ms,
         "citations": len(analysis_model.comps_used),
     }
+    entry = (analysis_model.model_dump(), meta)
+    if cache_key is not None:
+        analyses_cache.set(cache_key, entry)
+    if question_vector is not None and evidence is not None:
+        semantic_analysis_cache.store(deal_payload["id"], question_vector, evidence, entry)
     return analysis_model, meta
 
 
+def _schedule_refresh(cache_key: str, deal_payload: Dict[str, Any], question: str) -> None:
+    """Recompute a stale entry off the request path, at most once at a time per key."""
+    if cache_key in _REFRESHING:
+        return
+    _REFRESHING.add(cache_key)
+    # A fresh context: the refresh must not emit into the triggering request's event stream.
+    task = asyncio.get_running_loop().create_task(
+        _refresh(cache_key, deal_payload, question), context=contextvars.Context()
+    )
+    _PENDING_REFRESHES.add(task)
+    task.add_done_callback(_PENDING_REFRESHES.discard)
+
+
+async def _refresh(cache_key: str, deal_payload: Dict[str, Any], question: str) -> None:
+    try:
+        async with SessionLocal() as session:
+            await analyze_core(deal_payload, question, session, use_cache=False)
+        logger.info("analysis_cache_refreshed", deal_id=deal_payload.get("id"))
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("analysis_cache_refresh_failed", deal_id=deal_payload.get("id"), error=str(exc))
+    finally:
+        _REFRESHING.discard(cache_key)
+
+
+def _semantic_cache_applies(deal_payload: Dict[str, Any], question: str, db: AsyncSession | None) -> bool:
+    # Lexical-only retrieval never embeds the query, so matching would cost an extra embedding call.
+    return (
+        settings.semantic_cache_enabled
+        and settings.retrieval_mode != "lexical"
+        and db is not None
+        and deal_payload.get("id") is not None
+        and bool(question and question.strip())
+    )
+
+
+async def _semantic_probe(
+    deal_payload: Dict[str, Any],
+    question: str,
+    db: AsyncSession,
+    pack_lookup: EvidenceLookup | None,
+) -> Tuple[list[float] | None, list[float] | None, Hashable | None]:
+    """Bare-question vector, retrieval query vector, and the evidence the analysis read.
+
+    Paraphrases are matched on the bare question: the retrieval query repeats
+    the deal's fields, which would pull every question about the deal together.
+    The evidence version comes from ``pack_lookup`` when there is one.
+    """
+    vectors = await embed_question_and_query(deal_payload, question)
+    if vectors is None:
+        return None, None, None
+    question_vector, query_vector = vectors
+    if pack_lookup is not None:
+        version = pack_lookup.version
+    else:
+        try:
+            version = await deal_evidence_version(db, deal_payload["id"])
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("semantic_cache_version_failed", deal_id=deal_payload["id"], error=str(exc))
+            return question_vector, query_vector, None
+    deal_fields = tuple(deal_payload.get(field) for field in ("name", "industry", "price", "ebitda"))
+    return question_vector, query_vector, (version, deal_fields, settings.prompt_version)
+
+
 def _coerce_deal_payload(deal: Any) -> Dict[str, Any]:
     if isinstance(deal, dict):
         data = deal
@@ -1,29 +1,61 @@
 from __future__ import annotations
 
 import copy
+import re
 import time
 from collections import OrderedDict
-from typing import Any
+from typing import Any, Hashable, Sequence
+
+import numpy as np
+
+from app.settings import settings
 
 
 class TTLCache:
-    """Lightweight in-process cache with TTL support."""
+    """Lightweight in-process cache with TTL support.
 
-    def __init__(self, maxsize: int = 256, ttl: float = 600.0) -> None:
+    With ``stale_ttl`` an entry outlives its ``ttl`` by that grace period:
+    ``get`` no longer returns it, but ``lookup`` does, flagged stale, so the
+    caller can serve it while recomputing (stale-while-revalidate).
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 600.0, stale_ttl: float = 0.0) -> None:
         self.maxsize = maxsize
         self.ttl = ttl
+        self.stale_ttl = stale_ttl
         self._store: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
 
     def get(self, key: str) -> Any | None:
+        found = self._entry(key)
+        if found is None or found[1]:
+            return None
+        return found[0]
+
+    def lookup(self, key: str) -> tuple[Any, bool] | None:
+        """Return ``(value, is_stale)`` and count a hit, stale hit or miss."""
+        found = self._entry(key)
+        if found is None:
+            self.misses += 1
+        elif found[1]:
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+        return found
+
+    def _entry(self, key: str) -> tuple[Any, bool] | None:
         if key not in self._store:
             return None
         expires_at, value = self._store.get(key, (0.0, None))
-        if expires_at < time.monotonic():
+        now = time.monotonic()
+        if expires_at + self.stale_ttl < now:
             self._store.pop(key, None)
             return None
         # Refresh LRU ordering.
         self._store.move_to_end(key)
-        return copy.deepcopy(value)
+        return copy.deepcopy(value), expires_at < now
 
     def set(self, key: str, value: Any) -> None:
         expires_at = time.monotonic() + self.ttl
@@ -32,10 +64,136 @@ class TTLCache:
         while len(self._store) > self.maxsize:
             self._store.popitem(last=False)
 
+    def invalidate_prefix(self, prefix: str) -> int:
+        keys = [key for key in self._store if key.startswith(prefix)]
+        for key in keys:
+            del self._store[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._store.clear()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._store),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
+
+
+_WHITESPACE = re.compile(r"\s+")
+
 
 def make_analysis_cache_key(deal_id: int, question: str | None) -> str:
-    normalized = (question or "").strip().lower()
-    return f"{deal_id}:{normalized}"
+    normalized = _WHITESPACE.sub(" ", (question or "").strip().lower())
+    return f"{deal_id}:{settings.prompt_version}:{settings.routing_version}:{normalized}"
+
+
+def invalidate_deal_analyses(deal_id: int | None = None) -> None:
+    """Drop cached analyses for ``deal_id`` (every deal when ``None``) after its evidence changes."""
+    if deal_id is None:
+        analyses_cache.clear()
+    else:
+        analyses_cache.invalidate_prefix(f"{deal_id}:")
+    semantic_analysis_cache.invalidate(deal_id)
+
+
+class SemanticAnalysisCache:
+    """Per-deal analyses matched by question embedding rather than exact text.
+
+    Each entry keeps the unit-normalised query vector it was computed for and the
+    deal's evidence version at the time. A lookup returns the most similar live
+    entry whose evidence version still matches, provided its cosine similarity
+    reaches ``threshold``.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        ttl: float = 900.0,
+        max_per_deal: int = 32,
+        max_deals: int = 512,
+    ) -> None:
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_per_deal = max_per_deal
+        self.max_deals = max_deals
+        self._deals: OrderedDict[Any, list[tuple[float, np.ndarray, Hashable, Any]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, deal_id: Any, vector: Sequence[float], evidence: Hashable) -> tuple[Any, float] | None:
+        """Return ``(value, similarity)`` for the closest matching entry, or ``None``."""
+        now = time.monotonic()
+        entries = [
+            entry for entry in self._deals.get(deal_id, ()) if entry[0] >= now and entry[2] == evidence
+        ]
+        if deal_id in self._deals:
+            # Expired and outdated entries can never match again.
+            self._deals[deal_id] = entries
+            self._deals.move_to_end(deal_id)
+        query = _unit(vector)
+        if not entries or query is None:
+            self.misses += 1
+            return None
+        vectors = [entry[1] for entry in entries]
+        if any(v.shape != query.shape for v in vectors):
+            self.misses += 1
+            return None
+        similarities = np.stack(vectors) @ query
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+        if similarity < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return copy.deepcopy(entries[best][3]), similarity
+
+    def store(self, deal_id: Any, vector: Sequence[float], evidence: Hashable, value: Any) -> None:
+        unit = _unit(vector)
+        if unit is None:
+            return
+        entries = self._deals.setdefault(deal_id, [])
+        entries.append((time.monotonic() + self.ttl, unit, evidence, copy.deepcopy(value)))
+        del entries[: -self.max_per_deal]
+        self._deals.move_to_end(deal_id)
+        while len(self._deals) > self.max_deals:
+            self._deals.popitem(last=False)
+
+    def invalidate(self, deal_id: Any | None = None) -> None:
+        if deal_id is None:
+            self._deals.clear()
+        else:
+            self._deals.pop(deal_id, None)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "deals": len(self._deals),
+            "entries": sum(len(entries) for entries in self._deals.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _unit(vector: Sequence[float]) -> np.ndarray | None:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    return array / norm if norm else None
 
 
-analyses_cache = TTLCache()
+analyses_cache = TTLCache(
+    maxsize=settings.analysis_cache_max_entries,
+    ttl=settings.analysis_cache_ttl_seconds,
+    stale_ttl=settings.analysis_cache_stale_seconds,
+)
+semantic_analysis_cache = SemanticAnalysisCache(
+    threshold=settings.semantic_cache_threshold,
+    ttl=settings.semantic_cache_ttl_seconds,
+    max_per_deal=settings.semantic_cache_max_per_deal,
+    max_deals=settings.semantic_cache_max_deals,
+)
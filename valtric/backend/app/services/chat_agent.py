@@ -10,9 +10,11 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models
+from app.rag.hits import as_hits
 from app.services.analyzer import analyze_core
 from app.services.enforce import enforce_evidence_rule
 from app.services.retrieve import get_similar_chunks
+from app.services.streaming import emit
 
 logger = structlog.get_logger(__name__)
 
@@ -229,6 +231,7 @@ async def _respond_deal_qa(
         db=session,
         top_k=5,
     )
+    emit("retrieval", {"hits": len(chunks)})
 
     if not chunks:
         message = "I could not find relevant evidence for that request in the deal room."
@@ -237,15 +240,15 @@ async def _respond_deal_qa(
 
     lines = []
     metadata_hits = []
-    for hit in chunks[:3]:
-        source = hit.get("source") or hit.get("meta", {}).get("section") or "unknown source"
-        snippet = (hit.get("text") or "").strip().replace("\n", " ")
+    for hit in as_hits(chunks[:3]):
+        source = hit.citation_name or "unknown source"
+        snippet = (hit.text or "").strip().replace("\n", " ")
         lines.append(f"- {source}: {snippet[:160]}{'…' if len(snippet) > 160 else ''}")
         metadata_hits.append(
             {
-                "chunk_id": hit.get("chunk_id") or hit.get("id"),
+                "chunk_id": hit.chunk_id,
                 "source": source,
-                "score": hit.get("score"),
+                "score": hit.score,
             }
         )
 
@@ -0,0 +1,148 @@
+"""Chunk text for ids-first retrieval.
+
+In two-phase mode the vector search returns only chunk ids and scores. Text,
+metadata and source are filled in afterwards for the hits that survive
+reranking, from a hot-chunk cache and otherwise one keyed batch query. Chunk
+rows never change after ingest, so cached entries only leave by LRU eviction.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Iterable, Mapping, Sequence
+
+import structlog
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.rag.hits import ChunkHit, as_hits
+from app.settings import settings
+
+
+logger = structlog.get_logger(__name__)
+
+
+class ChunkTextCache:
+    """LRU of chunk rows (text, meta, hash, document_id, source) keyed by chunk id."""
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        self.maxsize = maxsize
+        self._store: OrderedDict[int, dict[str, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, chunk_ids: Sequence[int]) -> dict[int, dict[str, Any]]:
+        found: dict[int, dict[str, Any]] = {}
+        for chunk_id in chunk_ids:
+            row = self._store.get(chunk_id)
+            if row is None:
+                continue
+            self._store.move_to_end(chunk_id)
+            found[chunk_id] = row
+        self.hits += len(found)
+        self.misses += len(chunk_ids) - len(found)
+        return found
+
+    def put_many(self, rows: dict[int, dict[str, Any]]) -> None:
+        for chunk_id, row in rows.items():
+            self._store[chunk_id] = row
+            self._store.move_to_end(chunk_id)
+        while len(self._store) > self.maxsize:
+            self._store.popitem(last=False)
+
+    def clear(self) -> None:
+        self._store.clear()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._store),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+chunk_text_cache = ChunkTextCache(maxsize=settings.chunk_text_cache_max_entries)
+
+
+async def fetch_chunk_rows(db: AsyncSession, chunk_ids: Sequence[int]) -> dict[int, dict[str, Any]]:
+    """Load chunk rows by id in one query, truncating text server-side when capped."""
+    if not chunk_ids:
+        return {}
+    max_chars = settings.chunk_text_max_chars
+    text_col = func.substr(models.Chunk.text, 1, max_chars) if max_chars else models.Chunk.text
+    stmt = (
+        select(
+            models.Chunk.id.label("chunk_id"),
+            text_col.label("text"),
+            models.Chunk.meta,
+            models.Chunk.hash,
+            models.Chunk.document_id,
+            models.Document.source_name.label("source"),
+        )
+        .join(models.Document, models.Document.id == models.Chunk.document_id)
+        .where(models.Chunk.id.in_(list(dict.fromkeys(chunk_ids))))
+    )
+    return {
+        row["chunk_id"]: {
+            "text": row["text"],
+            "meta": row.get("meta") or {},
+            "document_id": row.get("document_id"),
+            "source": row.get("source"),
+            "hash": row.get("hash"),
+        }
+        for row in (await db.execute(stmt)).mappings().all()
+    }
+
+
+async def load_chunk_rows(db: AsyncSession, chunk_ids: Sequence[int]) -> dict[int, dict[str, Any]]:
+    """Chunk rows for ``chunk_ids`` from the hot-chunk cache, fetching the rest in one query."""
+    if not chunk_ids:
+        return {}
+    rows = chunk_text_cache.get_many(chunk_ids)
+    to_fetch = [chunk_id for chunk_id in chunk_ids if chunk_id not in rows]
+    if to_fetch:
+        fetched = await fetch_chunk_rows(db, to_fetch)
+        chunk_text_cache.put_many(fetched)
+        rows.update(fetched)
+    logger.info("chunk_hydration", requested=len(chunk_ids), cached=len(chunk_ids) - len(to_fetch), fetched=len(to_fetch))
+    return rows
+
+
+def missing_text_ids(hits: Iterable[ChunkHit]) -> list[int]:
+    return [hit.chunk_id for hit in hits if hit.text is None and hit.chunk_id is not None]
+
+
+def apply_chunk_rows(hits: Sequence[ChunkHit], rows: Mapping[int, Mapping[str, Any]], *, drop_missing: bool) -> list[ChunkHit]:
+    """Merge loaded rows into id-only hits and apply the text cap, preserving order and scores."""
+    max_chars = settings.chunk_text_max_chars
+    hydrated: list[ChunkHit] = []
+    for hit in hits:
+        if hit.text is None and drop_missing:
+            row = rows.get(hit.chunk_id)
+            if row is None:
+                continue
+            hit = hit.with_row(row)
+        if max_chars and hit.text and len(hit.text) > max_chars:
+            hit = hit.replace(text=hit.text[:max_chars])
+        hydrated.append(hit)
+    return hydrated
+
+
+async def hydrate_hits(
+    db: AsyncSession | None,
+    hits: Sequence[ChunkHit | Mapping[str, Any]],
+) -> list[ChunkHit]:
+    """Fill in text and metadata for id-only hits, preserving order and scores.
+
+    Hits whose chunk has disappeared since the search are dropped; without a
+    session hits are passed through as they are. Every returned text is cut to
+    ``settings.chunk_text_max_chars`` when that cap is set.
+    """
+    hits = as_hits(hits)
+    rows: dict[int, dict[str, Any]] = {}
+    if db is not None:
+        rows = await load_chunk_rows(db, missing_text_ids(hits))
+    return apply_chunk_rows(hits, rows, drop_missing=db is not None)
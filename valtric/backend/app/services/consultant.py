@@ -1,31 +1,42 @@
 import json
 import time
-from typing import Any, Iterable, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Mapping, Optional, Sequence
 
 import asyncio
 import httpx
 import structlog
 
+from app.integrations.http_clients import get_http_client
+from app.rag.pack import PackedContext, pack_context
 from app.settings import settings
 from app.prompts import SYSTEM_PROMPT
+from app.services.llm_cache import completion_cache, completion_key
+from app.services.streaming import EventStream, current_stream, emit
 from app.services.triage import parse_triage_plan, TriagePlan
 
 
 logger = structlog.get_logger(__name__)
 
 HTTP_TIMEOUT = httpx.Timeout(connect=3.0, read=45.0, write=10.0, pool=3.0)
-HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
 _LLM_SEM = asyncio.Semaphore(settings.llm_max_concurrency)
+_DEEPSEEK_SYSTEM_PROMPT = (
+    "You produce concise valuation memos as strict minified JSON. "
+    "Never return markdown or commentary outside the JSON object."
+)
 
 
 async def analyze_valuation(
     deal: dict[str, Any],
-    comps: list[dict[str, Any]],
+    comps: Sequence[Mapping[str, Any]],
     question: str | None = None,
+    *,
+    use_cache: bool = True,
 ) -> dict[str, Any]:
     """Adaptive valuation analysis using GPT-5 Nano for easy cases and DeepSeek escalation for hard cases."""
     timings: dict[str, float] = {}
+    cache_status: dict[str, str] = {}
     overall_start = time.perf_counter()
+    stream = current_stream()
 
     baseline = _heuristic_baseline(deal, comps)
     complexity = _classify_request(question, deal, comps)
@@ -44,12 +55,24 @@ async def analyze_valuation(
     if complexity == "hard" and settings.deepseek_api_key:
         ds_start = time.perf_counter()
         try:
-            ds_prompt = _render_deepseek_prompt(deal, comps, baseline, question)
-            async with _LLM_SEM:
-                deepseek_response = await _call_deepseek_json(
-                    ds_prompt,
-                    effort=settings.primary_reasoning_hard,
-                )
+            ds_context = _pack_comps(comps, settings.context_token_budget_triage)
+            timings.update(ds_context.usage("triage"))
+            ds_prompt = _render_deepseek_prompt(deal, ds_context, baseline, question)
+            ds_effort = settings.primary_reasoning_hard
+            deepseek_response, cache_status["triage"] = await _complete(
+                completion_key(
+                    provider="deepseek",
+                    model=settings.primary_model,
+                    effort=ds_effort,
+                    verbosity=None,
+                    system=_DEEPSEEK_SYSTEM_PROMPT,
+                    prompt=ds_prompt,
+                ),
+                lambda: _run_deepseek(ds_prompt, ds_effort, stream),
+                use_cache=use_cache,
+                stream=stream,
+                stage="triage",
+            )
             try:
                 triage_plan = parse_triage_plan(deepseek_response)
                 triage_summary = _summarize_plan(triage_plan)
@@ -90,6 +113,16 @@ async def analyze_valuation(
         skip_reason=skip_reason,
         triage_confidence=triage_plan.confidence if triage_plan and triage_plan.confidence is not None else None,
     )
+    emit(
+        "triage",
+        {
+            "complexity": complexity,
+            "ran": triage_ran,
+            "skip_reason": skip_reason,
+            "summary": triage_summary,
+            "deepseek_ms": timings.get("deepseek_ms"),
+        },
+    )
 
     final_payload = deepseek_payload or baseline
     escalate_to_gpt = _should_escalate(complexity, final_payload, comps)
@@ -101,15 +134,29 @@ async def analyze_valuation(
     if should_call_gpt:
         gpt_start = time.perf_counter()
         try:
-            final_prompt = _render_final_prompt(deal, comps, baseline, triage_summary, complexity)
+            final_context = _pack_comps(comps, settings.context_token_budget_final)
+            timings.update(final_context.usage("final"))
+            final_prompt = _render_final_prompt(deal, final_context, baseline, triage_summary, complexity)
             effort = (
                 settings.secondary_reasoning_easy if complexity == "easy" else settings.secondary_reasoning_hard
             )
             verbosity = (
                 settings.secondary_verbosity_easy if complexity == "easy" else settings.secondary_verbosity_hard
             )
-            async with _LLM_SEM:
-                llm_response = await _call_gpt5(final_prompt, effort=effort, verbosity=verbosity)
+            llm_response, cache_status["final"] = await _complete(
+                completion_key(
+                    provider="openai",
+                    model=settings.secondary_model or settings.model_name,
+                    effort=effort,
+                    verbosity=verbosity,
+                    system=SYSTEM_PROMPT,
+                    prompt=final_prompt,
+                ),
+                lambda: _run_gpt5(final_prompt, effort, verbosity, stream),
+                use_cache=use_cache,
+                stream=stream,
+                stage="final",
+            )
             seed_payload = deepseek_payload or baseline
             final_payload = _coerce_response(llm_response, seed_payload, comps)
         except Exception as exc:  # noqa: BLE001
@@ -120,7 +167,7 @@ async def analyze_valuation(
         timings["gpt5_ms"] = 0.0
 
     timings["overall_ms"] = (time.perf_counter() - overall_start) * 1000
-    logger.info("analyze_pipeline_timings", complexity=complexity, **timings)
+    logger.info("analyze_pipeline_timings", complexity=complexity, llm_cache=cache_status, **timings)
     triage_confidence = triage_plan.confidence if triage_plan and triage_plan.confidence is not None else None
     logger.info(
         "final_stage_decision",
@@ -134,12 +181,13 @@ async def analyze_valuation(
         "path": complexity,
         "timings": timings,
         "triage_confidence": triage_confidence,
+        "llm_cache": cache_status,
     }
 
     return final_payload, meta
 
 
-def _heuristic_baseline(deal: dict[str, Any], comps: Iterable[dict[str, Any]]) -> dict[str, Any]:
+def _heuristic_baseline(deal: dict[str, Any], comps: Iterable[Mapping[str, Any]]) -> dict[str, Any]:
     e = float(deal.get("ebitda") or 0.0)
     p = float(deal.get("price") or 0.0)
     multiple = p / (e if e > 1e-9 else 1e-9)
@@ -156,7 +204,7 @@ def _heuristic_baseline(deal: dict[str, Any], comps: Iterable[dict[str, Any]]) -
     }
 
 
-def _classify_request(question: str | None, deal: dict[str, Any], comps: Iterable[dict[str, Any]]) -> str:
+def _classify_request(question: str | None, deal: dict[str, Any], comps: Iterable[Mapping[str, Any]]) -> str:
     text = (question or "").lower()
     hard_terms = [
         "compare",
@@ -195,7 +243,7 @@ def _classify_request(question: str | None, deal: dict[str, Any], comps: Iterabl
 
 def _render_deepseek_prompt(
     deal: dict[str, Any],
-    comps: list[dict[str, Any]],
+    context: PackedContext,
     baseline: dict[str, Any],
     question: str | None,
 ) -> str:
@@ -206,25 +254,40 @@ def _render_deepseek_prompt(
         '"implied_multiple": <float>, '
         '"range": [<float>, <float>], '
         '"reasoning": "<<=80 words>", '
-        '"comps_used": ["<name>", ...], '
+        '"comps_used": [{"source_id": "<chunk:id>", "name": "<source>"}, ...], '
         '"risk_flags": ["<risk>", ...], '
         '"confidence": <float between 0 and 1>'
         "}\n"
         "Ground your answer in the supplied deal data, comparable snippets, and baseline heuristic. "
         "If data gaps exist, note them in risk_flags and reduce confidence. "
-        "Do not invent sources beyond the provided data.\n\n"
+        "Do not invent sources beyond the provided data; cite snippets by their source_id.\n\n"
         f"Question: {question or 'Is this valuation reasonable?'}\n"
         f"Deal: {json.dumps(deal, default=str)}\n"
-        f"Comparable set: {json.dumps(comps, default=str)}\n"
+        f"Comparable set: {context.render()}\n"
         f"Baseline heuristic: {json.dumps(baseline, default=str)}"
     )
 
 
+def _pack_comps(comps: Sequence[Mapping[str, Any]], budget: int | None) -> PackedContext:
+    context = pack_context(comps, budget=budget, snippet_max_tokens=settings.context_snippet_max_tokens)
+    if context.dropped or context.truncated:
+        logger.info(
+            "context_packed",
+            budget=budget,
+            tokens=context.tokens,
+            snippets=len(context.snippets),
+            dropped=context.dropped,
+            truncated=context.truncated,
+        )
+    return context
+
+
 def _summarize_payload(payload: dict[str, Any]) -> str:
     conclusion = payload.get("conclusion")
     confidence = payload.get("confidence")
     comps_used = payload.get("comps_used") or []
-    comps_preview = ", ".join(comps_used[:3]) if comps_used else "no comps cited"
+    cited = [comp.get("source_id") if isinstance(comp, Mapping) else comp for comp in comps_used[:3]]
+    comps_preview = ", ".join(str(comp) for comp in cited) if cited else "no comps cited"
     return (
         f"DeepSeek first-pass: conclusion={conclusion}, confidence={confidence}, comps={comps_preview}."
     )
@@ -243,7 +306,7 @@ def _summarize_plan(plan: TriagePlan) -> str:
 
 def _render_final_prompt(
     deal: dict[str, Any],
-    comps: list[dict[str, Any]],
+    context: PackedContext,
     baseline: dict[str, Any],
     triage_summary: str,
     complexity: str,
@@ -255,17 +318,17 @@ def _render_final_prompt(
         '  "implied_multiple": <float>,\n'
         '  "range": [<float>, <float>],\n'
         '  "reasoning": "<short narrative>",\n'
-        '  "comps_used": ["<name>", ...],\n'
+        '  "comps_used": [{"source_id": "<chunk:id>", "name": "<source>"}, ...],\n'
         '  "risk_flags": ["<risk>", ...],\n'
         '  "confidence": <float between 0 and 1>\n'
         "}\n\n"
         "Requirements:\n"
-        "- Use the deal & comparable data exactly as given.\n"
+        "- Use the deal & comparable data exactly as given; cite snippets by their source_id.\n"
         "- Factor in the triage summary if provided, but verify it independently.\n"
         "- If data is missing, note it in risk_flags and lower confidence.\n"
         "- Keep reasoning under 120 words.\n\n"
         f"Deal: {json.dumps(deal, default=str)}\n"
-        f"Comparable set: {json.dumps(comps, default=str)}\n"
+        f"Comparable set: {context.render()}\n"
         f"Baseline heuristic: {json.dumps(baseline, default=str)}\n"
         f"Triage summary: {triage_summary}\n"
         f"Complexity classification: {complexity}\n\n"
@@ -273,39 +336,90 @@ def _render_final_prompt(
     )
 
 
-async def _call_deepseek_json(prompt: str, effort: str | None = None) -> str:
+async def _complete(
+    key: str,
+    call: Callable[[], Awaitable[str]],
+    *,
+    use_cache: bool,
+    stream: EventStream | None,
+    stage: str,
+) -> tuple[str, str]:
+    """Run ``call`` through the completion cache; returns the text and hit/miss/bypass/disabled."""
+    if not settings.llm_cache_enabled:
+        return await call(), "disabled"
+    text, status = await completion_cache.get_or_call(key, call, bypass=not use_cache, cacheable=_is_json)
+    if status == "hit":
+        logger.info("llm_cache_hit", stage=stage)
+        if stream is not None:
+            stream.token(stage, text)
+    return text, status
+
+
+def _is_json(text: str) -> bool:
+    try:
+        json.loads(text)
+    except json.JSONDecodeError:
+        return False
+    return True
+
+
+async def _run_deepseek(prompt: str, effort: str | None, stream: EventStream | None) -> str:
+    async with _LLM_SEM:
+        if stream is not None:
+            return await _stream_deepseek_json(
+                prompt,
+                effort=effort,
+                on_token=lambda text: stream.token("triage", text),
+            )
+        return await _call_deepseek_json(prompt, effort=effort)
+
+
+async def _run_gpt5(prompt: str, effort: str | None, verbosity: str, stream: EventStream | None) -> str:
+    async with _LLM_SEM:
+        if stream is not None:
+            return await _stream_gpt5(
+                prompt,
+                effort=effort,
+                verbosity=verbosity,
+                on_token=lambda text: stream.token("final", text),
+            )
+        return await _call_gpt5(prompt, effort=effort, verbosity=verbosity)
+
+
+def _deepseek_request(prompt: str, effort: str | None) -> tuple[str, dict[str, str], dict[str, Any]]:
     url = f"{settings.deepseek_base_url.rstrip('/')}/chat/completions"
     headers = {
         "Authorization": f"Bearer {settings.deepseek_api_key}",
         "Content-Type": "application/json",
     }
-    payload = {
+    payload: dict[str, Any] = {
         "model": settings.primary_model,
         "messages": [
             {
                 "role": "system",
-                "content": (
-                    "You produce concise valuation memos as strict minified JSON. "
-                    "Never return markdown or commentary outside the JSON object."
-                ),
+                "content": _DEEPSEEK_SYSTEM_PROMPT,
             },
             {"role": "user", "content": prompt},
         ],
     }
     if effort:
         payload["reasoning"] = {"effort": effort}
+    return url, headers, payload
 
-    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS) as client:
-        response = await client.post(url, headers=headers, json=payload)
-        try:
-            response.raise_for_status()
-        except httpx.HTTPStatusError as exc:
-            logger.warning(
-                "deepseek_triage_http_error",
-                status=exc.response.status_code,
-                body=exc.response.text,
-            )
-            raise
+
+async def _call_deepseek_json(prompt: str, effort: str | None = None) -> str:
+    url, headers, payload = _deepseek_request(prompt, effort)
+    client = get_http_client("deepseek")
+    response = await client.post(url, headers=headers, json=payload, timeout=HTTP_TIMEOUT)
+    try:
+        response.raise_for_status()
+    except httpx.HTTPStatusError as exc:
+        logger.warning(
+            "deepseek_triage_http_error",
+            status=exc.response.status_code,
+            body=exc.response.text,
+        )
+        raise
 
     data = response.json()
     choices = data.get("choices", [])
@@ -314,7 +428,31 @@ async def _call_deepseek_json(prompt: str, effort: str | None = None) -> str:
     return choices[0]["message"]["content"]
 
 
-def _should_escalate(complexity: str, payload: dict[str, Any], comps: list[dict[str, Any]]) -> bool:
+async def _stream_deepseek_json(
+    prompt: str,
+    *,
+    effort: str | None = None,
+    on_token: Callable[[str], None],
+) -> str:
+    """``_call_deepseek_json`` with ``stream: true``; each content delta goes to ``on_token``."""
+    url, headers, payload = _deepseek_request(prompt, effort)
+    payload["stream"] = True
+    parts: list[str] = []
+    client = get_http_client("deepseek")
+    async with client.stream("POST", url, headers=headers, json=payload, timeout=HTTP_TIMEOUT) as response:
+        await _raise_for_stream_status(response, "deepseek_triage_http_error")
+        async for event in _sse_payloads(response):
+            choices = event.get("choices") or []
+            delta = (choices[0].get("delta") or {}).get("content") if choices else None
+            if delta:
+                parts.append(delta)
+                on_token(delta)
+    if not parts:
+        raise RuntimeError("DeepSeek stream returned no content.")
+    return "".join(parts)
+
+
+def _should_escalate(complexity: str, payload: dict[str, Any], comps: Sequence[Mapping[str, Any]]) -> bool:
     if complexity != "hard":
         return False
     if payload is None:
@@ -327,13 +465,13 @@ def _should_escalate(complexity: str, payload: dict[str, Any], comps: list[dict[
     return False
 
 
-async def _call_gpt5(prompt: str, *, effort: str | None = None, verbosity: str = "medium") -> str:
+def _gpt5_request(prompt: str, effort: str | None, verbosity: str) -> tuple[str, dict[str, str], dict[str, Any]]:
     url = f"{settings.openai_base_url.rstrip('/')}/responses"
     headers = {
         "Authorization": f"Bearer {settings.openai_api_key}",
         "Content-Type": "application/json",
     }
-    payload = {
+    payload: dict[str, Any] = {
         "model": settings.secondary_model or settings.model_name,
         "text": {"verbosity": verbosity},
         "input": [
@@ -351,20 +489,60 @@ async def _call_gpt5(prompt: str, *, effort: str | None = None, verbosity: str =
     }
     if effort:
         payload["reasoning"] = {"effort": effort}
+    return url, headers, payload
 
-    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS) as client:
-        response = await client.post(url, headers=headers, json=payload)
-        try:
-            response.raise_for_status()
-        except httpx.HTTPStatusError as exc:
-            logger.warning(
-                "gpt5_http_error",
-                status=exc.response.status_code,
-                body=exc.response.text,
-            )
-            raise
 
-    data = response.json()
+async def _call_gpt5(prompt: str, *, effort: str | None = None, verbosity: str = "medium") -> str:
+    url, headers, payload = _gpt5_request(prompt, effort, verbosity)
+    client = get_http_client("openai")
+    response = await client.post(url, headers=headers, json=payload, timeout=HTTP_TIMEOUT)
+    try:
+        response.raise_for_status()
+    except httpx.HTTPStatusError as exc:
+        logger.warning(
+            "gpt5_http_error",
+            status=exc.response.status_code,
+            body=exc.response.text,
+        )
+        raise
+
+    text = _gpt5_output_text(response.json())
+    if text is None:
+        raise RuntimeError("GPT-5 response did not include output text.")
+    return text
+
+
+async def _stream_gpt5(
+    prompt: str,
+    *,
+    effort: str | None = None,
+    verbosity: str = "medium",
+    on_token: Callable[[str], None],
+) -> str:
+    """``_call_gpt5`` with ``stream: true``; each ``output_text`` delta goes to ``on_token``."""
+    url, headers, payload = _gpt5_request(prompt, effort, verbosity)
+    payload["stream"] = True
+    parts: list[str] = []
+    completed: dict[str, Any] | None = None
+    client = get_http_client("openai")
+    async with client.stream("POST", url, headers=headers, json=payload, timeout=HTTP_TIMEOUT) as response:
+        await _raise_for_stream_status(response, "gpt5_http_error")
+        async for event in _sse_payloads(response):
+            kind = event.get("type")
+            if kind == "response.output_text.delta" and event.get("delta"):
+                parts.append(event["delta"])
+                on_token(event["delta"])
+            elif kind == "response.completed":
+                completed = event.get("response") or {}
+            elif kind in {"response.failed", "error"}:
+                raise RuntimeError(f"GPT-5 stream failed: {event.get('error') or event.get('response', {}).get('error')}")
+    text = "".join(parts) if parts else (_gpt5_output_text(completed) if completed else None)
+    if not text:
+        raise RuntimeError("GPT-5 stream did not include output text.")
+    return text
+
+
+def _gpt5_output_text(data: dict[str, Any]) -> str | None:
     if "output_text" in data:
         return "".join(data["output_text"])
 
@@ -374,13 +552,34 @@ async def _call_gpt5(prompt: str, *, effort: str | None = None, verbosity: str =
         for content in item.get("content", []):
             if content.get("type") in {"output_text", "text"}:
                 chunks.append(content.get("text", ""))
-    if chunks:
-        return "".join(chunks)
-
-    raise RuntimeError("GPT-5 response did not include output text.")
+    return "".join(chunks) if chunks else None
+
+
+async def _raise_for_stream_status(response: httpx.Response, log_event: str) -> None:
+    if response.is_success:
+        return
+    await response.aread()
+    logger.warning(log_event, status=response.status_code, body=response.text)
+    response.raise_for_status()
+
+
+async def _sse_payloads(response: httpx.Response) -> AsyncIterator[dict[str, Any]]:
+    """JSON ``data:`` payloads of an upstream event stream, ending at ``[DONE]``."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        if not data:
+            continue
+        try:
+            yield json.loads(data)
+        except json.JSONDecodeError:
+            logger.warning("upstream_stream_bad_event", data=data[:200])
 
 
-def _coerce_response(raw: str, baseline: dict[str, Any], comps: list[dict[str, Any]]) -> dict[str, Any]:
+def _coerce_response(raw: str, baseline: dict[str, Any], comps: Sequence[Mapping[str, Any]]) -> dict[str, Any]:
     try:
         parsed = json.loads(raw)
     except json.JSONDecodeError as exc:
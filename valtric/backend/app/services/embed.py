@@ -1,22 +1,275 @@
+import asyncio
+import hashlib
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Sequence
+
 import httpx
-from typing import Sequence
 
+from app.integrations.http_clients import get_http_client
+from app.services.vector_dims import supports_dimensions
 from app.settings import settings
 import structlog
 
 
 logger = structlog.get_logger(__name__)
 
+HTTP_TIMEOUT = httpx.Timeout(60.0)
+
 
 class EmbeddingError(RuntimeError):
     pass
 
 
+class EmbeddingCache:
+    """LRU + TTL cache for embedding vectors, bounded by entry count and bytes.
+
+    Vectors are stored as packed doubles so the byte budget reflects real usage
+    and cached results round-trip exactly.
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 3600.0, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._store: OrderedDict[tuple[str, str], tuple[float, array]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key: tuple[str, str]) -> list[float] | None:
+        entry = self._store.get(key)
+        if entry is None:
+            return None
+        expires_at, vector = entry
+        if expires_at < time.monotonic():
+            self._discard(key)
+            return None
+        self._store.move_to_end(key)
+        return vector.tolist()
+
+    def set(self, key: tuple[str, str], vector: Sequence[float]) -> None:
+        packed = array("d", vector)
+        size = packed.itemsize * len(packed)
+        if size > self.max_bytes:
+            return
+        self._discard(key)
+        self._store[key] = (time.monotonic() + self.ttl, packed)
+        self._bytes += size
+        while self._store and (len(self._store) > self.maxsize or self._bytes > self.max_bytes):
+            oldest = next(iter(self._store))
+            self._discard(oldest)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._store.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._store),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _discard(self, key: tuple[str, str]) -> None:
+        entry = self._store.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1].itemsize * len(entry[1])
+
+
+embedding_cache = EmbeddingCache(
+    maxsize=settings.embedding_cache_max_entries,
+    ttl=settings.embedding_cache_ttl_seconds,
+    max_bytes=settings.embedding_cache_max_bytes,
+)
+
+# In-flight upstream requests keyed like the cache, so concurrent identical
+# texts share one embeddings call (single-flight).
+_INFLIGHT: dict[tuple[str, str], asyncio.Future] = {}
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent embedding requests into shared upstream calls.
+
+    Texts queue for up to ``window_ms``; a batch is sent early once it reaches
+    ``max_batch_size`` inputs or ``max_batch_tokens`` estimated tokens. Each
+    caller gets back the vectors for its own texts, in order.
+    """
+
+    def __init__(self, window_ms: float = 5.0, max_batch_size: int = 64, max_batch_tokens: int = 32_000) -> None:
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._pending_tokens = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, texts: Sequence[str]) -> list[list[float]]:
+        loop = asyncio.get_running_loop()
+        futures: list[asyncio.Future] = []
+        for text in texts:
+            tokens = _estimate_tokens(text)
+            if self._pending and (
+                len(self._pending) >= self.max_batch_size
+                or self._pending_tokens + tokens > self.max_batch_tokens
+            ):
+                self._flush()
+            future = loop.create_future()
+            future.add_done_callback(_consume_exception)
+            self._pending.append((text, future))
+            self._pending_tokens += tokens
+            futures.append(future)
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._pending and self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000.0, self._flush)
+
+        return [await future for future in futures]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "pending": len(self._pending),
+        }
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_tokens = self._pending, [], 0
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            vectors = await _request_embeddings([text for text, _ in batch])
+            if len(vectors) != len(batch):
+                raise EmbeddingError("Embedding response count did not match the request.")
+        except Exception as exc:  # noqa: BLE001
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+
+embedding_batcher = EmbeddingBatcher(
+    window_ms=settings.embedding_batch_window_ms,
+    max_batch_size=settings.embedding_batch_max_size,
+    max_batch_tokens=settings.embedding_batch_max_tokens,
+)
+
+
 async def embed_texts(texts: Sequence[str]) -> list[list[float]]:
-    """Call OpenAI embeddings endpoint for a batch of texts."""
+    """Embed a batch of texts, serving repeats from the cache and coalescing concurrent misses."""
     if not texts:
         return []
 
+    if not settings.embedding_cache_enabled:
+        return await _embed_uncached(texts)
+
+    # Vectors at different dimensions are different embeddings.
+    model = f"{settings.embedding_model}:{settings.embedding_dimensions}"
+    loop = asyncio.get_running_loop()
+    results: list[list[float] | None] = [None] * len(texts)
+    waiting: dict[int, asyncio.Future] = {}
+    owned: dict[tuple[str, str], asyncio.Future] = {}
+    owned_texts: list[str] = []
+
+    for idx, text in enumerate(texts):
+        key = _cache_key(model, text)
+        cached = embedding_cache.get(key)
+        if cached is not None:
+            embedding_cache.hits += 1
+            results[idx] = cached
+            continue
+        future = _INFLIGHT.get(key)
+        if future is None:
+            embedding_cache.misses += 1
+            future = loop.create_future()
+            future.add_done_callback(_consume_exception)
+            _INFLIGHT[key] = future
+            owned[key] = future
+            owned_texts.append(text)
+        elif key not in owned:
+            embedding_cache.coalesced += 1
+        waiting[idx] = future
+
+    if owned:
+        await _fill_owned(owned, owned_texts)
+
+    for idx, future in waiting.items():
+        results[idx] = list(await asyncio.shield(future))
+
+    return results  # type: ignore[return-value]
+
+
+async def _fill_owned(owned: dict[tuple[str, str], asyncio.Future], texts: list[str]) -> None:
+    try:
+        vectors = await _embed_uncached(texts)
+        if len(vectors) != len(texts):
+            raise EmbeddingError("Embedding response count did not match the request.")
+    except BaseException as exc:
+        # Followers must not inherit our cancellation; surface it as an embedding failure.
+        error = exc if isinstance(exc, Exception) else EmbeddingError("Embedding request cancelled.")
+        for key, future in owned.items():
+            _INFLIGHT.pop(key, None)
+            if not future.done():
+                future.set_exception(error)
+        raise
+
+    for (key, future), vector in zip(owned.items(), vectors):
+        embedding_cache.set(key, vector)
+        _INFLIGHT.pop(key, None)
+        if not future.done():
+            future.set_result(vector)
+
+
+async def _embed_uncached(texts: Sequence[str]) -> list[list[float]]:
+    if embedding_batcher.window_ms <= 0:
+        return await _request_embeddings(texts)
+    return await embedding_batcher.submit(texts)
+
+
+def _estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; only used to size batches.
+    return len(text) // 4 + 1
+
+
+def _cache_key(model: str, text: str) -> tuple[str, str]:
+    return model, hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    # Mark exceptions as retrieved when no follower awaited the future.
+    if not future.cancelled():
+        future.exception()
+
+
+async def _request_embeddings(texts: Sequence[str]) -> list[list[float]]:
+    """Call OpenAI embeddings endpoint for a batch of texts."""
     if not settings.openai_api_key:
         raise EmbeddingError("OPENAI_API_KEY is not configured.")
 
@@ -25,15 +278,17 @@ async def embed_texts(texts: Sequence[str]) -> list[list[float]]:
         "Authorization": f"Bearer {settings.openai_api_key}",
         "Content-Type": "application/json",
     }
-    payload = {"model": settings.embedding_model, "input": list(texts)}
+    payload: dict[str, Any] = {"model": settings.embedding_model, "input": list(texts)}
+    if supports_dimensions(settings.embedding_model):
+        payload["dimensions"] = settings.embedding_dimensions
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        try:
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-        except httpx.HTTPError as exc:
-            logger.error("embedding_request_failed", error=str(exc))
-            raise EmbeddingError("Failed to fetch embeddings.") from exc
+    client = get_http_client("openai")
+    try:
+        response = await client.post(url, headers=headers, json=payload, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        logger.error("embedding_request_failed", error=str(exc))
+        raise EmbeddingError("Failed to fetch embeddings.") from exc
 
     data = response.json()
     items = data.get("data", [])
@@ -44,4 +299,11 @@ async def embed_texts(texts: Sequence[str]) -> list[list[float]]:
             received=len(items),
         )
 
-    return [item["embedding"] for item in items]
+    vectors = [item["embedding"] for item in items]
+    wrong = next((len(vector) for vector in vectors if len(vector) != settings.embedding_dimensions), None)
+    if wrong is not None:
+        logger.error("embedding_dimension_mismatch", received=wrong, expected=settings.embedding_dimensions)
+        raise EmbeddingError(
+            f"{settings.embedding_model} returned {wrong} dimensions; EMBEDDING_DIMENSIONS is {settings.embedding_dimensions}."
+        )
+    return vectors
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import structlog
+from sqlalchemy import and_, delete, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.db import SessionLocal
+from app.rag.hits import ChunkHit, as_hits
+from app.services.snapshots import snapshot_registry
+from app.settings import settings
+
+
+logger = structlog.get_logger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_PENDING_SAVES: set[asyncio.Task] = set()
+
+
+@dataclass(frozen=True)
+class EvidenceLookup:
+    """Result of a pack lookup: cached hits (if any) plus the deal's current evidence version."""
+
+    hits: list[ChunkHit] | None
+    chunk_count: int
+    max_chunk_id: int
+
+    @property
+    def version(self) -> tuple[str, str, int, int]:
+        """Same shape as ``deal_evidence_version``."""
+        return settings.embedding_model, active_snapshot_id(), self.chunk_count, self.max_chunk_id
+
+
+def evidence_pack_key(query_text: str, *, top_k: int, meta_filter: str | None = None) -> str:
+    """Hash the normalised query together with every setting that shapes the ranked result."""
+    normalized = _WHITESPACE.sub(" ", query_text.strip().lower())
+    material = {
+        "query": normalized,
+        "top_k": top_k,
+        "meta_filter": meta_filter,
+        "embedding_model": settings.embedding_model,
+        "retrieval_mode": settings.retrieval_mode,
+        "rerank_provider": settings.rerank_provider,
+        "rerank_model": settings.rerank_model,
+        "rerank_candidate_k": settings.rerank_candidate_k,
+        "mmr": [
+            settings.mmr_enabled,
+            settings.mmr_lambda,
+            settings.mmr_candidate_k,
+            settings.mmr_token_budget,
+            settings.mmr_duplicate_threshold,
+        ],
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def active_snapshot_id() -> str:
+    return snapshot_registry.current().snapshot_id or "default"
+
+
+def _evidence_version(deal_id: int):
+    return (
+        select(
+            func.count(models.Chunk.id).label("chunk_count"),
+            func.coalesce(func.max(models.Chunk.id), 0).label("max_chunk_id"),
+        )
+        .join(models.Document, models.Document.id == models.Chunk.document_id)
+        .where(models.Document.deal_id == deal_id)
+    )
+
+
+async def deal_evidence_version(db: AsyncSession, deal_id: int) -> tuple[str, str, int, int]:
+    """(embedding model, snapshot, chunk count, max chunk id): changes whenever the deal's evidence does."""
+    row = (await db.execute(_evidence_version(deal_id))).one()
+    return settings.embedding_model, active_snapshot_id(), int(row.chunk_count or 0), int(row.max_chunk_id or 0)
+
+
+async def load_evidence_pack(db: AsyncSession, deal_id: int, query_hash: str) -> EvidenceLookup:
+    """Read the deal's evidence version and any matching pack in one round trip.
+
+    A pack only matches while the deal's chunk count and max chunk id equal the
+    values recorded at save time, so ingesting new documents invalidates it.
+    """
+    version = _evidence_version(deal_id).subquery()
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.evidence_pack_ttl_seconds)
+    stmt = (
+        select(version.c.chunk_count, version.c.max_chunk_id, models.EvidencePack.top_k)
+        .select_from(version)
+        .outerjoin(
+            models.EvidencePack,
+            and_(
+                models.EvidencePack.deal_id == deal_id,
+                models.EvidencePack.snapshot_id == active_snapshot_id(),
+                models.EvidencePack.query_hash == query_hash,
+                models.EvidencePack.chunk_count == version.c.chunk_count,
+                models.EvidencePack.max_chunk_id == version.c.max_chunk_id,
+                models.EvidencePack.created_at >= cutoff,
+            ),
+        )
+    )
+    row = (await db.execute(stmt)).one()
+    return EvidenceLookup(
+        hits=as_hits(row.top_k) if row.top_k is not None else None,
+        chunk_count=int(row.chunk_count or 0),
+        max_chunk_id=int(row.max_chunk_id or 0),
+    )
+
+
+def schedule_save_evidence_pack(
+    deal_id: int,
+    query_hash: str,
+    lookup: EvidenceLookup,
+    hits: list[ChunkHit],
+) -> None:
+    """Persist the ranked hits off the request path."""
+    task = asyncio.ensure_future(save_evidence_pack(deal_id, query_hash, lookup, hits))
+    _PENDING_SAVES.add(task)
+    task.add_done_callback(_PENDING_SAVES.discard)
+
+
+async def save_evidence_pack(
+    deal_id: int,
+    query_hash: str,
+    lookup: EvidenceLookup,
+    hits: list[ChunkHit],
+) -> None:
+    snapshot_id = active_snapshot_id()
+    try:
+        async with SessionLocal() as session:
+            await session.execute(
+                delete(models.EvidencePack).where(
+                    models.EvidencePack.deal_id == deal_id,
+                    models.EvidencePack.snapshot_id == snapshot_id,
+                    models.EvidencePack.query_hash == query_hash,
+                )
+            )
+            session.add(
+                models.EvidencePack(
+                    deal_id=deal_id,
+                    snapshot_id=snapshot_id,
+                    query_hash=query_hash,
+                    chunk_count=lookup.chunk_count,
+                    max_chunk_id=lookup.max_chunk_id,
+                    top_k=[dict(hit) for hit in hits],
+                )
+            )
+            await session.commit()
+    except IntegrityError:
+        # A concurrent request saved the same pack first; theirs is equivalent.
+        logger.info("evidence_pack_save_conflict", deal_id=deal_id)
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("evidence_pack_save_failed", deal_id=deal_id, error=str(exc))
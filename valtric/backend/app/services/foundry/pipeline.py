@@ -8,6 +8,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models
 from app.integrations.supabase import get_supabase_client, vector_to_pg
+from app.services.cache import invalidate_deal_analyses
+from app.services.snapshots import SnapshotError, normalize_snapshot_id, snapshot_registry
+from app.services.vector_dims import DimensionMismatch, fit_embedding
+from app.services.vector_index import vector_index
 from app.settings import settings
 
 
@@ -65,6 +69,11 @@ async def ingest_deal_payload(db: AsyncSession, payload: dict[str, Any]) -> dict
     supabase_docs: list[dict[str, Any]] = []
     supabase_chunks: list[dict[str, Any]] = []
     supabase_embeddings: list[dict[str, Any]] = []
+    indexed_chunk_ids: list[int] = []
+    indexed_vectors: list[list[float]] = []
+    # New vectors of the active model join the active snapshot unless the payload
+    # names one; only vectors in that scope belong in the in-process index.
+    scope = await snapshot_registry.resolve(db) if settings.retrieval_scope_enabled else snapshot_registry.current()
 
     for document_payload in documents_payload:
         source_name = document_payload.get("source_name")
@@ -126,8 +135,30 @@ async def ingest_deal_payload(db: AsyncSession, payload: dict[str, Any]) -> dict
             if embedding:
                 embedding_model = chunk_payload.get("embedding_model", settings.embedding_model)
                 snapshot_id = chunk_payload.get("snapshot_id")
-
-                db.add(models.Embedding(chunk_id=chunk.id, vector=embedding))
+                if snapshot_id is not None:
+                    try:
+                        snapshot_id = normalize_snapshot_id(snapshot_id)
+                    except SnapshotError as exc:
+                        raise IngestError(f"chunk {chunk_payload.get('ord')}: {exc}") from exc
+                elif embedding_model == scope.model_name:
+                    snapshot_id = scope.snapshot_id
+                # Every model's vectors share the EMBEDDING_DIMENSIONS columns, searched or not.
+                try:
+                    embedding = fit_embedding(embedding, model=embedding_model)
+                except DimensionMismatch as exc:
+                    raise IngestError(f"chunk {chunk_payload.get('ord')}: {exc}") from exc
+
+                db.add(
+                    models.Embedding(
+                        chunk_id=chunk.id,
+                        vector=embedding,
+                        model_name=embedding_model,
+                        snapshot_id=snapshot_id,
+                    )
+                )
+                if scope.matches(embedding_model, snapshot_id):
+                    indexed_chunk_ids.append(chunk.id)
+                    indexed_vectors.append(embedding)
 
                 supabase_embedding = {
                     "chunk_id": chunk.id,
@@ -140,6 +171,8 @@ async def ingest_deal_payload(db: AsyncSession, payload: dict[str, Any]) -> dict
                 supabase_embeddings.append(supabase_embedding)
 
     await db.commit()
+    vector_index.append(deal.id, indexed_chunk_ids, indexed_vectors)
+    invalidate_deal_analyses(deal.id)
 
     supabase_client = get_supabase_client()
     if supabase_client:
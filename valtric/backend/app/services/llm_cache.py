@@ -0,0 +1,198 @@
+"""Persistent cache of LLM completions keyed by the canonical request.
+
+A completion is reused only when everything that shapes it is identical:
+provider, model, reasoning effort, verbosity, system prompt, prompt version
+and the fully rendered user prompt (deal fields, packed comparable set,
+question). Entries live in an in-process LRU in front of a SQLite file, so
+they survive restarts and are shared by every worker on the host; both tiers
+expire after ``llm_cache_ttl_seconds``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+import structlog
+
+from app.settings import settings
+
+
+logger = structlog.get_logger(__name__)
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS completions ("
+    "key TEXT PRIMARY KEY, text TEXT NOT NULL, expires_at REAL NOT NULL)"
+)
+# Expired rows are deleted on every Nth write to the file.
+_PURGE_EVERY_WRITES = 64
+
+
+def completion_key(
+    *,
+    provider: str,
+    model: str,
+    effort: str | None,
+    verbosity: str | None,
+    system: str,
+    prompt: str,
+) -> str:
+    canonical = json.dumps(
+        [provider, model, effort, verbosity, settings.prompt_version, system, prompt],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """LRU + TTL completion cache over an optional SQLite file (``path=None`` => memory only)."""
+
+    def __init__(self, path: str | None, maxsize: int = 1024, ttl: float = 86_400.0) -> None:
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # Wall-clock expiry, since disk entries are shared across processes.
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._disk_writes = 0
+
+    async def get(self, key: str) -> str | None:
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, text = entry
+            if expires_at >= now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return text
+            self._memory.pop(key, None)
+
+        if self.path is not None:
+            row = await asyncio.to_thread(self._disk_get, key, now)
+            if row is not None:
+                self._remember(key, *row)
+                self.hits += 1
+                self.disk_hits += 1
+                return row[1]
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, text: str) -> None:
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, text)
+        if self.path is not None:
+            await asyncio.to_thread(self._disk_set, key, text, expires_at)
+
+    async def get_or_call(
+        self,
+        key: str,
+        call: Callable[[], Awaitable[str]],
+        *,
+        bypass: bool = False,
+        cacheable: Callable[[str], bool] = bool,
+    ) -> tuple[str, str]:
+        """Return ``(text, status)``, status being ``hit``, ``miss`` or ``bypass``.
+
+        A bypassed call still refreshes the entry, so forcing one fresh answer
+        also replaces a stale or bad cached one. Completions ``cacheable``
+        rejects (e.g. unparseable JSON) are returned but never stored.
+        """
+        if not bypass:
+            cached = await self._safe(self.get(key))
+            if cached is not None:
+                return cached, "hit"
+        text = await call()
+        if cacheable(text):
+            await self._safe(self.set(key, text))
+        return text, "bypass" if bypass else "miss"
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self.path is not None and os.path.exists(self.path):
+            try:
+                with self._lock:
+                    self._connection().execute("DELETE FROM completions")
+            except (sqlite3.Error, OSError) as exc:
+                self._disable_disk(exc)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    async def _safe(self, operation: Awaitable[Any]) -> Any:
+        # A broken cache file (or an unwritable directory) must never fail the
+        # analysis it is meant to speed up.
+        try:
+            return await operation
+        except (sqlite3.Error, OSError) as exc:
+            self._disable_disk(exc)
+            return None
+
+    def _disable_disk(self, exc: Exception) -> None:
+        """Fall back to memory only, so a read-only filesystem costs one warning, not one per call."""
+        logger.warning("llm_cache_unavailable", path=self.path, error=str(exc))
+        self.path = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _remember(self, key: str, expires_at: float, text: str) -> None:
+        self._memory[key] = (expires_at, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            # WAL lets other workers read while one writes.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _disk_get(self, key: str, now: float) -> tuple[float, str] | None:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT expires_at, text FROM completions WHERE key = ? AND expires_at >= ?", (key, now)
+            ).fetchone()
+
+    def _disk_set(self, key: str, text: str, expires_at: float) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO completions (key, text, expires_at) VALUES (?, ?, ?)",
+                (key, text, expires_at),
+            )
+            self._disk_writes += 1
+            if self._disk_writes % _PURGE_EVERY_WRITES == 0:
+                conn.execute("DELETE FROM completions WHERE expires_at < ?", (time.time(),))
+
+
+completion_cache = CompletionCache(
+    settings.llm_cache_path,
+    maxsize=settings.llm_cache_max_entries,
+    ttl=settings.llm_cache_ttl_seconds,
+)
@@ -1,6 +1,12 @@
-import httpx
+import hashlib
+import time
+from collections import OrderedDict
 from typing import Any, Sequence
 
+import httpx
+
+from app.integrations.http_clients import get_http_client
+from app.rag.rerank import local_rerank
 from app.settings import settings
 import structlog
 
@@ -13,26 +19,161 @@ class RerankError(RuntimeError):
 
 
 HTTP_TIMEOUT = httpx.Timeout(connect=3.0, read=25.0, write=10.0, pool=3.0)
-HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
-
 
-async def rerank_documents(query: str, documents: Sequence[str], top_k: int = 5) -> list[dict[str, Any]]:
-    """Apply Cohere Rerank v3 when available, otherwise fall back to a local BGE reranker."""
+# While BGE is in cooldown after a failure, requests go straight to the local reranker.
+_bge_retry_at = 0.0
+
+
+class RerankCache:
+    """LRU + TTL cache of relevance scores keyed by (provider, model, query, chunk content hash).
+
+    Cross-encoder scores are computed per (query, document) pair, so entries for
+    individual candidates can be reused across different candidate sets: a
+    repeated query only sends the chunks it has not scored before upstream.
+    """
+
+    def __init__(self, maxsize: int = 8192, ttl: float = 900.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._store: OrderedDict[tuple[str, str], tuple[float, float]] = OrderedDict()
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.documents_cached = 0
+        self.documents_sent = 0
+
+    def lookup(self, query_key: str, hashes: Sequence[str]) -> dict[int, float]:
+        """Return cached scores by candidate position and count the lookup."""
+        now = time.monotonic()
+        found: dict[int, float] = {}
+        for idx, doc_hash in enumerate(hashes):
+            key = (query_key, doc_hash)
+            entry = self._store.get(key)
+            if entry is None:
+                continue
+            expires_at, score = entry
+            if expires_at < now:
+                self._store.pop(key, None)
+                continue
+            self._store.move_to_end(key)
+            found[idx] = score
+
+        if len(found) == len(hashes):
+            self.hits += 1
+        elif found:
+            self.partial_hits += 1
+        else:
+            self.misses += 1
+        self.documents_cached += len(found)
+        self.documents_sent += len(hashes) - len(found)
+        return found
+
+    def store(self, query_key: str, scores: dict[str, float]) -> None:
+        expires_at = time.monotonic() + self.ttl
+        for doc_hash, score in scores.items():
+            key = (query_key, doc_hash)
+            self._store[key] = (expires_at, score)
+            self._store.move_to_end(key)
+        while len(self._store) > self.maxsize:
+            self._store.popitem(last=False)
+
+    def clear(self) -> None:
+        self._store.clear()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.partial_hits + self.misses
+        return {
+            "entries": len(self._store),
+            "hits": self.hits,
+            "partial_hits": self.partial_hits,
+            "misses": self.misses,
+            "documents_cached": self.documents_cached,
+            "documents_sent": self.documents_sent,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+rerank_cache = RerankCache(
+    maxsize=settings.rerank_cache_max_entries,
+    ttl=settings.rerank_cache_ttl_seconds,
+)
+
+
+async def rerank_documents(
+    query: str,
+    documents: Sequence[str],
+    top_k: int = 5,
+    *,
+    hashes: Sequence[str] | None = None,
+    sections: Sequence[str | None] | None = None,
+) -> list[dict[str, Any]]:
+    """Apply Cohere Rerank v3 when available, otherwise fall back to a local BGE reranker.
+
+    ``rerank_provider=local`` scores in-process with ``app.rag.rerank``, which is
+    also the fallback whenever BGE is unconfigured or unreachable.
+
+    ``hashes`` are content hashes of ``documents`` (``Chunk.hash``); when omitted
+    the text itself is hashed. Scores are served from ``rerank_cache`` where possible.
+    ``sections`` (one per document) feed the local reranker's section prior.
+    """
     if not documents:
         return []
 
     if settings.rerank_provider in {None, "", "none"}:
         logger.info("rerank_disabled", provider=settings.rerank_provider or "none")
-        return [{"index": idx, "document": doc, "relevance_score": 0.0} for idx, doc in enumerate(documents[:top_k])]
-
-    if settings.rerank_provider == "cohere" and settings.cohere_api_key:
-        return await _cohere_rerank(query, documents, top_k)
-
-    logger.info("rerank_fallback_bge", provider=settings.rerank_provider)
-    return await _bge_rerank(query, documents, top_k)
-
-
-async def _cohere_rerank(query: str, documents: Sequence[str], top_k: int) -> list[dict[str, Any]]:
+        return _passthrough(documents, top_k)
+
+    if settings.rerank_provider == "local":
+        return local_rerank(query, documents, top_k, sections=sections)
+
+    use_cohere = settings.rerank_provider == "cohere" and bool(settings.cohere_api_key)
+    if not use_cohere:
+        if not settings.bge_rerank_url or time.monotonic() < _bge_retry_at:
+            return local_rerank(query, documents, top_k, sections=sections)
+        logger.info("rerank_fallback_bge", provider=settings.rerank_provider)
+
+    try:
+        scores = await _cached_scores(query, documents, hashes, use_cohere=use_cohere)
+    except RerankError:
+        if use_cohere:
+            raise
+        _start_bge_cooldown()
+        return local_rerank(query, documents, top_k, sections=sections)
+
+    order = sorted(scores, key=lambda idx: scores[idx], reverse=True)[:top_k]
+    return [{"index": idx, "document": documents[idx], "relevance_score": scores[idx]} for idx in order]
+
+
+async def _cached_scores(
+    query: str,
+    documents: Sequence[str],
+    hashes: Sequence[str] | None,
+    *,
+    use_cohere: bool,
+) -> dict[int, float]:
+    score_fn = _cohere_scores if use_cohere else _bge_scores
+    if not settings.rerank_cache_enabled:
+        return await score_fn(query, documents)
+
+    provider = "cohere" if use_cohere else "bge"
+    query_key = _hash_text(f"{provider}\x00{settings.rerank_model}\x00{query}")
+    doc_hashes = list(hashes) if hashes is not None else [_hash_text(doc) for doc in documents]
+    if len(doc_hashes) != len(documents):
+        raise ValueError("hashes must align with documents")
+
+    scores = rerank_cache.lookup(query_key, doc_hashes)
+    missing = [idx for idx in range(len(documents)) if idx not in scores]
+    if missing:
+        fresh = await score_fn(query, [documents[idx] for idx in missing])
+        rerank_cache.store(query_key, {doc_hashes[missing[pos]]: score for pos, score in fresh.items()})
+        for pos, score in fresh.items():
+            scores[missing[pos]] = score
+
+    logger.info("rerank_cache", provider=provider, cached=len(documents) - len(missing), sent=len(missing))
+    return scores
+
+
+async def _cohere_scores(query: str, documents: Sequence[str]) -> dict[int, float]:
     url = f"{settings.cohere_base_url.rstrip('/')}/rerank"
     headers = {
         "Authorization": f"Bearer {settings.cohere_api_key}",
@@ -42,65 +183,65 @@ async def _cohere_rerank(query: str, documents: Sequence[str], top_k: int) -> li
         "model": settings.rerank_model,
         "query": query,
         "documents": list(documents),
-        "top_n": top_k,
+        "top_n": len(documents),
     }
 
-    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS) as client:
-        try:
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-        except httpx.HTTPError as exc:
-            logger.error("cohere_rerank_failed", error=str(exc))
-            raise RerankError("Cohere rerank request failed.") from exc
+    client = get_http_client("cohere")
+    try:
+        response = await client.post(url, headers=headers, json=payload, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        logger.error("cohere_rerank_failed", error=str(exc))
+        raise RerankError("Cohere rerank request failed.") from exc
 
     data = response.json()
-    results = data.get("results", [])
-    ranked = []
-    for item in results:
+    scores: dict[int, float] = {}
+    for item in data.get("results", []):
         idx = item.get("index")
         if idx is None or idx >= len(documents):
             continue
-        ranked.append(
-            {
-                "index": idx,
-                "document": documents[idx],
-                "relevance_score": item.get("relevance_score", 0.0),
-            }
-        )
-    return ranked
-
-
-async def _bge_rerank(query: str, documents: Sequence[str], top_k: int) -> list[dict[str, Any]]:
-    """Fallback to a local BGE reranker if configured, else return original ordering."""
+        scores[idx] = float(item.get("relevance_score", 0.0))
+    return scores
+
+
+async def _bge_scores(query: str, documents: Sequence[str]) -> dict[int, float]:
+    """Score with a local BGE reranker service; raises when it is missing or unreachable."""
     if not settings.bge_rerank_url:
         logger.warning("bge_rerank_url_missing")
-        return [{"index": idx, "document": doc, "relevance_score": 0.0} for idx, doc in enumerate(documents[:top_k])]
+        raise RerankError("BGE rerank URL is not configured.")
 
     url = settings.bge_rerank_url
-    payload = {"query": query, "documents": list(documents), "top_k": top_k}
+    payload = {"query": query, "documents": list(documents), "top_k": len(documents)}
 
-    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS) as client:
-        try:
-            response = await client.post(url, json=payload)
-            response.raise_for_status()
-        except httpx.HTTPError as exc:
-            logger.error("bge_rerank_failed", error=str(exc))
-            return [{"index": idx, "document": doc, "relevance_score": 0.0} for idx, doc in enumerate(documents[:top_k])]
+    client = get_http_client("bge")
+    try:
+        response = await client.post(url, json=payload, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        logger.error("bge_rerank_failed", error=str(exc))
+        raise RerankError("BGE rerank request failed.") from exc
 
     data = response.json()
-    results = data.get("results", [])
-    ranked = []
-    for item in results:
+    scores: dict[int, float] = {}
+    for item in data.get("results", []):
         idx = item.get("index")
         if idx is None or idx >= len(documents):
             continue
-        ranked.append(
-            {
-                "index": idx,
-                "document": documents[idx],
-                "relevance_score": item.get("score", item.get("relevance_score", 0.0)),
-            }
-        )
-    if not ranked:
-        return [{"index": idx, "document": doc, "relevance_score": 0.0} for idx, doc in enumerate(documents[:top_k])]
-    return ranked
+        scores[idx] = float(item.get("score", item.get("relevance_score", 0.0)))
+    if not scores:
+        raise RerankError("BGE rerank returned no scores.")
+    return scores
+
+
+def _start_bge_cooldown() -> None:
+    global _bge_retry_at
+    _bge_retry_at = time.monotonic() + settings.bge_rerank_cooldown_seconds
+    logger.info("rerank_fallback_local", cooldown_s=settings.bge_rerank_cooldown_seconds)
+
+
+def _passthrough(documents: Sequence[str], top_k: int) -> list[dict[str, Any]]:
+    return [{"index": idx, "document": doc, "relevance_score": 0.0} for idx, doc in enumerate(documents[:top_k])]
+
+
+def _hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -1,23 +1,52 @@
 from __future__ import annotations
 
-from typing import Any, Sequence
+from typing import Any, Mapping, Sequence
 
 import asyncio
+import re
+import time
+from collections import deque
+
 import httpx
+import numpy as np
 import structlog
-from sqlalchemy import select
+from sqlalchemy import Integer, and_, cast, column, func, literal, literal_column, or_, select, text, true, type_coerce, values
+from sqlalchemy.dialects.postgresql import JSONB, JSONPATH
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models
-from app.services.embed import embed_texts
+from app.db import SessionLocal
+from app.integrations.http_clients import get_http_client
+from app.integrations.supabase import pg_to_vector, vector_to_pg
+from app.integrations.vector_codec import HALFVEC, Vector
+from app.rag.filters import meta_filter_path
+from app.rag.hits import ChunkHit, HitBatch, as_hits
+from app.rag.mmr import hashed_term_vectors, mmr_select, normalize_relevance
+from app.rag.pack import estimate_tokens
+from app.rag.rerank import local_rerank
+from app.services.chunk_store import (
+    apply_chunk_rows,
+    fetch_chunk_rows,
+    hydrate_hits,
+    load_chunk_rows,
+    missing_text_ids,
+)
+from app.services.embed import embed_texts, embedding_cache
+from app.services.evidence_packs import (
+    EvidenceLookup,
+    evidence_pack_key,
+    load_evidence_pack,
+    schedule_save_evidence_pack,
+)
 from app.services.rerank import rerank_documents
+from app.services.snapshots import RetrievalScope, snapshot_registry
+from app.services.vector_index import vector_index
 from app.settings import settings
 
 
 logger = structlog.get_logger(__name__)
 
 HTTP_TIMEOUT = httpx.Timeout(connect=3.0, read=25.0, write=10.0, pool=3.0)
-HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
 _RERANK_SEM = asyncio.Semaphore(settings.rerank_max_concurrency)
 
 
@@ -27,32 +56,448 @@ async def get_similar_chunks(
     question: str | None = None,
     db: AsyncSession | None = None,
     top_k: int = 5,
-) -> list[dict[str, Any]]:
-    """Retrieve semantically similar chunks for the deal via Supabase (preferred) or local pgvector fallback."""
+    filters: Mapping[str, Any] | None = None,
+    query_vector: Sequence[float] | None = None,
+    pack_lookup: EvidenceLookup | None = None,
+) -> list[ChunkHit]:
+    """Retrieve similar chunks for the deal via Supabase (preferred) or local pgvector fallback.
+
+    ``settings.retrieval_mode`` selects pure vector search, lexical-only search, or a
+    hybrid that fuses both rankings with reciprocal rank fusion. When the embedding
+    upstream fails, lexical search answers on its own if enabled.
+
+    ``filters`` restrict candidates by ``chunks.meta`` (e.g. ``{"sector": "SaaS",
+    "year": [2023, 2024]}``; see ``app.rag.filters``) inside the search itself.
+
+    ``query_vector`` is the embedding of the composed query text when the caller
+    already has it (see ``embed_question_and_query``); ``pack_lookup`` is a
+    ``lookup_evidence_pack`` result for the same arguments, saving a second lookup.
+    """
+    meta_filter = meta_filter_path(filters)
     query_text = _compose_query_text(deal, question)
+    lexical_text = question or query_text
+    deal_id = deal.get("id")
+    mode = settings.retrieval_mode
+    use_rerank = settings.rerank_provider not in {None, "", "none"}
+    candidate_k, keep_k = _candidate_pool_sizes(top_k, use_rerank=use_rerank)
+    if settings.retrieval_scope_enabled and db is not None:
+        # Supabase resolves the active snapshot itself; local search needs it here.
+        await snapshot_registry.resolve(db)
+
+    if pack_lookup is None:
+        pack_lookup = await lookup_evidence_pack(deal, question=question, db=db, top_k=top_k, filters=filters)
+    if pack_lookup is not None:
+        # Chunks ingested elsewhere (another worker, a script) retire this process's copy.
+        vector_index.observe_version(deal_id, pack_lookup.version)
+    if pack_lookup is not None and pack_lookup.hits:
+        logger.info("evidence_pack_hit", deal_id=deal_id, hits=len(pack_lookup.hits))
+        return pack_lookup.hits
+
+    lexical_task: asyncio.Task | None = None
+    if mode in {"hybrid", "lexical"}:
+        lexical_task = asyncio.create_task(
+            _lexical_search(lexical_text, deal_id=deal_id, top_k=candidate_k, db=db, meta_filter=meta_filter)
+        )
+
+    if mode == "lexical":
+        hits = await lexical_task
+    else:
+        if query_vector is None:
+            query_vector = await _embed_query(query_text)
+        if query_vector is None:
+            if lexical_task is None and settings.lexical_fallback_enabled:
+                lexical_task = asyncio.create_task(
+                    _lexical_search(lexical_text, deal_id=deal_id, top_k=candidate_k, db=db, meta_filter=meta_filter)
+                )
+            hits = await lexical_task if lexical_task is not None else []
+            logger.info("lexical_fallback", hits=len(hits), enabled=lexical_task is not None)
+        else:
+            # The lexical query overlaps the embedding round trip; it must finish
+            # before vector search because both may share the caller's AsyncSession.
+            lexical_hits = await lexical_task if lexical_task is not None else None
+            vector_hits = await _vector_search(
+                query_vector, deal_id=deal_id, top_k=candidate_k, db=db, meta_filter=meta_filter
+            )
+            if lexical_hits is None:
+                hits = vector_hits
+            else:
+                hits = _reciprocal_rank_fusion([vector_hits, lexical_hits], top_k=candidate_k)
+                logger.info(
+                    "hybrid_fusion",
+                    vector_hits=len(vector_hits),
+                    lexical_hits=len(lexical_hits),
+                    fused=len(hits),
+                )
+
+    if not hits:
+        return []
+
+    hits = as_hits(hits)
+    if _rerank_needs_text(hits, use_rerank=use_rerank, top_k=top_k):
+        hits = await hydrate_hits(db, hits)
+    ranked_hits, rerank_info = await _maybe_rerank(
+        query_text, hits, use_rerank=use_rerank, top_k=top_k, keep=keep_k
+    )
+    ranked_hits = await hydrate_hits(db, ranked_hits)
+    logger.info(
+        "rerank_summary",
+        provider=rerank_info.get("provider"),
+        used_rerank=rerank_info.get("used_rerank"),
+        fallback_used=rerank_info.get("fallback_used"),
+        candidate_k=rerank_info.get("candidate_k"),
+        rerank_k=rerank_info.get("rerank_k"),
+        skipped=rerank_info.get("skipped"),
+        score_gap=rerank_info.get("score_gap"),
+        rerank_ms=rerank_info.get("rerank_ms"),
+    )
+    ranked_hits = await _diversify(db, ranked_hits, deal_id=deal_id, top_k=top_k)
+    if pack_lookup is not None:
+        pack_key = evidence_pack_key(query_text, top_k=top_k, meta_filter=meta_filter)
+        schedule_save_evidence_pack(deal_id, pack_key, pack_lookup, ranked_hits)
+    return ranked_hits
+
+
+async def lookup_evidence_pack(
+    deal: dict[str, Any],
+    *,
+    question: str | None = None,
+    db: AsyncSession | None = None,
+    top_k: int = 5,
+    filters: Mapping[str, Any] | None = None,
+) -> EvidenceLookup | None:
+    """The deal's evidence version plus the pack ``get_similar_chunks`` would serve, if any.
+
+    ``None`` when packs are off or the lookup fails.
+    """
+    deal_id = deal.get("id")
+    if db is None or deal_id is None or not settings.evidence_pack_cache_enabled:
+        return None
+    if settings.retrieval_scope_enabled:
+        # The pack is keyed by the active snapshot.
+        await snapshot_registry.resolve(db)
+    pack_key = evidence_pack_key(
+        _compose_query_text(deal, question), top_k=top_k, meta_filter=meta_filter_path(filters)
+    )
+    try:
+        return await load_evidence_pack(db, deal_id, pack_key)
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("evidence_pack_lookup_failed", deal_id=deal_id, error=str(exc))
+        return None
+
+
+async def get_similar_chunks_many(
+    requests: Sequence[tuple[dict[str, Any], str | None]],
+    *,
+    db: AsyncSession | None = None,
+    top_k: int = 5,
+) -> list[list[ChunkHit]]:
+    """Retrieve chunks for many ``(deal, question)`` pairs as one batch.
+
+    All queries share a single embeddings request. Local search runs as one SQL
+    statement (a LATERAL top-k per query vector) instead of one per deal, and
+    reranking fans out under the shared rerank semaphore. Results are returned in
+    request order.
+    """
+    if not requests:
+        return []
+
+    query_texts = [_compose_query_text(deal, question) for deal, question in requests]
+    lexical_texts = [question or query for (_, question), query in zip(requests, query_texts)]
+    deal_ids = [deal.get("id") for deal, _ in requests]
+    mode = settings.retrieval_mode
+    use_rerank = settings.rerank_provider not in {None, "", "none"}
+    candidate_k, keep_k = _candidate_pool_sizes(top_k, use_rerank=use_rerank)
+    if settings.retrieval_scope_enabled and db is not None:
+        # Supabase resolves the active snapshot itself; local search needs it here.
+        await snapshot_registry.resolve(db)
+
+    lexical_hits: list[list[ChunkHit]] | None = None
+    if mode in {"hybrid", "lexical"}:
+        lexical_hits = await _lexical_search_many(lexical_texts, deal_ids, top_k=candidate_k, db=db)
+
+    if mode == "lexical":
+        results = lexical_hits or [[] for _ in requests]
+    else:
+        query_vectors = await _embed_queries(query_texts)
+        if query_vectors is None:
+            if lexical_hits is None and settings.lexical_fallback_enabled:
+                lexical_hits = await _lexical_search_many(lexical_texts, deal_ids, top_k=candidate_k, db=db)
+            results = lexical_hits or [[] for _ in requests]
+            logger.info("lexical_fallback", batch=len(requests), enabled=lexical_hits is not None)
+        else:
+            vector_hits = await _vector_search_many(query_vectors, deal_ids, top_k=candidate_k, db=db)
+            if lexical_hits is None:
+                results = vector_hits
+            else:
+                results = [
+                    _reciprocal_rank_fusion([vec, lex], top_k=candidate_k)
+                    for vec, lex in zip(vector_hits, lexical_hits)
+                ]
+
+    results = [as_hits(hits) for hits in results]
+    results = await _hydrate_many(
+        db, results, [_rerank_needs_text(hits, use_rerank=use_rerank, top_k=top_k) for hits in results]
+    )
+    reranked = await asyncio.gather(
+        *(
+            _maybe_rerank(query, hits, use_rerank=use_rerank, top_k=top_k, keep=keep_k)
+            for query, hits in zip(query_texts, results)
+        )
+    )
+    survivors = await _hydrate_many(db, [hits for hits, _ in reranked], [True] * len(reranked))
+    logger.info(
+        "batch_retrieval_summary",
+        batch=len(requests),
+        empty=sum(1 for hits in results if not hits),
+        reranked=sum(1 for _, info in reranked if info.get("used_rerank")),
+        rerank_fallbacks=sum(1 for _, info in reranked if info.get("fallback_used")),
+        rerank_skipped=sum(1 for _, info in reranked if info.get("skipped")),
+    )
+    # Sequential: the lookups for lexical-only candidates share the caller's session.
+    return [await _diversify(db, hits, deal_id=deal_id, top_k=top_k) for hits, deal_id in zip(survivors, deal_ids)]
+
+
+async def _hydrate_many(
+    db: AsyncSession | None,
+    results: list[list[ChunkHit]],
+    selected: Sequence[bool],
+) -> list[list[ChunkHit]]:
+    """Hydrate the selected hit lists with one keyed query (one AsyncSession cannot run them concurrently)."""
+    positions = [pos for pos, wanted in enumerate(selected) if wanted and results[pos]]
+    if not positions:
+        return results
+    rows: dict[int, dict[str, Any]] = {}
+    if db is not None:
+        missing = [chunk_id for pos in positions for chunk_id in missing_text_ids(results[pos])]
+        rows = await load_chunk_rows(db, list(dict.fromkeys(missing)))
+    hydrated = list(results)
+    for pos in positions:
+        hydrated[pos] = apply_chunk_rows(results[pos], rows, drop_missing=db is not None)
+    return hydrated
+
+
+async def _embed_queries(query_texts: Sequence[str]) -> list[list[float]] | None:
+    embed_start = time.perf_counter()
+    try:
+        embeddings = await embed_texts(list(query_texts))
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("embedding_failed", error=str(exc), batch=len(query_texts))
+        return None
+    finally:
+        logger.info(
+            "query_embedding",
+            embed_ms=(time.perf_counter() - embed_start) * 1000,
+            batch=len(query_texts),
+            cache=embedding_cache.stats(),
+        )
+
+    if len(embeddings) != len(query_texts):
+        logger.info("embedding_empty_output", batch=len(query_texts), received=len(embeddings))
+        return None
+    return embeddings
+
+
+async def _lexical_search_many(
+    query_texts: Sequence[str],
+    deal_ids: Sequence[Any | None],
+    *,
+    top_k: int,
+    db: AsyncSession | None,
+) -> list[list[ChunkHit]]:
+    if db is not None:
+        # A shared AsyncSession cannot run statements concurrently.
+        return [
+            await _lexical_search(query, deal_id=deal_id, top_k=top_k, db=db)
+            for query, deal_id in zip(query_texts, deal_ids)
+        ]
+    return list(
+        await asyncio.gather(
+            *(
+                _lexical_search(query, deal_id=deal_id, top_k=top_k, db=None)
+                for query, deal_id in zip(query_texts, deal_ids)
+            )
+        )
+    )
+
+
+async def _vector_search_many(
+    query_vectors: Sequence[Sequence[float]],
+    deal_ids: Sequence[Any | None],
+    *,
+    top_k: int,
+    db: AsyncSession | None,
+) -> list[list[ChunkHit]]:
+    results: list[list[ChunkHit]] = [[] for _ in query_vectors]
+    pending = list(range(len(query_vectors)))
+
+    if settings.supabase_url and settings.supabase_service_role_key:
+        semaphore = asyncio.Semaphore(settings.retrieval_batch_concurrency)
+
+        async def one(idx: int) -> list[ChunkHit]:
+            async with semaphore:
+                return await _timed_supabase_vector_search(query_vectors[idx], top_k=top_k, deal_id=deal_ids[idx])
+
+        outcomes = await asyncio.gather(*(one(idx) for idx in pending), return_exceptions=True)
+        failed = 0
+        for idx, outcome in zip(pending, outcomes):
+            if isinstance(outcome, BaseException):
+                failed += 1
+            else:
+                results[idx] = outcome
+        pending = [idx for idx in pending if not results[idx]]
+        logger.info("supabase_vector_search_many", batch=len(query_vectors), failed=failed, unanswered=len(pending))
 
+    if pending and db is not None:
+        try:
+            local_hits = await _local_vector_search_many(
+                db,
+                [query_vectors[idx] for idx in pending],
+                [deal_ids[idx] for idx in pending],
+                top_k=top_k,
+            )
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("local_vector_search_many_failed", error=str(exc), batch=len(pending))
+        else:
+            for idx, hits in zip(pending, local_hits):
+                results[idx] = hits
+            logger.info("local_vector_search_many", batch=len(pending), hits=sum(len(h) for h in local_hits))
+
+    return results
+
+
+async def _local_vector_search_many(
+    db: AsyncSession,
+    query_vectors: Sequence[Sequence[float]],
+    deal_ids: Sequence[Any | None],
+    *,
+    top_k: int,
+) -> list[list[ChunkHit]]:
+    """Serve warm deals from the in-process index and the rest with one LATERAL query."""
+    results: list[list[ChunkHit]] = [[] for _ in query_vectors]
+    indexed_positions: list[int] = []
+    ranked: list[tuple[Any, Any]] = []
+    sql_positions: list[int] = []
+
+    for pos, (vector, deal_id) in enumerate(zip(query_vectors, deal_ids)):
+        index = vector_index.lookup(deal_id) if settings.vector_index_enabled and deal_id is not None else None
+        if index is not None and index.dim in (0, len(vector)):
+            indexed_positions.append(pos)
+            ranked.append(index.search(vector, top_k))
+        else:
+            sql_positions.append(pos)
+
+    if indexed_positions:
+        # Columnar until the end: one id array for the row fetch, hits built once per query.
+        batch = HitBatch.from_ranked(ranked)
+        rows = None if _two_phase() else await fetch_chunk_rows(db, batch.unique_ids())
+        for query, pos in enumerate(indexed_positions):
+            hits = batch.hits(query)
+            if rows is not None:
+                hits = [hit.with_row(rows[hit.chunk_id]) for hit in hits if hit.chunk_id in rows]
+            results[pos] = hits
+
+    if sql_positions:
+        await _apply_search_params(
+            db, _ann_limit(top_k), filtered=any(deal_ids[pos] is not None for pos in sql_positions)
+        )
+        stmt = _batch_vector_statement(
+            [query_vectors[pos] for pos in sql_positions],
+            [deal_ids[pos] for pos in sql_positions],
+            top_k=top_k,
+        )
+        for row in (await db.execute(stmt)).mappings().all():
+            results[sql_positions[row["ord"]]].append(_vector_row_hit(row))
+
+    return results
+
+
+def _batch_vector_statement(
+    query_vectors: Sequence[Sequence[float]],
+    deal_ids: Sequence[Any | None],
+    *,
+    top_k: int,
+):
+    """``VALUES`` list of query vectors, each joined LATERAL to its own deal-filtered top-k."""
+    dim = len(query_vectors[0]) if query_vectors else None
+    queries = values(
+        column("ord", Integer),
+        column("embedding", Vector(dim)),
+        column("deal_id", Integer),
+        name="q",
+    ).data([(ord_, list(vector), deal_id) for ord_, (vector, deal_id) in enumerate(zip(query_vectors, deal_ids))])
+    # VALUES columns built from bind parameters resolve to text server-side; cast them back.
+    query_ord = cast(queries.c.ord, Integer)
+    query_vector = cast(queries.c.embedding, Vector(dim))
+    query_deal_id = cast(queries.c.deal_id, Integer)
+
+    top = _nearest_chunks_select(
+        query_vector,
+        cast(queries.c.embedding, HALFVEC(dim)),
+        or_(query_deal_id.is_(None), models.Document.deal_id == query_deal_id),
+        top_k=top_k,
+        scope=_retrieval_scope(),
+        ids_only=_two_phase(),
+    ).lateral("hits")
+    return (
+        select(query_ord.label("ord"), top)
+        .select_from(queries.join(top, true()))
+        .order_by(query_ord, top.c.distance.asc())
+    )
+
+
+async def embed_question_and_query(
+    deal: dict[str, Any], question: str
+) -> tuple[list[float], list[float]] | None:
+    """Embeddings of the bare ``question`` and of the query ``get_similar_chunks`` searches with.
+
+    One embedding call for both. The composed query also carries the deal's
+    fields, which every question about the deal shares, so only the bare
+    question tells two questions apart.
+    """
+    embeddings = await _embed_queries([question, _compose_query_text(deal, question)])
+    if embeddings is None:
+        return None
+    return embeddings[0], embeddings[1]
+
+
+async def _embed_query(query_text: str) -> list[float] | None:
+    embed_start = time.perf_counter()
     try:
         embeddings = await embed_texts([query_text])
     except Exception as exc:  # noqa: BLE001
         logger.warning("embedding_failed", error=str(exc))
-        return []
+        return None
+    finally:
+        logger.info(
+            "query_embedding",
+            embed_ms=(time.perf_counter() - embed_start) * 1000,
+            cache=embedding_cache.stats(),
+        )
 
     if not embeddings:
         logger.info("embedding_empty_output", query=query_text)
-        return []
+        return None
+    return embeddings[0]
 
-    query_vector = embeddings[0]
 
-    hits: list[dict[str, Any]] = []
+async def _vector_search(
+    query_vector: Sequence[float],
+    *,
+    deal_id: Any | None,
+    top_k: int,
+    db: AsyncSession | None,
+    meta_filter: str | None = None,
+) -> list[ChunkHit]:
+    supabase_enabled = bool(settings.supabase_url and settings.supabase_service_role_key)
+    if supabase_enabled and db is not None and settings.vector_search_hedge_mode in {"hedged", "parallel"}:
+        return await _hedged_vector_search(query_vector, deal_id=deal_id, top_k=top_k, meta_filter=meta_filter)
 
-    deal_id = deal.get("id")
+    hits: list[ChunkHit] = []
 
-    if settings.supabase_url and settings.supabase_service_role_key:
+    if supabase_enabled:
         try:
-            supabase_hits = await _supabase_vector_search(
-                query_vector,
-                top_k=top_k,
-                deal_id=deal_id,
+            supabase_hits = await _timed_supabase_vector_search(
+                query_vector, top_k=top_k, deal_id=deal_id, meta_filter=meta_filter
             )
             logger.info("supabase_vector_search", hits=len(supabase_hits))
             hits = supabase_hits
@@ -66,26 +511,324 @@ async def get_similar_chunks(
                 query_vector,
                 deal_id=deal_id,
                 top_k=top_k,
+                meta_filter=meta_filter,
             )
             logger.info("local_vector_search", hits=len(local_hits))
             hits = local_hits
         except Exception as exc:  # noqa: BLE001
             logger.warning("local_vector_search_failed", error=str(exc))
 
-    if not hits:
+    return hits
+
+
+class _LatencyWindow:
+    """Rolling window of recent latencies used to pick the hedge delay."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def observe(self, ms: float) -> None:
+        self._samples.append(ms)
+
+    def quantile(self, q: float) -> float | None:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+_SUPABASE_LATENCY = _LatencyWindow()
+
+
+def _hedge_delay_ms() -> float:
+    if settings.vector_search_hedge_mode == "parallel":
+        return 0.0
+    if settings.vector_search_hedge_delay_ms is not None:
+        return settings.vector_search_hedge_delay_ms
+    p95 = _SUPABASE_LATENCY.quantile(0.95)
+    return max(settings.vector_search_hedge_min_delay_ms, p95 or 0.0)
+
+
+async def _timed_supabase_vector_search(
+    query_vector: Sequence[float],
+    *,
+    top_k: int,
+    deal_id: Any | None,
+    meta_filter: str | None = None,
+) -> list[ChunkHit]:
+    start = time.perf_counter()
+    try:
+        return await _supabase_vector_search(query_vector, top_k=top_k, deal_id=deal_id, meta_filter=meta_filter)
+    finally:
+        # Cancelled calls still record their elapsed time as a lower bound, so a
+        # slow Supabase keeps pushing the adaptive delay up rather than vanishing.
+        _SUPABASE_LATENCY.observe((time.perf_counter() - start) * 1000)
+
+
+async def _hedged_local_vector_search(
+    query_vector: Sequence[float],
+    *,
+    deal_id: Any | None,
+    top_k: int,
+    meta_filter: str | None = None,
+) -> list[ChunkHit]:
+    # Own session: cancelling a losing query must not poison the caller's session.
+    async with SessionLocal() as session:
+        return await _local_vector_search(session, query_vector, deal_id=deal_id, top_k=top_k, meta_filter=meta_filter)
+
+
+async def _hedged_vector_search(
+    query_vector: Sequence[float],
+    *,
+    deal_id: Any | None,
+    top_k: int,
+    meta_filter: str | None = None,
+) -> list[ChunkHit]:
+    """Race Supabase against local pgvector; local starts after the hedge delay (0 = parallel)."""
+    start = time.perf_counter()
+    delay_ms = _hedge_delay_ms()
+    started_at: dict[str, float] = {"supabase": 0.0}
+    tasks: dict[asyncio.Task, str] = {
+        asyncio.create_task(
+            _timed_supabase_vector_search(query_vector, top_k=top_k, deal_id=deal_id, meta_filter=meta_filter)
+        ): "supabase"
+    }
+    outcomes: dict[str, str] = {}
+
+    def _elapsed_ms() -> float:
+        return (time.perf_counter() - start) * 1000
+
+    def _usable(task: asyncio.Task) -> list[ChunkHit]:
+        name = tasks[task]
+        if task.cancelled():
+            outcomes[name] = "cancelled"
+            return []
+        exc = task.exception()
+        if exc is not None:
+            logger.warning(f"{name}_vector_search_failed", error=str(exc))
+            outcomes[name] = "failed"
+            return []
+        hits = task.result()
+        outcomes[name] = "ok" if hits else "empty"
+        return hits
+
+    try:
+        pending = set(tasks)
+        if delay_ms > 0:
+            done, pending = await asyncio.wait(pending, timeout=delay_ms / 1000.0)
+            for task in done:
+                hits = _usable(task)
+                if hits:
+                    _log_hedge("supabase", None, _elapsed_ms(), delay_ms, started_at, outcomes)
+                    return hits
+
+        local_task = asyncio.create_task(
+            _hedged_local_vector_search(query_vector, deal_id=deal_id, top_k=top_k, meta_filter=meta_filter)
+        )
+        tasks[local_task] = "local"
+        started_at["local"] = _elapsed_ms()
+        pending.add(local_task)
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                hits = _usable(task)
+                if hits:
+                    loser = next((tasks[t] for t in pending), None)
+                    _log_hedge(tasks[task], loser, _elapsed_ms(), delay_ms, started_at, outcomes)
+                    return hits
+
+        _log_hedge(None, None, _elapsed_ms(), delay_ms, started_at, outcomes)
         return []
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
 
-    use_rerank = settings.rerank_provider not in {None, "", "none"}
-    ranked_hits, rerank_info = await _maybe_rerank(query_text, hits, use_rerank=use_rerank)
+
+def _log_hedge(
+    winner: str | None,
+    loser: str | None,
+    elapsed_ms: float,
+    delay_ms: float,
+    started_at: dict[str, float],
+    outcomes: dict[str, str],
+) -> None:
     logger.info(
-        "rerank_summary",
-        provider=rerank_info.get("provider"),
-        used_rerank=rerank_info.get("used_rerank"),
-        fallback_used=rerank_info.get("fallback_used"),
-        candidate_k=rerank_info.get("candidate_k"),
-        rerank_k=rerank_info.get("rerank_k"),
+        "vector_search_hedge",
+        winner=winner,
+        winner_ms=elapsed_ms - started_at.get(winner, 0.0) if winner else None,
+        # Lower bound on how much slower the cancelled backend would have been.
+        loser=loser,
+        loser_elapsed_ms=elapsed_ms - started_at[loser] if loser else None,
+        hedge_delay_ms=delay_ms,
+        local_started=("local" in started_at),
+        outcomes=outcomes,
+        elapsed_ms=elapsed_ms,
     )
-    return ranked_hits
+
+
+async def _lexical_search(
+    query_text: str,
+    *,
+    deal_id: Any | None,
+    top_k: int,
+    db: AsyncSession | None,
+    meta_filter: str | None = None,
+) -> list[ChunkHit]:
+    tsquery = _lexical_tsquery(query_text)
+    if not tsquery:
+        return []
+
+    hits: list[ChunkHit] = []
+    start = time.perf_counter()
+
+    if settings.supabase_url and settings.supabase_service_role_key:
+        try:
+            hits = await _supabase_lexical_search(tsquery, top_k=top_k, deal_id=deal_id, meta_filter=meta_filter)
+            logger.info("supabase_lexical_search", hits=len(hits))
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("supabase_lexical_search_failed", error=str(exc))
+
+    if not hits and db is not None:
+        try:
+            hits = await _local_lexical_search(db, tsquery, deal_id=deal_id, top_k=top_k, meta_filter=meta_filter)
+            logger.info("local_lexical_search", hits=len(hits))
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("local_lexical_search_failed", error=str(exc))
+
+    logger.info("lexical_search_timing", lexical_ms=(time.perf_counter() - start) * 1000)
+    return hits
+
+
+_LEXICAL_TOKEN = re.compile(r"[A-Za-z0-9]+")
+
+
+def _lexical_tsquery(query_text: str, max_terms: int = 32) -> str:
+    """OR-join the query's terms into a to_tsquery() string; ts_rank rewards matching more of them."""
+    terms: list[str] = []
+    for token in _LEXICAL_TOKEN.findall(query_text.lower()):
+        if len(token) < 2 or token in terms:
+            continue
+        terms.append(token)
+        if len(terms) >= max_terms:
+            break
+    return " | ".join(terms)
+
+
+async def _supabase_lexical_search(
+    tsquery: str,
+    *,
+    top_k: int,
+    deal_id: Any | None,
+    meta_filter: str | None = None,
+) -> list[ChunkHit]:
+    headers = {
+        "apikey": settings.supabase_service_role_key,
+        "Authorization": f"Bearer {settings.supabase_service_role_key}",
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+    }
+    payload: dict[str, Any] = {"lexical_query": tsquery, "match_count": top_k}
+    if deal_id is not None:
+        payload["target_deal_id"] = deal_id
+    if meta_filter is not None:
+        payload["meta_filter"] = meta_filter
+
+    fn = settings.supabase_lexical_function or "match_chunks_lexical"
+    url = f"{settings.supabase_url.rstrip('/')}/rest/v1/rpc/{fn}"
+
+    client = get_http_client("supabase")
+    response = await client.post(url, headers=headers, json=payload, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+
+    data = response.json()
+    if isinstance(data, dict):
+        data = data.get("results", [])
+    return [
+        ChunkHit(
+            chunk_id=item.get("chunk_id") or item.get("id"),
+            text=item.get("text") or item.get("content"),
+            meta=item.get("meta") or {},
+            document_id=item.get("document_id"),
+            source=item.get("source_name") or item.get("source"),
+            score=item.get("rank") or item.get("score"),
+        )
+        for item in data or []
+    ]
+
+
+async def _local_lexical_search(
+    db: AsyncSession,
+    tsquery: str,
+    *,
+    deal_id: Any | None,
+    top_k: int,
+    meta_filter: str | None = None,
+) -> list[ChunkHit]:
+    # Literal regconfig so the expression matches ix_chunks_text_tsv exactly.
+    config = literal_column("'english'::regconfig")
+    document = func.to_tsvector(config, models.Chunk.text)
+    query = func.to_tsquery(config, tsquery)
+    rank = func.ts_rank_cd(document, query)
+    stmt = (
+        select(
+            models.Chunk.id.label("chunk_id"),
+            models.Chunk.text,
+            models.Chunk.meta,
+            models.Chunk.hash,
+            models.Chunk.document_id,
+            models.Document.source_name.label("source"),
+            rank.label("rank"),
+        )
+        .join(models.Document, models.Document.id == models.Chunk.document_id)
+        .where(document.op("@@")(query))
+        .order_by(rank.desc())
+        .limit(top_k)
+    )
+    if deal_id is not None:
+        stmt = stmt.where(models.Document.deal_id == deal_id)
+    if meta_filter is not None:
+        stmt = stmt.where(_meta_filter_clause(meta_filter))
+
+    rows = (await db.execute(stmt)).mappings().all()
+    return [
+        ChunkHit(
+            chunk_id=row["chunk_id"],
+            text=row["text"],
+            meta=row.get("meta") or {},
+            document_id=row.get("document_id"),
+            source=row.get("source"),
+            hash=row.get("hash"),
+            score=float(row["rank"]) if row.get("rank") is not None else None,
+        )
+        for row in rows
+    ]
+
+
+def _reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[ChunkHit | Mapping[str, Any]]],
+    *,
+    top_k: int,
+    k: int | None = None,
+) -> list[ChunkHit]:
+    """Merge ranked hit lists by sum(1 / (k + rank)); ties keep first-seen order."""
+    k = settings.rrf_k if k is None else k
+    fused: dict[Any, ChunkHit] = {}
+    scores: dict[Any, float] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(as_hits(ranking), start=1):
+            chunk_id = hit.chunk_id
+            if chunk_id is None:
+                continue
+            if chunk_id not in fused:
+                fused[chunk_id] = hit
+                scores[chunk_id] = 0.0
+            scores[chunk_id] += 1.0 / (k + rank)
+
+    ordered = sorted(fused, key=lambda cid: scores[cid], reverse=True)[:top_k]
+    return [fused[chunk_id].replace(rrf_score=scores[chunk_id]) for chunk_id in ordered]
 
 
 def _compose_query_text(deal: dict[str, Any], question: str | None) -> str:
@@ -111,7 +854,13 @@ def _compose_query_text(deal: dict[str, Any], question: str | None) -> str:
     return " :: ".join(parts) if parts else "valuation analysis"
 
 
-async def _supabase_vector_search(query_vector: Sequence[float], *, top_k: int, deal_id: Any | None) -> list[dict[str, Any]]:
+async def _supabase_vector_search(
+    query_vector: Sequence[float],
+    *,
+    top_k: int,
+    deal_id: Any | None,
+    meta_filter: str | None = None,
+) -> list[ChunkHit]:
     if not settings.supabase_url or not settings.supabase_service_role_key:
         return []
 
@@ -122,38 +871,59 @@ async def _supabase_vector_search(query_vector: Sequence[float], *, top_k: int,
         "Accept": "application/json",
     }
     payload = {
-        "query_embedding": query_vector,
+        # pgvector text literal: float32-exact digits and no JSON separators.
+        "query_embedding": vector_to_pg(query_vector),
         "match_count": top_k,
     }
     if deal_id is not None:
         payload["target_deal_id"] = deal_id
 
     fn = settings.supabase_match_function or "match_chunks"
+    if meta_filter is not None:
+        payload["meta_filter"] = meta_filter
+    search_params = _search_params(_ann_limit(top_k), filtered=deal_id is not None or meta_filter is not None)
+    scope = _retrieval_scope()
+    if search_params or _halfvec_storage() or scope is not None or settings.mmr_enabled:
+        fn = settings.supabase_match_tuned_function or "match_chunks_tuned"
+        payload["return_vectors"] = settings.mmr_enabled
+        payload["ef_search"] = search_params.get("hnsw.ef_search")
+        payload["ivfflat_probes"] = search_params.get("ivfflat.probes")
+        payload["iterative_scan"] = search_params.get("hnsw.iterative_scan")
+        if _halfvec_storage():
+            payload["rescore_factor"] = settings.vector_rescore_factor
+        if scope is not None:
+            # Without a snapshot the function resolves the model's active one itself.
+            payload["target_model"] = scope.model_name
+            payload["target_snapshot"] = scope.snapshot_id
     url = f"{settings.supabase_url.rstrip('/')}/rest/v1/rpc/{fn}"
     
-    logger.info("supabase_rpc_call", fn=fn, payload=payload, deal_id=deal_id)
+    logger.info(
+        "supabase_rpc_call",
+        fn=fn,
+        payload={key: value for key, value in payload.items() if key != "query_embedding"},
+        deal_id=deal_id,
+    )
 
-    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS) as client:
-        response = await client.post(url, headers=headers, json=payload)
-        response.raise_for_status()
+    client = get_http_client("supabase")
+    response = await client.post(url, headers=headers, json=payload, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
 
     data = response.json()
     if isinstance(data, dict):
         data = data.get("results", [])
 
-    results: list[dict[str, Any]] = []
-    for item in data or []:
-        results.append(
-            {
-                "chunk_id": item.get("chunk_id") or item.get("id"),
-                "text": item.get("text") or item.get("content"),
-                "meta": item.get("meta") or {},
-                "document_id": item.get("document_id"),
-                "source": item.get("source_name") or item.get("source"),
-                "score": item.get("similarity") or item.get("score"),
-            }
+    return [
+        ChunkHit(
+            chunk_id=item.get("chunk_id") or item.get("id"),
+            text=item.get("text") or item.get("content"),
+            meta=item.get("meta") or {},
+            document_id=item.get("document_id"),
+            source=item.get("source_name") or item.get("source"),
+            score=item.get("similarity") or item.get("score"),
+            vector=pg_to_vector(item["embedding"]) if item.get("embedding") else None,
         )
-    return results
+        for item in data or []
+    ]
 
 
 async def _local_vector_search(
@@ -162,81 +932,377 @@ async def _local_vector_search(
     *,
     deal_id: Any | None,
     top_k: int,
-) -> list[dict[str, Any]]:
-    distance = models.Embedding.vector.cosine_distance(query_vector)
-    stmt = (
-        select(
-            models.Chunk.id.label("chunk_id"),
-            models.Chunk.text,
-            models.Chunk.meta,
-            models.Chunk.document_id,
-            models.Document.source_name.label("source"),
-            distance.label("distance"),
+    meta_filter: str | None = None,
+) -> list[ChunkHit]:
+    # The in-process index holds vectors only, so filtered searches go to Postgres.
+    if settings.vector_index_enabled and deal_id is not None and meta_filter is None:
+        index = vector_index.lookup(deal_id)
+        if index is not None and index.dim in (0, len(query_vector)):
+            chunk_ids, scores = index.search(query_vector, top_k)
+            logger.info("vector_index_search", deal_id=deal_id, rows=len(index), hits=len(chunk_ids))
+            if _two_phase():
+                return HitBatch.from_ranked([(chunk_ids, scores)]).hits(0)
+            return await _fetch_chunk_hits(db, chunk_ids.tolist(), scores.tolist())
+
+    await _apply_search_params(db, _ann_limit(top_k), filtered=deal_id is not None or meta_filter is not None)
+    filters = []
+    if deal_id is not None:
+        filters.append(models.Document.deal_id == deal_id)
+    if meta_filter is not None:
+        filters.append(_meta_filter_clause(meta_filter))
+    stmt = _nearest_chunks_select(
+        query_vector,
+        query_vector,
+        and_(*filters) if filters else None,
+        top_k=top_k,
+        scope=_retrieval_scope(),
+        ids_only=_two_phase(),
+    )
+    return [_vector_row_hit(row) for row in (await db.execute(stmt)).mappings().all()]
+
+
+def _vector_row_hit(row: Mapping[str, Any]) -> ChunkHit:
+    """Hit for a ``_nearest_chunks_select`` row; id-only rows leave text for ``hydrate_hits``."""
+    distance_val = row.get("distance")
+    score = 1.0 - float(distance_val) if distance_val is not None else None
+    if "text" not in row:
+        return ChunkHit(
+            chunk_id=row["chunk_id"],
+            score=score,
+            document_id=row.get("document_id"),
+            hash=row.get("hash"),
+            vector=row.get("vector"),
         )
-        .join(models.Embedding, models.Embedding.chunk_id == models.Chunk.id)
+    return ChunkHit(
+        chunk_id=row["chunk_id"],
+        score=score,
+        text=row["text"],
+        meta=row.get("meta") or {},
+        document_id=row.get("document_id"),
+        source=row.get("source"),
+        hash=row.get("hash"),
+        vector=row.get("vector"),
+    )
+
+
+def _retrieval_scope() -> RetrievalScope | None:
+    """Active (model, snapshot) to search; resolved once per request by the public entry points."""
+    return snapshot_registry.current() if settings.retrieval_scope_enabled else None
+
+
+def _meta_filter_clause(meta_filter: str):
+    """``chunks.meta @? <jsonpath>``; served by the ``jsonb_path_ops`` GIN index."""
+    return type_coerce(models.Chunk.meta, JSONB).op("@?")(literal(meta_filter, JSONPATH))
+
+
+def _two_phase() -> bool:
+    return settings.retrieval_two_phase
+
+
+def _rerank_needs_text(hits: Sequence[ChunkHit], *, use_rerank: bool, top_k: int) -> bool:
+    """Whether ``_maybe_rerank`` will send these hits to a reranker (mirrors its skip rules)."""
+    if not use_rerank or not hits:
+        return False
+    gap = _score_gap(hits, top_k)
+    threshold = settings.rerank_skip_score_gap
+    return not (gap is not None and threshold is not None and gap >= threshold)
+
+
+def _halfvec_storage() -> bool:
+    return settings.embedding_storage == "halfvec"
+
+
+def _ann_limit(top_k: int) -> int:
+    """Rows the ANN index must produce: the rescoring shortlist in halfvec mode."""
+    return top_k * max(settings.vector_rescore_factor, 1) if _halfvec_storage() else top_k
+
+
+def _nearest_chunks_select(
+    query_vector: Any,
+    half_query_vector: Any,
+    deal_filter: Any,
+    *,
+    top_k: int,
+    scope: RetrievalScope | None = None,
+    ids_only: bool = False,
+):
+    """Top-k chunks by cosine distance to ``query_vector``.
+
+    In halfvec storage mode the ANN scan runs over ``embeddings.vector_half`` to
+    build a ``top_k * vector_rescore_factor`` shortlist, which is then rescored
+    against the full-precision vectors. ``scope`` restricts the scan to one
+    model/snapshot, which lets Postgres use that scope's partial index.
+    ``ids_only`` leaves out text, meta and source (see ``chunk_store.hydrate_hits``).
+    With MMR enabled each row also carries its full-precision ``vector``.
+    """
+    filters = [clause for clause in (deal_filter, scope.embedding_filter() if scope else None) if clause is not None]
+    columns = (
+        models.Chunk.id.label("chunk_id"),
+        models.Chunk.hash,
+        models.Chunk.document_id,
+    )
+    if not ids_only:
+        columns += (models.Chunk.text, models.Chunk.meta, models.Document.source_name.label("source"))
+    if not _halfvec_storage():
+        distance = models.Embedding.vector.cosine_distance(query_vector)
+        if settings.mmr_enabled:
+            columns += (models.Embedding.vector.label("vector"),)
+        stmt = (
+            select(*columns, distance.label("distance"))
+            .join(models.Embedding, models.Embedding.chunk_id == models.Chunk.id)
+            .join(models.Document, models.Document.id == models.Chunk.document_id)
+            .where(*filters)
+        )
+        return stmt.order_by(distance.asc()).limit(top_k)  # smaller distance => more similar
+
+    shortlist = (
+        select(models.Embedding.chunk_id, models.Embedding.vector)
+        .join(models.Chunk, models.Chunk.id == models.Embedding.chunk_id)
         .join(models.Document, models.Document.id == models.Chunk.document_id)
-        .order_by(distance.asc())  # smaller distance => more similar
+        .where(*filters)
+    )
+    shortlist = (
+        shortlist.order_by(models.Embedding.vector_half.cosine_distance(half_query_vector).asc())
+        .limit(_ann_limit(top_k))
+        # Leave outer rows (e.g. the batch VALUES list) correlated rather than re-joined here.
+        .correlate_except(models.Embedding, models.Chunk, models.Document)
+        .lateral("shortlist")
+    )
+    distance = shortlist.c.vector.cosine_distance(query_vector)
+    if settings.mmr_enabled:
+        columns += (shortlist.c.vector.label("vector"),)
+    return (
+        select(*columns, distance.label("distance"))
+        .select_from(shortlist)
+        .join(models.Chunk, models.Chunk.id == shortlist.c.chunk_id)
+        .join(models.Document, models.Document.id == models.Chunk.document_id)
+        .order_by(distance.asc())
         .limit(top_k)
     )
-    if deal_id is not None:
-        stmt = stmt.where(models.Document.deal_id == deal_id)
 
-    rows = (await db.execute(stmt)).mappings().all()
-    results: list[dict[str, Any]] = []
-    for row in rows:
-        distance_val = row.get("distance")
-        score = 1.0 - float(distance_val) if distance_val is not None else None
-        results.append(
-            {
-                "chunk_id": row["chunk_id"],
-                "text": row["text"],
-                "meta": row.get("meta") or {},
-                "document_id": row.get("document_id"),
-                "source": row.get("source"),
-                "score": score,
-            }
+
+def _search_params(top_k: int, *, filtered: bool = False) -> dict[str, int | str]:
+    """ANN recall/latency knobs for pgvector, applied per transaction.
+
+    ``filtered`` searches (deal or metadata filter) walk the global HNSW graph
+    and drop rows the filter rejects afterwards: a plain scan stops after
+    ef_search candidates and can return fewer than ``top_k`` rows for a deal
+    with few chunks. Iterative scan keeps walking until enough rows pass.
+    """
+    params: dict[str, int | str] = {}
+    ef_search = settings.pgvector_hnsw_ef_search
+    # HNSW can never return more rows than ef_search (default 40).
+    if ef_search is not None or top_k > 40:
+        params["hnsw.ef_search"] = max(ef_search or 40, top_k)
+    if settings.pgvector_ivfflat_probes is not None:
+        params["ivfflat.probes"] = settings.pgvector_ivfflat_probes
+    # pgvector >= 0.8: keep scanning the graph until enough rows pass the filters.
+    iterative_scan = settings.pgvector_iterative_scan
+    if filtered and not iterative_scan:
+        iterative_scan = settings.pgvector_filtered_iterative_scan
+    if iterative_scan:
+        params["hnsw.iterative_scan"] = iterative_scan
+    return params
+
+
+async def _apply_search_params(db: AsyncSession, top_k: int, *, filtered: bool = False) -> None:
+    params = _search_params(top_k, filtered=filtered)
+    dialect = getattr(getattr(db, "bind", None), "dialect", None)
+    if not params or getattr(dialect, "name", None) != "postgresql":
+        return
+    for name, value in params.items():
+        # set_config(..., true) is SET LOCAL: it lasts until the end of this transaction.
+        await db.execute(
+            text("SELECT set_config(:name, :value, true)"),
+            {"name": name, "value": str(value)},
         )
-    return results
 
 
-async def _maybe_rerank(query_text: str, hits: list[dict[str, Any]], *, use_rerank: bool) -> tuple[list[dict[str, Any]], dict[str, Any]]:
-    documents = [hit.get("text", "") for hit in hits]
-    info = {
+async def _fetch_chunk_hits(
+    db: AsyncSession,
+    chunk_ids: Sequence[int],
+    scores: Sequence[float],
+) -> list[ChunkHit]:
+    rows = await fetch_chunk_rows(db, chunk_ids)
+    return [
+        ChunkHit(chunk_id=chunk_id, score=float(score), **rows[chunk_id])
+        for chunk_id, score in zip(chunk_ids, scores)
+        if chunk_id in rows
+    ]
+
+
+async def _maybe_rerank(
+    query_text: str,
+    hits: Sequence[ChunkHit | Mapping[str, Any]],
+    *,
+    use_rerank: bool,
+    top_k: int | None = None,
+    keep: int | None = None,
+) -> tuple[list[ChunkHit], dict[str, Any]]:
+    """Rerank the candidate pool and return its best ``keep`` hits (default ``top_k``).
+
+    The rerank call is skipped when the retrieval score gap between rank k and
+    k+1 already exceeds ``settings.rerank_skip_score_gap``.
+    """
+    hits = as_hits(hits)
+    top_k = len(hits) if top_k is None else top_k
+    keep = top_k if keep is None else max(keep, top_k)
+    documents = [hit.text or "" for hit in hits]
+    info: dict[str, Any] = {
         "provider": settings.rerank_provider or "none",
         "used_rerank": False,
         "fallback_used": False,
-        "candidate_k": len(documents[:5]),
+        "candidate_k": len(documents),
         "rerank_k": 0,
+        "skipped": None,
+        "score_gap": None,
+        "rerank_ms": None,
     }
 
     if not use_rerank or not documents:
-        return hits, info
+        return hits[:keep], info
+
+    gap = _score_gap(hits, top_k)
+    info["score_gap"] = round(gap, 6) if gap is not None else None
+    threshold = settings.rerank_skip_score_gap
+    if gap is not None and threshold is not None and gap >= threshold:
+        info["skipped"] = "decisive_gap"
+        return hits[:keep], info
 
+    rerank_start = time.perf_counter()
     try:
         async with _RERANK_SEM:
-            reranked = await rerank_documents(query_text, documents, top_k=len(documents))
+            sections = [hit.section for hit in hits]
+            if settings.rerank_provider == "local":
+                reranked = local_rerank(query_text, documents, len(documents), sections=sections)
+            else:
+                # Chunk.hash keys the rerank cache; Supabase hits fall back to hashing the text.
+                hashes = [hit.hash for hit in hits] if all(hit.hash for hit in hits) else None
+                reranked = await rerank_documents(
+                    query_text, documents, top_k=len(documents), hashes=hashes, sections=sections
+                )
     except Exception as exc:  # noqa: BLE001
         logger.warning("rerank_failed", error=str(exc))
         info["fallback_used"] = True
-        return hits, info
+        return hits[:keep], info
+    finally:
+        info["rerank_ms"] = round((time.perf_counter() - rerank_start) * 1000, 3)
 
-    ordered: list[dict[str, Any]] = []
+    ordered: list[ChunkHit] = []
     for item in reranked:
         idx = item.get("index")
         if idx is None or idx >= len(hits):
             continue
-        payload = hits[idx].copy()
-        payload["rerank_score"] = item.get("relevance_score")
-        ordered.append(payload)
+        ordered.append(hits[idx].replace(rerank_score=item.get("relevance_score")))
 
-    if ordered and len(ordered) == len(hits):
-        top_vec = [h.get("chunk_id") for h in hits[:5]]
-        top_rer = [h.get("chunk_id") for h in ordered[:5]]
+    if ordered and len(ordered) >= min(top_k, len(hits)):
+        top_vec = [h.chunk_id for h in hits[:top_k]]
+        top_rer = [h.chunk_id for h in ordered[:top_k]]
         info["used_rerank"] = top_vec != top_rer
-        info["rerank_k"] = len(ordered[:5])
-        return ordered, info
+        info["rerank_k"] = len(ordered[:top_k])
+        return ordered[:keep], info
 
     if ordered:
         info["fallback_used"] = True
 
-    return hits, info
+    return hits[:keep], info
+
+
+def _score_gap(hits: Sequence[ChunkHit], top_k: int) -> float | None:
+    """Retrieval-score gap between rank k and k+1, when scores are comparable."""
+    if top_k <= 0 or len(hits) <= top_k:
+        return None
+    # Fused hits carry per-backend scores on different scales.
+    if any(hit.rrf_score is not None for hit in hits[: top_k + 1]):
+        return None
+    kth, next_ = hits[top_k - 1].score, hits[top_k].score
+    if kth is None or next_ is None:
+        return None
+    return float(kth) - float(next_)
+
+
+def _candidate_pool_sizes(top_k: int, *, use_rerank: bool) -> tuple[int, int]:
+    """How many hits to retrieve, and how many to carry past reranking into MMR."""
+    fetch_k = keep_k = top_k
+    if use_rerank:
+        # Over-fetch so reranking can improve recall rather than only reorder top_k.
+        fetch_k = max(fetch_k, settings.rerank_candidate_k)
+    if settings.mmr_enabled:
+        keep_k = max(top_k, settings.mmr_candidate_k)
+        fetch_k = max(fetch_k, keep_k)
+    return fetch_k, keep_k
+
+
+async def _diversify(
+    db: AsyncSession | None, hits: list[ChunkHit], *, deal_id: Any | None, top_k: int
+) -> list[ChunkHit]:
+    """MMR-select up to ``top_k`` hits under the context token budget."""
+    if not settings.mmr_enabled or len(hits) <= 1:
+        return hits[:top_k]
+
+    vectors = await _candidate_vectors(db, hits, deal_id=deal_id)
+    source = "embeddings"
+    if vectors is None:
+        source = "hashed_terms"
+        vectors = hashed_term_vectors([hit.text or "" for hit in hits])
+
+    if all(hit.rerank_score is not None for hit in hits):
+        relevance = normalize_relevance([hit.rerank_score for hit in hits])
+    else:
+        relevance = normalize_relevance([hit.score for hit in hits])
+    tokens = [estimate_tokens(hit.text or "") for hit in hits]
+
+    chosen = mmr_select(
+        relevance,
+        vectors,
+        lambda_mult=settings.mmr_lambda,
+        max_items=top_k,
+        token_counts=tokens,
+        token_budget=settings.mmr_token_budget,
+        duplicate_threshold=settings.mmr_duplicate_threshold,
+    )
+    logger.info(
+        "mmr_selection",
+        source=source,
+        candidates=len(hits),
+        selected=len(chosen),
+        tokens=sum(tokens[idx] for idx in chosen),
+        token_budget=settings.mmr_token_budget,
+    )
+    return [hits[idx] for idx in chosen]
+
+
+async def _candidate_vectors(
+    db: AsyncSession | None, hits: Sequence[ChunkHit], *, deal_id: Any | None
+) -> np.ndarray | None:
+    """Stored embeddings for MMR, one row per hit, or ``None`` if any is unavailable.
+
+    Vector search returns each candidate's embedding with the hit; candidates
+    only lexical search found come from the deal's in-process index, then from
+    ``embeddings`` in one query.
+    """
+    found: dict[Any, Any] = {hit.chunk_id: hit.vector for hit in hits if hit.vector is not None}
+    missing = [hit.chunk_id for hit in hits if hit.chunk_id not in found]
+    if None in missing:
+        return None
+    index = vector_index.peek(deal_id) if missing and deal_id is not None else None
+    if index is not None:
+        indexed = set(index.chunk_ids.tolist())
+        from_index = [chunk_id for chunk_id in missing if chunk_id in indexed]
+        if from_index:
+            found.update(zip(from_index, index.rows(from_index)))
+            missing = [chunk_id for chunk_id in missing if chunk_id not in found]
+    if missing and db is not None:
+        stmt = select(models.Embedding.chunk_id, models.Embedding.vector).where(
+            models.Embedding.chunk_id.in_(missing)
+        )
+        scope = _retrieval_scope()
+        if scope is not None:
+            stmt = stmt.where(scope.embedding_filter())
+        found.update((row.chunk_id, row.vector) for row in (await db.execute(stmt)).all())
+    if any(hit.chunk_id not in found for hit in hits):
+        return None
+    rows = [np.asarray(found[hit.chunk_id], dtype=np.float32) for hit in hits]
+    if len({row.shape for row in rows}) != 1:
+        return None
+    return np.stack(rows)
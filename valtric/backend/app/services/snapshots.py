@@ -0,0 +1,324 @@
+"""Active (embedding model, index snapshot) scope for retrieval.
+
+Vectors from different embedding models or re-embedding runs live side by side
+in ``embeddings``; retrieval only ever searches the active scope. Each scope gets
+its own partial ANN index, so a scoped search walks one small graph instead of
+filtering a graph built over every vector space. Promotion builds the new
+scope's index first, then flips ``index_snapshots.is_active`` in one transaction.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import structlog
+from sqlalchemy import exists, func, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app import models
+from app.db import engine
+from app.integrations.supabase import get_supabase_client, vector_to_pg
+from app.services.cache import invalidate_deal_analyses
+from app.services.embed import embed_texts
+from app.services.vector_dims import fit_embedding
+from app.settings import settings
+
+
+logger = structlog.get_logger(__name__)
+
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+class SnapshotIncomplete(SnapshotError):
+    """Promotion refused: some chunks have no vector in the snapshot yet."""
+
+
+@dataclass(frozen=True)
+class RetrievalScope:
+    """Embedding model plus, once one has been promoted, the active snapshot.
+
+    Before any promotion the scope is the model's unsnapshotted rows
+    (``snapshot_id IS NULL``); afterwards, only the active snapshot's rows.
+    """
+
+    model_name: str
+    snapshot_id: str | None = None
+
+    def matches(self, model_name: str | None, snapshot_id: str | None) -> bool:
+        return model_name == self.model_name and snapshot_id == self.snapshot_id
+
+    def embedding_filter(self):
+        """WHERE clause for ``embeddings`` rows in this scope.
+
+        Values are rendered inline (``literal_execute``) rather than bound: the
+        planner can only match a partial index predicate against constants.
+        """
+        clause = models.Embedding.model_name == literal(self.model_name, literal_execute=True)
+        if self.snapshot_id is None:
+            return clause & models.Embedding.snapshot_id.is_(None)
+        return clause & (models.Embedding.snapshot_id == literal(self.snapshot_id, literal_execute=True))
+
+
+class SnapshotRegistry:
+    """Caches the active scope for a few seconds so searches do not re-query it."""
+
+    def __init__(self, ttl: float = 30.0) -> None:
+        self.ttl = ttl
+        self._scope: RetrievalScope | None = None
+        self._expires_at = 0.0
+
+    def current(self) -> RetrievalScope:
+        """Last resolved scope, or the configured one before the first lookup."""
+        if settings.index_snapshot_id:
+            return RetrievalScope(settings.embedding_model, settings.index_snapshot_id)
+        if self._scope is not None and self._scope.model_name == settings.embedding_model:
+            return self._scope
+        return RetrievalScope(settings.embedding_model)
+
+    async def resolve(self, db: AsyncSession) -> RetrievalScope:
+        if settings.index_snapshot_id:
+            return self.current()
+        if self._scope is not None and time.monotonic() < self._expires_at:
+            return self.current()
+        try:
+            # Savepoint: a failed lookup must not abort the caller's transaction.
+            async with db.begin_nested():
+                snapshot_id = await db.scalar(
+                    select(models.IndexSnapshot.id).where(
+                        models.IndexSnapshot.embedding_model == settings.embedding_model,
+                        models.IndexSnapshot.is_active.is_(True),
+                    )
+                )
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("snapshot_scope_lookup_failed", error=str(exc))
+            snapshot_id = self._scope.snapshot_id if self._scope is not None else None
+        self._scope = RetrievalScope(settings.embedding_model, snapshot_id)
+        self._expires_at = time.monotonic() + self.ttl
+        return self._scope
+
+    def invalidate(self) -> None:
+        self._scope = None
+        self._expires_at = 0.0
+
+
+snapshot_registry = SnapshotRegistry(ttl=settings.snapshot_scope_ttl_seconds)
+
+
+def scope_index_name(scope: RetrievalScope) -> str:
+    digest = hashlib.sha1(f"{scope.model_name}\x00{scope.snapshot_id or ''}".encode("utf-8")).hexdigest()[:12]
+    return f"ix_embeddings_scope_{digest}"
+
+
+def scope_index_ddl(scope: RetrievalScope) -> str:
+    """``CREATE INDEX CONCURRENTLY`` for the scope's partial HNSW index."""
+    if settings.embedding_storage == "halfvec":
+        column, opclass = "vector_half", "halfvec_cosine_ops"
+    else:
+        column, opclass = "vector", "vector_cosine_ops"
+    predicate = f"model_name = {_quote(scope.model_name)}"
+    if scope.snapshot_id is None:
+        predicate += " AND snapshot_id IS NULL"
+    else:
+        predicate += f" AND snapshot_id = {_quote(scope.snapshot_id)}"
+    return (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {scope_index_name(scope)} "
+        f"ON embeddings USING hnsw ({column} {opclass}) "
+        f"WITH (m = 16, ef_construction = 64) WHERE {predicate}"
+    )
+
+
+async def ensure_scope_index(scope: RetrievalScope, bind: AsyncEngine | None = None) -> bool:
+    """Build the scope's partial index on ``bind`` (default: the app engine) without blocking writes.
+
+    A no-op off Postgres.
+    """
+    bind = engine if bind is None else bind
+    if bind.dialect.name != "postgresql":
+        return False
+    started = time.perf_counter()
+    async with bind.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.exec_driver_sql(scope_index_ddl(scope))
+    logger.info(
+        "snapshot_index_ready",
+        index=scope_index_name(scope),
+        model=scope.model_name,
+        snapshot_id=scope.snapshot_id,
+        build_ms=round((time.perf_counter() - started) * 1000, 2),
+    )
+    return True
+
+
+def normalize_snapshot_id(snapshot_id: str) -> str:
+    """Canonical UUID text; Supabase stores snapshot ids (and takes them in its RPCs) as ``uuid``."""
+    try:
+        return str(uuid.UUID(snapshot_id))
+    except (TypeError, ValueError, AttributeError) as exc:
+        raise SnapshotError("snapshot_id must be a UUID.") from exc
+
+
+async def create_snapshot(
+    db: AsyncSession,
+    snapshot_id: str | None = None,
+    *,
+    embedding_model: str | None = None,
+    notes: str | None = None,
+) -> models.IndexSnapshot:
+    snapshot_id = normalize_snapshot_id(snapshot_id) if snapshot_id is not None else str(uuid.uuid4())
+    if await db.get(models.IndexSnapshot, snapshot_id) is not None:
+        raise SnapshotError(f"Snapshot {snapshot_id} already exists.")
+    snapshot = models.IndexSnapshot(
+        id=snapshot_id,
+        embedding_model=embedding_model or settings.embedding_model,
+        notes=notes,
+    )
+    db.add(snapshot)
+    await db.commit()
+    return snapshot
+
+
+def _unembedded_chunks(scope: RetrievalScope):
+    """Chunks with no vector in ``scope``."""
+    covered = select(models.Embedding.id).where(
+        models.Embedding.chunk_id == models.Chunk.id,
+        scope.embedding_filter(),
+    )
+    return ~exists(covered)
+
+
+async def count_unembedded_chunks(db: AsyncSession, scope: RetrievalScope) -> int:
+    return int(await db.scalar(select(func.count(models.Chunk.id)).where(_unembedded_chunks(scope))) or 0)
+
+
+async def embed_snapshot(db: AsyncSession, snapshot_id: str, *, batch_size: int = 64) -> int:
+    """Write vectors for every chunk that has none in the snapshot; returns how many.
+
+    This is the re-embed path: ingest only writes vectors for the chunks it
+    creates, so existing chunks reach a new snapshot (or model) through here.
+    Chunks ingested while it runs are picked up by running it again, which is
+    what ``promote_snapshot`` asks for when the snapshot is incomplete.
+    """
+    snapshot = await db.get(models.IndexSnapshot, normalize_snapshot_id(snapshot_id))
+    if snapshot is None:
+        raise SnapshotError(f"Snapshot {snapshot_id} does not exist.")
+    if snapshot.embedding_model != settings.embedding_model:
+        raise SnapshotError(
+            f"Snapshot {snapshot.id} is for {snapshot.embedding_model}; set EMBEDDING_MODEL to embed it."
+        )
+    scope = RetrievalScope(snapshot.embedding_model, snapshot.id)
+    supabase_client = get_supabase_client()
+    written = 0
+    last_id = 0
+    while True:
+        rows = (
+            await db.execute(
+                select(models.Chunk.id, models.Chunk.text)
+                .where(models.Chunk.id > last_id, _unembedded_chunks(scope))
+                .order_by(models.Chunk.id)
+                .limit(batch_size)
+            )
+        ).all()
+        if not rows:
+            break
+        embedded = await embed_texts([row.text for row in rows])
+        vectors = [fit_embedding(vector, model=scope.model_name) for vector in embedded]
+        for row, vector in zip(rows, vectors):
+            db.add(
+                models.Embedding(
+                    chunk_id=row.id,
+                    vector=vector,
+                    model_name=scope.model_name,
+                    snapshot_id=scope.snapshot_id,
+                )
+            )
+        await db.commit()
+        if supabase_client:
+            await supabase_client.bulk_upsert(
+                "embeddings",
+                [
+                    {
+                        "chunk_id": row.id,
+                        "vector": vector_to_pg(vector),
+                        "model_name": scope.model_name,
+                        "dim": len(vector),
+                        "snapshot_id": scope.snapshot_id,
+                    }
+                    for row, vector in zip(rows, vectors)
+                ],
+                on_conflict="chunk_id,model_name,snapshot_id",
+            )
+        written += len(rows)
+        last_id = rows[-1].id
+        logger.info("snapshot_embed_batch", snapshot_id=snapshot.id, chunks=len(rows), total=written)
+    return written
+
+
+async def promote_snapshot(
+    db: AsyncSession,
+    snapshot_id: str,
+    *,
+    allow_partial: bool = False,
+) -> models.IndexSnapshot:
+    """Make ``snapshot_id`` the active snapshot for its embedding model.
+
+    Retrieval then sees only the snapshot's rows, so promotion is refused while
+    any chunk lacks a vector in it (run ``embed_snapshot`` first) unless
+    ``allow_partial``. The partial index is built first (concurrently, so
+    ingest and searches carry on); the switch itself is one transaction, so
+    readers see either the old or the new snapshot and never neither.
+    """
+    snapshot = await db.get(models.IndexSnapshot, normalize_snapshot_id(snapshot_id))
+    if snapshot is None:
+        raise SnapshotError(f"Snapshot {snapshot_id} does not exist.")
+    missing = await count_unembedded_chunks(db, RetrievalScope(snapshot.embedding_model, snapshot.id))
+    if missing and not allow_partial:
+        raise SnapshotIncomplete(
+            f"{missing} chunks have no vector in snapshot {snapshot.id}; run scripts/reembed_snapshot.py first."
+        )
+    # CREATE INDEX CONCURRENTLY waits for every open transaction, this session's included.
+    await db.commit()
+
+    # On the database being promoted in, which need not be the app's default engine.
+    await ensure_scope_index(RetrievalScope(snapshot.embedding_model, snapshot.id), db.bind)
+
+    await db.execute(
+        update(models.IndexSnapshot)
+        .where(
+            models.IndexSnapshot.embedding_model == snapshot.embedding_model,
+            models.IndexSnapshot.is_active.is_(True),
+            models.IndexSnapshot.id != snapshot.id,
+        )
+        .values(is_active=False)
+    )
+    snapshot.is_active = True
+    snapshot.promoted_at = datetime.now(timezone.utc)
+    await db.commit()
+
+    snapshot_registry.invalidate()
+    # Every deal's evidence now comes from the new snapshot.
+    invalidate_deal_analyses()
+    # Imported here: vector_index -> snapshots is the primary import direction.
+    from app.services.vector_index import vector_index
+
+    vector_index.clear()
+
+    supabase_client = get_supabase_client()
+    if supabase_client:
+        try:
+            await supabase_client.call_function("promote_index_snapshot", payload={"target_snapshot": snapshot.id})
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("supabase_snapshot_promote_failed", snapshot_id=snapshot.id, error=str(exc))
+
+    logger.info("snapshot_promoted", snapshot_id=snapshot.id, model=snapshot.embedding_model)
+    return snapshot
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
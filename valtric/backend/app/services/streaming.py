@@ -0,0 +1,116 @@
+"""Server-Sent Events for analyses and chat.
+
+The request's work runs as a task while stage events and model tokens flow
+through an ``EventStream`` queue into the response body, so the client gets
+bytes as soon as retrieval finishes instead of after the last LLM token. The
+active stream is found through a context variable: analysis code calls
+``emit`` without threading a callback through every signature, and outside a
+streaming request ``emit`` is a no-op and providers are called unstreamed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+import structlog
+from fastapi.responses import StreamingResponse
+
+from app.settings import settings
+
+
+logger = structlog.get_logger(__name__)
+
+_CURRENT: ContextVar["EventStream | None"] = ContextVar("event_stream", default=None)
+_DONE = object()
+
+
+class StreamError(Exception):
+    """Expected failure, sent to the client as the terminal ``error`` event."""
+
+    def __init__(self, status: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def current_stream() -> "EventStream | None":
+    return _CURRENT.get()
+
+
+def emit(event: str, data: Any) -> None:
+    stream = _CURRENT.get()
+    if stream is not None:
+        stream.emit(event, data)
+
+
+def format_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class EventStream:
+    def __init__(self, heartbeat_seconds: float = 15.0) -> None:
+        self.heartbeat_seconds = heartbeat_seconds
+        self._queue: asyncio.Queue[Any] = asyncio.Queue()
+
+    def emit(self, event: str, data: Any) -> None:
+        self._queue.put_nowait((event, data))
+
+    def token(self, stage: str, text: str) -> None:
+        self.emit("token", {"stage": stage, "text": text})
+
+    async def run(self, work: Callable[[], Awaitable[Any]], *, final_event: str) -> AsyncIterator[str]:
+        """Yield SSE frames for ``work``'s events, then ``final_event`` with its result or ``error``.
+
+        A comment line goes out every ``heartbeat_seconds`` of silence so proxies
+        keep the connection open; a client disconnect cancels the work.
+        """
+        token = _CURRENT.set(self)
+        try:
+            task = asyncio.create_task(self._bounded(work))
+        finally:
+            _CURRENT.reset(token)
+        task.add_done_callback(lambda _: self._queue.put_nowait(_DONE))
+
+        try:
+            yield ": stream-open\n\n"
+            while True:
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is _DONE:
+                    break
+                yield format_event(*item)
+
+            exc = task.exception()
+            if exc is None:
+                yield format_event(final_event, task.result())
+            elif isinstance(exc, StreamError):
+                yield format_event("error", {"status": exc.status, "detail": exc.detail})
+            else:
+                logger.error("event_stream_failed", error=str(exc))
+                yield format_event("error", {"status": 500, "detail": "stream_failed"})
+        finally:
+            if not task.done():
+                task.cancel()
+
+    async def _bounded(self, work: Callable[[], Awaitable[Any]]) -> Any:
+        # The HTTP deadline middleware only covers producing the response headers.
+        try:
+            async with asyncio.timeout(settings.request_timeout_seconds):
+                return await work()
+        except TimeoutError as exc:
+            raise StreamError(504, "deadline_exceeded") from exc
+
+
+def sse_response(frames: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        frames,
+        media_type="text/event-stream",
+        # Stop proxies (nginx in particular) from buffering the stream.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,82 @@
+"""Embedding dimensionality: Matryoshka truncation and resizing the vector columns.
+
+``text-embedding-3-*`` models are trained so that a prefix of the vector is
+itself a usable embedding; the API's ``dimensions`` parameter returns that
+prefix re-normalised. Storing 256-1024 dimensions instead of 1536/3072 cuts
+heap, index size and distance cost roughly in proportion, at a recall cost
+``scripts/bench_embedding_dims.py`` measures on real data.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Sequence
+
+from app.settings import settings
+
+
+MATRYOSHKA_MODEL_PREFIXES = ("text-embedding-3-",)
+
+
+class DimensionMismatch(ValueError):
+    pass
+
+
+def supports_dimensions(model: str) -> bool:
+    """Whether ``model`` accepts ``dimensions`` (and so may be truncated locally)."""
+    return model.startswith(MATRYOSHKA_MODEL_PREFIXES)
+
+
+def truncate_embedding(vector: Sequence[float], dim: int) -> list[float]:
+    """First ``dim`` components at unit length, matching what ``dimensions=dim`` returns."""
+    head = [float(value) for value in vector[:dim]]
+    norm = math.sqrt(sum(value * value for value in head))
+    return [value / norm for value in head] if norm else head
+
+
+def fit_embedding(vector: Sequence[float], *, model: str, dim: int | None = None) -> list[float]:
+    """Bring a vector of ``model`` to ``dim`` (default ``settings.embedding_dimensions``).
+
+    Longer Matryoshka vectors are truncated; anything else of the wrong length
+    cannot share the configured columns and raises ``DimensionMismatch``.
+    """
+    dim = settings.embedding_dimensions if dim is None else dim
+    if len(vector) == dim:
+        return list(vector)
+    if len(vector) > dim and supports_dimensions(model):
+        return truncate_embedding(vector, dim)
+    raise DimensionMismatch(f"{model} embedding has {len(vector)} dimensions; EMBEDDING_DIMENSIONS is {dim}.")
+
+
+COLUMN_DIM_SQL = (
+    "SELECT atttypmod FROM pg_attribute "
+    "WHERE attrelid = 'embeddings'::regclass AND attname = 'vector' AND NOT attisdropped"
+)
+
+# Rows the resize may not touch: only the active model's vectors are known to
+# be Matryoshka prefixes of the configured model (bind ``:model``).
+OTHER_MODEL_ROWS_SQL = "SELECT DISTINCT model_name FROM embeddings WHERE model_name <> :model"
+
+
+def resize_columns_ddl(dim: int, model: str) -> str:
+    """Shrink ``embeddings.vector``/``vector_half`` to ``dim`` by truncating ``model``'s rows in place.
+
+    Both columns are recomputed from the full-precision vector in one table
+    rewrite; Postgres rebuilds the HNSW indexes on them (including per-snapshot
+    partial ones) as part of the same statement. The rewrite covers every row,
+    so callers first check ``OTHER_MODEL_ROWS_SQL`` comes back empty; a row of
+    any other model makes the cast fail rather than be truncated.
+    """
+    if dim <= 0:
+        raise ValueError("dim must be positive")
+    if not supports_dimensions(model):
+        raise DimensionMismatch(f"{model} is not a Matryoshka model; its embeddings cannot be truncated.")
+    truncated = (
+        f"CASE WHEN model_name = '{model.replace(chr(39), chr(39) * 2)}' "
+        f"THEN l2_normalize(subvector(vector, 1, {dim})) ELSE vector END"
+    )
+    return (
+        "ALTER TABLE embeddings "
+        f"ALTER COLUMN vector TYPE vector({dim}) USING ({truncated})::vector({dim}), "
+        f"ALTER COLUMN vector_half TYPE halfvec({dim}) USING ({truncated})::halfvec({dim})"
+    )
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Sequence
+
+import numpy as np
+import structlog
+from sqlalchemy import select
+
+from app import models
+from app.db import SessionLocal
+from app.services.evidence_packs import deal_evidence_version
+from app.services.snapshots import snapshot_registry
+from app.settings import settings
+
+
+logger = structlog.get_logger(__name__)
+
+
+class DealVectorIndex:
+    """Exact cosine index over one deal's chunks.
+
+    Rows are L2-normalised float32 in a single contiguous matrix, so a search is
+    one matrix-vector product followed by an ``argpartition`` top-k.
+    """
+
+    __slots__ = ("chunk_ids", "matrix")
+
+    def __init__(self, chunk_ids: np.ndarray, matrix: np.ndarray) -> None:
+        self.chunk_ids = chunk_ids
+        self.matrix = matrix
+
+    @classmethod
+    def from_vectors(cls, chunk_ids: Sequence[int], vectors: Sequence[Sequence[float]]) -> "DealVectorIndex":
+        ids = np.asarray(chunk_ids, dtype=np.int64)
+        if not len(ids):
+            return cls(ids, np.empty((0, 0), dtype=np.float32))
+        return cls(ids, _normalize_rows(np.asarray(vectors, dtype=np.float32)))
+
+    @property
+    def dim(self) -> int:
+        return int(self.matrix.shape[1]) if self.matrix.ndim == 2 else 0
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.matrix.nbytes + self.chunk_ids.nbytes)
+
+    def __len__(self) -> int:
+        return int(self.chunk_ids.shape[0])
+
+    def search(self, query_vector: Sequence[float], top_k: int) -> tuple[np.ndarray, np.ndarray]:
+        if not len(self) or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if norm > 0.0:
+            query = query / norm
+        scores = self.matrix @ query
+        k = min(top_k, scores.shape[0])
+        if k < scores.shape[0]:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(scores.shape[0])
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return self.chunk_ids[order], scores[order]
+
+    def rows(self, chunk_ids: Sequence[int]) -> np.ndarray | None:
+        """Normalised vectors for ``chunk_ids`` in the given order, or None if any are missing."""
+        wanted = np.asarray(chunk_ids, dtype=np.int64)
+        positions = np.flatnonzero(np.isin(self.chunk_ids, wanted))
+        lookup = dict(zip(self.chunk_ids[positions].tolist(), positions.tolist()))
+        if len(lookup) < len(set(wanted.tolist())):
+            return None
+        return self.matrix[[lookup[chunk_id] for chunk_id in wanted.tolist()]]
+
+    def append(self, chunk_ids: Sequence[int], vectors: Sequence[Sequence[float]]) -> "DealVectorIndex":
+        """Return a new index with the given rows added (existing chunk ids are skipped)."""
+        ids = np.asarray(chunk_ids, dtype=np.int64)
+        if not len(ids):
+            return self
+        rows = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+        keep = ~np.isin(ids, self.chunk_ids)
+        ids, rows = ids[keep], rows[keep]
+        if not len(ids):
+            return self
+        if not len(self):
+            return DealVectorIndex(ids, np.ascontiguousarray(rows))
+        if rows.shape[1] != self.dim:
+            raise ValueError(f"expected {self.dim} dimensions, not {rows.shape[1]}")
+        return DealVectorIndex(
+            np.concatenate([self.chunk_ids, ids]),
+            np.ascontiguousarray(np.vstack([self.matrix, rows])),
+        )
+
+
+class VectorIndexRegistry:
+    """Lazily built, memory-capped LRU of per-deal indexes.
+
+    ``lookup`` never blocks on a build: a cold deal schedules a background load
+    and returns ``None`` so the caller falls back to pgvector meanwhile.
+
+    Chunks can be ingested by another worker or a script, which this process's
+    ``append`` never sees. Each index therefore records the deal's evidence
+    version it was built at: ``observe_version`` drops it as soon as a caller
+    sees a different one, and no index is served for longer than ``ttl``.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float = 300.0) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._indexes: OrderedDict[Any, DealVectorIndex] = OrderedDict()
+        # deal -> (evidence version or None once appended to, monotonic load time)
+        self._meta: dict[Any, tuple[Hashable | None, float]] = {}
+        self._building: dict[Any, asyncio.Task] = {}
+        self._pending_appends: dict[Any, list[tuple[Sequence[int], Sequence[Sequence[float]]]]] = {}
+        self._oversized: set[Any] = set()
+        self._scope: Any = None
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, deal_id: Any) -> DealVectorIndex | None:
+        scope = _current_scope()
+        if scope != self._scope:
+            # A different model/snapshot went live: every loaded index is from the old one.
+            self.clear()
+            self._scope = scope
+        index = self._indexes.get(deal_id)
+        if index is not None and time.monotonic() - self._meta[deal_id][1] > self.ttl:
+            self.invalidate(deal_id)
+            index = None
+        if index is not None:
+            self._indexes.move_to_end(deal_id)
+            self.hits += 1
+            return index
+        self.misses += 1
+        if deal_id not in self._oversized:
+            self.schedule_build(deal_id)
+        return None
+
+    def peek(self, deal_id: Any) -> DealVectorIndex | None:
+        """Return a loaded index without counting a lookup or scheduling a build."""
+        return self._indexes.get(deal_id)
+
+    def observe_version(self, deal_id: Any, version: Hashable) -> None:
+        """Drop the deal's index if its evidence has changed since the index was built."""
+        meta = self._meta.get(deal_id)
+        if meta is None:
+            return
+        built_at, loaded_at = meta
+        if built_at is None:
+            # Only this process's ingest has touched it since; adopt the caller's version.
+            self._meta[deal_id] = (version, loaded_at)
+        elif built_at != version:
+            logger.info("vector_index_stale", deal_id=deal_id)
+            self.invalidate(deal_id)
+
+    def schedule_build(self, deal_id: Any) -> None:
+        if deal_id in self._building:
+            return
+        self._building[deal_id] = asyncio.ensure_future(self._build(deal_id))
+
+    def append(self, deal_id: Any, chunk_ids: Sequence[int], vectors: Sequence[Sequence[float]]) -> None:
+        """Add freshly ingested rows to a loaded (or loading) index; cold deals load lazily later."""
+        if not chunk_ids:
+            return
+        if deal_id in self._building:
+            self._pending_appends.setdefault(deal_id, []).append((chunk_ids, vectors))
+            return
+        index = self._indexes.get(deal_id)
+        if index is None:
+            return
+        try:
+            self._store(deal_id, index.append(chunk_ids, vectors), loaded_at=self._meta[deal_id][1])
+        except ValueError as exc:
+            logger.warning("vector_index_append_failed", deal_id=deal_id, error=str(exc))
+            self.invalidate(deal_id)
+
+    def invalidate(self, deal_id: Any) -> None:
+        index = self._indexes.pop(deal_id, None)
+        if index is not None:
+            self._bytes -= index.nbytes
+        self._meta.pop(deal_id, None)
+        self._oversized.discard(deal_id)
+
+    def clear(self) -> None:
+        self._indexes.clear()
+        self._meta.clear()
+        self._pending_appends.clear()
+        self._oversized.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "deals": len(self._indexes),
+            "building": len(self._building),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    async def _build(self, deal_id: Any) -> None:
+        scope = self._scope
+        try:
+            async with SessionLocal() as session:
+                # Read before the rows: a chunk landing in between only makes the version look stale.
+                version = await deal_evidence_version(session, deal_id)
+                stmt = (
+                    select(models.Embedding.chunk_id, models.Embedding.vector)
+                    .join(models.Chunk, models.Chunk.id == models.Embedding.chunk_id)
+                    .join(models.Document, models.Document.id == models.Chunk.document_id)
+                    .where(models.Document.deal_id == deal_id)
+                    .order_by(models.Embedding.chunk_id)
+                )
+                if scope is not None:
+                    stmt = stmt.where(scope.embedding_filter())
+                rows = (await session.execute(stmt)).all()
+            index = DealVectorIndex.from_vectors(
+                [row.chunk_id for row in rows],
+                [row.vector for row in rows],
+            )
+            for chunk_ids, vectors in self._pending_appends.pop(deal_id, []):
+                index = index.append(chunk_ids, vectors)
+                version = None
+        except Exception as exc:  # noqa: BLE001
+            self._pending_appends.pop(deal_id, None)
+            self._building.pop(deal_id, None)
+            logger.warning("vector_index_build_failed", deal_id=deal_id, error=str(exc))
+            return
+        # No await between draining pending appends and publishing the index,
+        # so concurrent appends either land in the pending list or the index.
+        self._building.pop(deal_id, None)
+        if scope != self._scope:
+            return
+        if not len(index):
+            # Nothing to search; pgvector answers (emptily) until the deal has vectors.
+            return
+        self._store(deal_id, index, version=version)
+        logger.info("vector_index_built", deal_id=deal_id, rows=len(index), bytes=index.nbytes)
+
+    def _store(
+        self,
+        deal_id: Any,
+        index: DealVectorIndex,
+        *,
+        version: Hashable | None = None,
+        loaded_at: float | None = None,
+    ) -> None:
+        self.invalidate(deal_id)
+        if index.nbytes > self.max_bytes:
+            self._oversized.add(deal_id)
+            logger.info("vector_index_oversized", deal_id=deal_id, bytes=index.nbytes, max_bytes=self.max_bytes)
+            return
+        self._indexes[deal_id] = index
+        self._meta[deal_id] = (version, time.monotonic() if loaded_at is None else loaded_at)
+        self._bytes += index.nbytes
+        while self._bytes > self.max_bytes and len(self._indexes) > 1:
+            evicted_id, evicted = self._indexes.popitem(last=False)
+            self._meta.pop(evicted_id, None)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+            logger.info("vector_index_evicted", deal_id=evicted_id, bytes=evicted.nbytes)
+
+
+def _current_scope() -> Any:
+    return snapshot_registry.current() if settings.retrieval_scope_enabled else None
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    if matrix.ndim != 2:
+        raise ValueError("expected a 2-d matrix of vectors")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0.0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+vector_index = VectorIndexRegistry(
+    max_bytes=settings.vector_index_max_bytes,
+    ttl=settings.vector_index_ttl_seconds,
+)
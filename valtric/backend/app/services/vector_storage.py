@@ -0,0 +1,34 @@
+"""Which column the global HNSW index covers, per ``EMBEDDING_STORAGE``.
+
+``vector_half`` (kept in step with ``vector`` by a trigger) is what makes
+halfvec mode cheaper: its HNSW graph is half the size of the float32 one. The
+saving only materialises if that graph replaces the float32 graph rather than
+sitting next to it; the exact rescoring pass reads ``vector`` from the heap and
+needs no index on it.
+"""
+
+from __future__ import annotations
+
+
+ANN_INDEXES = {
+    "float32": ("ix_embeddings_vector_hnsw", "vector vector_cosine_ops"),
+    "halfvec": ("ix_embeddings_vector_half_hnsw", "vector_half halfvec_cosine_ops"),
+}
+
+
+def ann_index_ddl(storage: str) -> list[str]:
+    """Build ``storage``'s HNSW index, then drop the other mode's (run outside a transaction).
+
+    Building first keeps searches on an index throughout the switch.
+    """
+    if storage not in ANN_INDEXES:
+        raise ValueError(f"Unknown embedding storage: {storage}")
+    name, column = ANN_INDEXES[storage]
+    statements = [
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+        f"ON embeddings USING hnsw ({column}) WITH (m = 16, ef_construction = 64)"
+    ]
+    statements += [
+        f"DROP INDEX CONCURRENTLY IF EXISTS {other}" for mode, (other, _) in ANN_INDEXES.items() if mode != storage
+    ]
+    return statements
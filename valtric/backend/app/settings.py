@@ -1,4 +1,5 @@
 import json
+import uuid
 from typing import Any
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import field_validator
@@ -21,21 +22,86 @@ class Settings(BaseSettings):
     primary_reasoning_easy: str = "minimal"
     primary_reasoning_hard: str = "high"
     embedding_model: str = "text-embedding-3-large"
+    embedding_dimensions: int = 1536  # sent as `dimensions` to text-embedding-3-*; must match the vector columns
+    embedding_cache_enabled: bool = True
+    embedding_cache_ttl_seconds: float = 3600.0
+    embedding_cache_max_entries: int = 2048
+    embedding_cache_max_bytes: int = 64 * 1024 * 1024
+    embedding_batch_window_ms: float = 5.0
+    embedding_batch_max_size: int = 64
+    embedding_batch_max_tokens: int = 32_000
     cohere_api_key: str | None = None
     cohere_base_url: str = "https://api.cohere.com/v1"
-    rerank_provider: str = "cohere"
+    rerank_provider: str = "cohere"  # cohere | bge | local | none
     rerank_model: str = "rerank-english-v3.0"
     bge_rerank_url: str = "http://localhost:11434/v1/rerank"
+    bge_rerank_cooldown_seconds: float = 60.0
+    llm_cache_enabled: bool = True
+    llm_cache_path: str | None = ".cache/llm_completions.sqlite3"  # None => in-process only
+    llm_cache_ttl_seconds: float = 86_400.0
+    llm_cache_max_entries: int = 1024
     routing_version: str = "routing_v1.0"
     prompt_version: str = "prompt_v1.0"
     response_schema_version: str = "response_v1.0"
     llm_max_concurrency: int = 4
     rerank_max_concurrency: int = 8
+    rerank_candidate_k: int = 50
+    rerank_skip_score_gap: float | None = 0.08  # None => always rerank
+    mmr_enabled: bool = True
+    mmr_lambda: float = 0.7  # 1.0 => pure relevance, 0.0 => pure diversity
+    mmr_candidate_k: int = 20
+    mmr_token_budget: int | None = 3000
+    mmr_duplicate_threshold: float | None = 0.95
+    context_token_budget_triage: int | None = 2500  # comparable set in the DeepSeek triage prompt; None => unbounded
+    context_token_budget_final: int | None = 3500  # comparable set in the GPT-5 final prompt
+    context_snippet_max_tokens: int | None = 400
+    rerank_cache_enabled: bool = True
+    rerank_cache_ttl_seconds: float = 900.0
+    rerank_cache_max_entries: int = 8192
+    retrieval_batch_concurrency: int = 8
+    retrieval_two_phase: bool = True  # local search returns ids + scores; text is fetched for survivors
+    chunk_text_max_chars: int | None = None
+    chunk_text_cache_max_entries: int = 4096
+    retrieval_mode: str = "vector"  # vector | hybrid | lexical
+    lexical_fallback_enabled: bool = True
+    rrf_k: int = 60
+    vector_search_hedge_mode: str = "sequential"  # sequential | hedged | parallel
+    vector_search_hedge_delay_ms: float | None = None  # None => adaptive (observed Supabase p95)
+    vector_search_hedge_min_delay_ms: float = 150.0
+    vector_index_enabled: bool = True
+    vector_index_max_bytes: int = 256 * 1024 * 1024
+    vector_index_ttl_seconds: float = 300.0  # bounds staleness from other workers' ingest
+    pgvector_hnsw_ef_search: int | None = None
+    pgvector_ivfflat_probes: int | None = None
+    pgvector_iterative_scan: str | None = None  # strict_order | relaxed_order (pgvector >= 0.8)
+    pgvector_filtered_iterative_scan: str | None = "strict_order"  # deal/metadata-filtered searches; None on pgvector < 0.8
+    pg_binary_vectors: bool = True  # asyncpg: send/receive vectors in pgvector's binary format
+    embedding_storage: str = "float32"  # float32 | halfvec (ANN over half precision, rescored)
+    vector_rescore_factor: int = 4
+    evidence_pack_cache_enabled: bool = True
+    evidence_pack_ttl_seconds: float = 86400.0
+    analysis_cache_enabled: bool = True
+    analysis_cache_ttl_seconds: float = 600.0
+    analysis_cache_stale_seconds: float = 3600.0  # served while a background refresh runs
+    analysis_cache_max_entries: int = 256
+    semantic_cache_enabled: bool = True
+    semantic_cache_threshold: float = 0.95  # cosine similarity between question embeddings
+    semantic_cache_ttl_seconds: float = 900.0
+    semantic_cache_max_per_deal: int = 32
+    semantic_cache_max_deals: int = 512
+    index_snapshot_id: str | None = None  # pins retrieval to a snapshot; None => the promoted one
+    retrieval_scope_enabled: bool = True
+    snapshot_scope_ttl_seconds: float = 30.0
     request_timeout_seconds: float = 90.0
+    http2_enabled: bool = False
+    http_keepalive_expiry_seconds: float = 30.0
+    http_upstream_max_connections: dict[str, int] = {}
     supabase_url: str | None = None
     supabase_anon_key: str | None = None
     supabase_service_role_key: str | None = None
     supabase_match_function: str = "match_chunks"
+    supabase_match_tuned_function: str = "match_chunks_tuned"
+    supabase_lexical_function: str = "match_chunks_lexical"
     cors_origins: list[str] = ["http://localhost:5173", "http://localhost:3000"]
 
     @field_validator("cors_origins", mode="before")
@@ -53,6 +119,14 @@ class Settings(BaseSettings):
             return [s.strip() for s in stripped.split(",") if s.strip()]
         return v
 
+    @field_validator("index_snapshot_id", mode="before")
+    @classmethod
+    def canonical_snapshot_id(cls, v: Any) -> Any:
+        # Snapshot ids are UUIDs (Supabase stores them as uuid); compare them in canonical form.
+        if isinstance(v, str) and v.strip():
+            return str(uuid.UUID(v.strip()))
+        return v or None
+
     model_config = SettingsConfigDict(
         env_file=".env",
         case_sensitive=False,
@@ -1,11 +1,18 @@
 import json
+import os
+
 from openai import OpenAI
 
+# Match the API's EMBEDDING_MODEL / EMBEDDING_DIMENSIONS so the chunk is searchable.
+MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
+
 client = OpenAI()
 text = "Executive summary of the Example SaaS deal. Revenue is growing 40% per year with strong retention."
 embedding = client.embeddings.create(
-    model="text-embedding-3-small",
+    model=MODEL,
     input=text,
+    dimensions=DIMENSIONS,
 ).data[0].embedding
 
 payload = {
@@ -27,7 +34,7 @@ payload = {
                     "text": text,
                     "meta": {"section": "summary"},
                     "hash": "summary-0",
-                    "embedding_model": "text-embedding-3-small",
+                    "embedding_model": MODEL,
                     "embedding": embedding
                 }
             ]
@@ -0,0 +1,31 @@
+"""add chunks text full-text index
+
+Revision ID: 7d3b5e8a2c41
+Revises: 4f2a9c1d7e3b
+Create Date: 2026-10-15 10:03:17.902551
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3b5e8a2c41'
+down_revision: Union[str, None] = '4f2a9c1d7e3b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Expression must match retrieve._local_lexical_search for the planner to use it.
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chunks_text_tsv "
+            "ON chunks USING gin (to_tsvector('english'::regconfig, text))"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_chunks_text_tsv")
@@ -0,0 +1,43 @@
+"""add evidence_packs table
+
+Revision ID: 9e1f4c7b2a53
+Revises: 7d3b5e8a2c41
+Create Date: 2026-10-15 11:21:44.317209
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e1f4c7b2a53'
+down_revision: Union[str, None] = '7d3b5e8a2c41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'evidence_packs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('deal_id', sa.Integer(), nullable=False),
+        sa.Column('snapshot_id', sa.String(length=64), nullable=False),
+        sa.Column('query_hash', sa.String(length=64), nullable=False),
+        sa.Column('chunk_count', sa.Integer(), nullable=False),
+        sa.Column('max_chunk_id', sa.Integer(), nullable=False),
+        sa.Column('top_k', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['deal_id'], ['deals.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('deal_id', 'snapshot_id', 'query_hash', name='uq_evidence_packs_key'),
+    )
+    op.create_index(op.f('ix_evidence_packs_deal_id'), 'evidence_packs', ['deal_id'], unique=False)
+    op.create_index(op.f('ix_evidence_packs_created_at'), 'evidence_packs', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_evidence_packs_created_at'), table_name='evidence_packs')
+    op.drop_index(op.f('ix_evidence_packs_deal_id'), table_name='evidence_packs')
+    op.drop_table('evidence_packs')
@@ -0,0 +1,75 @@
+"""add embeddings halfvec column
+
+Revision ID: b5d8e2f1a694
+Revises: 9e1f4c7b2a53
+Create Date: 2026-10-15 12:08:51.640127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.vector_dims import COLUMN_DIM_SQL
+from app.services.vector_storage import ann_index_ddl
+from app.settings import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d8e2f1a694'
+down_revision: Union[str, None] = '9e1f4c7b2a53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    # halfvec needs pgvector >= 0.7 on the server. Same width as ``vector``, which
+    # e2b7c4a9f613 then brings (both columns together) to EMBEDDING_DIMENSIONS.
+    dim = op.get_bind().execute(sa.text(COLUMN_DIM_SQL)).scalar()
+    op.execute(f"ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS vector_half halfvec({dim})")
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION embeddings_sync_vector_half() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+          NEW.vector_half := NEW.vector::halfvec;
+          RETURN NEW;
+        END;
+        $$
+        """
+    )
+    op.execute("DROP TRIGGER IF EXISTS trg_embeddings_vector_half ON embeddings")
+    op.execute(
+        "CREATE TRIGGER trg_embeddings_vector_half "
+        "BEFORE INSERT OR UPDATE OF vector ON embeddings "
+        "FOR EACH ROW EXECUTE FUNCTION embeddings_sync_vector_half()"
+    )
+
+    # Backfill existing rows in short transactions so ingest is never blocked for long.
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        while True:
+            result = bind.execute(
+                sa.text(
+                    "UPDATE embeddings SET vector_half = vector::halfvec "
+                    "WHERE id IN (SELECT id FROM embeddings WHERE vector_half IS NULL LIMIT :batch)"
+                ),
+                {"batch": BACKFILL_BATCH_SIZE},
+            )
+            if not result.rowcount:
+                break
+        # One HNSW graph, on the column EMBEDDING_STORAGE searches; switch later
+        # with scripts/set_vector_storage.py.
+        for statement in ann_index_ddl(settings.embedding_storage):
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for statement in ann_index_ddl("float32"):
+            op.execute(statement)
+    op.execute("DROP TRIGGER IF EXISTS trg_embeddings_vector_half ON embeddings")
+    op.execute("DROP FUNCTION IF EXISTS embeddings_sync_vector_half()")
+    op.execute("ALTER TABLE embeddings DROP COLUMN IF EXISTS vector_half")
@@ -0,0 +1,69 @@
+"""scope embeddings by model and snapshot
+
+Revision ID: c3a7f9d2e815
+Revises: b5d8e2f1a694
+Create Date: 2026-10-15 13:02:17.508413
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a7f9d2e815'
+down_revision: Union[str, None] = 'b5d8e2f1a694'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'index_snapshots',
+        sa.Column('id', sa.String(length=64), nullable=False),
+        sa.Column('embedding_model', sa.String(length=100), nullable=False),
+        sa.Column('is_active', sa.Boolean(), server_default=sa.text('false'), nullable=False),
+        sa.Column('notes', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('promoted_at', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'uq_index_snapshots_active',
+        'index_snapshots',
+        ['embedding_model'],
+        unique=True,
+        postgresql_where=sa.text('is_active'),
+    )
+
+    # Rows written before this revision do not record their model, and the
+    # current EMBEDDING_MODEL need not be the one that produced them. Label them
+    # only when told (alembic -x legacy_embedding_model=text-embedding-3-small
+    # upgrade head); otherwise they become 'unknown', which no retrieval scope
+    # matches, until they are relabelled or re-embedded (scripts/reembed_snapshot.py).
+    legacy_model = context.get_x_argument(as_dictionary=True).get('legacy_embedding_model') or 'unknown'
+    op.add_column('embeddings', sa.Column('model_name', sa.String(length=100), nullable=True))
+    op.add_column('embeddings', sa.Column('snapshot_id', sa.String(length=64), nullable=True))
+    op.execute(
+        sa.text("UPDATE embeddings SET model_name = :model WHERE model_name IS NULL").bindparams(model=legacy_model)
+    )
+    op.alter_column('embeddings', 'model_name', nullable=False)
+    op.drop_constraint('embeddings_chunk_id_key', 'embeddings', type_='unique')
+    op.create_unique_constraint(
+        'uq_embeddings_chunk_scope', 'embeddings', ['chunk_id', 'model_name', 'snapshot_id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_embeddings_chunk_scope', 'embeddings', type_='unique')
+    # Keep one vector per chunk so the original unique constraint can come back.
+    op.execute(
+        "DELETE FROM embeddings e USING embeddings newer "
+        "WHERE e.chunk_id = newer.chunk_id AND e.id < newer.id"
+    )
+    op.create_unique_constraint('embeddings_chunk_id_key', 'embeddings', ['chunk_id'])
+    op.drop_column('embeddings', 'snapshot_id')
+    op.drop_column('embeddings', 'model_name')
+    op.drop_index('uq_index_snapshots_active', table_name='index_snapshots')
+    op.drop_table('index_snapshots')
@@ -0,0 +1,34 @@
+"""add chunks meta gin index
+
+Revision ID: d8e4b1c6f372
+Revises: c3a7f9d2e815
+Create Date: 2026-10-15 13:41:09.226718
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8e4b1c6f372'
+down_revision: Union[str, None] = 'c3a7f9d2e815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # json -> jsonb rewrites the table; jsonpath operators and GIN need jsonb.
+    op.execute("ALTER TABLE chunks ALTER COLUMN meta TYPE jsonb USING meta::jsonb")
+    # jsonb_path_ops serves @> and @? (retrieve._meta_filter_clause) in a smaller index than jsonb_ops.
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chunks_meta_gin "
+            "ON chunks USING gin (meta jsonb_path_ops)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_chunks_meta_gin")
+    op.execute("ALTER TABLE chunks ALTER COLUMN meta TYPE json USING meta::json")
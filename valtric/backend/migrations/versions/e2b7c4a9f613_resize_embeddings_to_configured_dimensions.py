@@ -0,0 +1,48 @@
+"""resize embeddings to configured dimensions
+
+Revision ID: e2b7c4a9f613
+Revises: d8e4b1c6f372
+Create Date: 2026-10-15 15:41:06.227390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.vector_dims import COLUMN_DIM_SQL, OTHER_MODEL_ROWS_SQL, resize_columns_ddl
+from app.settings import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7c4a9f613'
+down_revision: Union[str, None] = 'd8e4b1c6f372'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A no-op at the default 1536. Later changes to EMBEDDING_DIMENSIONS go
+    # through scripts/resize_embeddings.py, which runs the same statement.
+    bind = op.get_bind()
+    current = bind.execute(sa.text(COLUMN_DIM_SQL)).scalar()
+    target = settings.embedding_dimensions
+    if current == target:
+        return
+    if current is not None and 0 < current < target:
+        raise RuntimeError(
+            f"embeddings.vector has {current} dimensions; growing to {target} needs a re-embed, not a migration."
+        )
+    model = settings.embedding_model
+    others = bind.execute(sa.text(OTHER_MODEL_ROWS_SQL), {"model": model}).scalars().all()
+    if others:
+        raise RuntimeError(
+            f"Only {model} embeddings can be truncated; delete or re-embed those from {', '.join(others)} first."
+        )
+    # Rewrites the table under an ACCESS EXCLUSIVE lock; schedule it off-peak.
+    op.execute(resize_columns_ddl(target, model))
+
+
+def downgrade() -> None:
+    # Truncated components are gone; widening again means re-embedding.
+    pass
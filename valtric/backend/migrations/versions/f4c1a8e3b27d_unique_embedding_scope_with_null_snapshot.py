@@ -0,0 +1,40 @@
+"""unique embedding scope with null snapshot
+
+Revision ID: f4c1a8e3b27d
+Revises: e2b7c4a9f613
+Create Date: 2026-10-15 18:12:40.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c1a8e3b27d'
+down_revision: Union[str, None] = 'e2b7c4a9f613'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # uq_embeddings_chunk_scope treated NULL snapshot ids as distinct, so
+    # unsnapshotted rows could repeat per (chunk, model). Keep the newest of each.
+    op.execute(
+        "DELETE FROM embeddings e USING embeddings newer "
+        "WHERE e.chunk_id = newer.chunk_id AND e.model_name = newer.model_name "
+        "AND e.snapshot_id IS NOT DISTINCT FROM newer.snapshot_id AND e.id < newer.id"
+    )
+    op.drop_constraint('uq_embeddings_chunk_scope', 'embeddings', type_='unique')
+    # An expression index rather than NULLS NOT DISTINCT, which needs Postgres 15.
+    op.execute(
+        "CREATE UNIQUE INDEX uq_embeddings_chunk_scope "
+        "ON embeddings (chunk_id, model_name, coalesce(snapshot_id, ''))"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_embeddings_chunk_scope', table_name='embeddings')
+    op.create_unique_constraint(
+        'uq_embeddings_chunk_scope', 'embeddings', ['chunk_id', 'model_name', 'snapshot_id']
+    )
@@ -0,0 +1,86 @@
+"""
+Recall and search cost of truncated (Matryoshka) embeddings on stored vectors.
+
+Loads up to --limit vectors of the active retrieval scope, uses --queries of
+them as queries (each excluded from its own results) and compares the exact
+top-k at every requested dimension against the top-k at full dimension.
+Search time is brute-force cosine over the whole set, the same work the
+in-process index does; pgvector's HNSW distance cost scales the same way.
+
+Usage:
+    source .venv/bin/activate
+    python -m scripts.bench_embedding_dims [--dims 256 512 1024] [--top-k 10] [--limit 20000] [--queries 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+from sqlalchemy import select
+
+from app import models
+from app.db import SessionLocal, engine
+from app.services.snapshots import snapshot_registry
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k(corpus: np.ndarray, queries: np.ndarray, query_rows: np.ndarray, k: int) -> tuple[np.ndarray, float]:
+    start = time.perf_counter()
+    scores = queries @ corpus.T
+    scores[np.arange(len(query_rows)), query_rows] = -np.inf  # a query is not its own neighbour
+    best = np.argpartition(-scores, k, axis=1)[:, :k]
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return best, elapsed_ms / len(query_rows)
+
+
+async def load_vectors(limit: int) -> np.ndarray:
+    async with SessionLocal() as session:
+        scope = await snapshot_registry.resolve(session)
+        rows = (
+            await session.execute(
+                select(models.Embedding.vector).where(scope.embedding_filter()).order_by(models.Embedding.id).limit(limit)
+            )
+        ).scalars().all()
+    await engine.dispose()
+    return np.asarray(rows, dtype=np.float32)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dims", type=int, nargs="+", default=[256, 512, 1024])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    vectors = asyncio.run(load_vectors(args.limit))
+    if len(vectors) <= args.top_k:
+        raise SystemExit(f"need more than {args.top_k} stored vectors, found {len(vectors)}")
+    full_dim = vectors.shape[1]
+    rng = np.random.default_rng(0)
+    query_rows = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+
+    corpus = normalize(vectors)
+    truth, full_ms = top_k(corpus, corpus[query_rows], query_rows, args.top_k)
+    truth_sets = [set(row.tolist()) for row in truth]
+
+    print(f"{len(vectors)} vectors, {len(query_rows)} queries, recall@{args.top_k} against {full_dim} dims")
+    print(f"{'dims':>6} {'recall':>8} {'ms/query':>10} {'float32 B':>10} {'halfvec B':>10}")
+    print(f"{full_dim:>6} {1.0:>8.3f} {full_ms:>10.3f} {full_dim * 4:>10} {full_dim * 2:>10}")
+    for dim in sorted(d for d in args.dims if d < full_dim):
+        truncated = normalize(vectors[:, :dim])
+        found, ms = top_k(truncated, truncated[query_rows], query_rows, args.top_k)
+        recall = np.mean([len(truth_sets[i] & set(row.tolist())) / args.top_k for i, row in enumerate(found)])
+        print(f"{dim:>6} {recall:>8.3f} {ms:>10.3f} {dim * 4:>10} {dim * 2:>10}")
+
+
+if __name__ == "__main__":
+    main()
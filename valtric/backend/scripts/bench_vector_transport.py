@@ -0,0 +1,62 @@
+"""
+Serialization cost and payload size for embedding vectors, per 1,000 vectors.
+
+Compares the previous per-element ``f"{v:.12g}"`` literal, a JSON array, the
+current ``vector_to_pg`` literal and pgvector's binary wire format (what asyncpg
+sends when PG_BINARY_VECTORS is on).
+
+Usage:
+    source .venv/bin/activate
+    python -m scripts.bench_vector_transport [--count 1000] [--dim 1536]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Callable, Sequence
+
+import numpy as np
+from pgvector.utils import Vector
+
+from app.integrations.supabase import vector_to_pg
+
+
+def legacy_vector_to_pg(values: Sequence[float]) -> str:
+    return "[" + ",".join(f"{value:.12g}" for value in values) + "]"
+
+
+def measure(name: str, encode: Callable[[object], object], vectors: Sequence[object], scale: float) -> None:
+    start = time.perf_counter()
+    encoded = [encode(vector) for vector in vectors]
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    size = sum(len(item) for item in encoded)
+    print(f"{name:<28} {elapsed_ms * scale:>10.1f} ms {size * scale / 1024:>12.1f} KiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=1536)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(scale=0.03, size=(args.count, args.dim)).astype(np.float32)
+    # Upstream embeddings arrive as JSON floats; vectors read back from Postgres are float32.
+    from_api = [json.loads(json.dumps(row.tolist())) for row in matrix]
+    from_db = list(matrix)
+    scale = 1000 / args.count
+
+    print(f"per 1,000 vectors of dim {args.dim}")
+    print(f"{'encoding':<28} {'serialize':>13} {'payload':>16}")
+    measure("legacy .12g literal (api)", legacy_vector_to_pg, from_api, scale)
+    measure("json array (api)", json.dumps, from_api, scale)
+    measure("vector_to_pg (api)", vector_to_pg, from_api, scale)
+    measure("legacy .12g literal (db)", lambda v: legacy_vector_to_pg(v.tolist()), from_db, scale)
+    measure("vector_to_pg (db)", vector_to_pg, from_db, scale)
+    measure("pgvector binary", lambda v: Vector(v).to_binary(), from_db, scale)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+Build the partial HNSW index for the active retrieval scope (EMBEDDING_MODEL and,
+if set, INDEX_SNAPSHOT_ID). Promoting a snapshot builds its index automatically;
+run this once for a model that has no snapshots yet.
+
+Usage:
+    source .venv/bin/activate
+    python -m scripts.build_scope_index
+"""
+
+import asyncio
+
+from app.db import engine
+from app.services.snapshots import ensure_scope_index, scope_index_name, snapshot_registry
+
+
+async def main() -> None:
+    scope = snapshot_registry.current()
+    built = await ensure_scope_index(scope)
+    await engine.dispose()
+    print(f"{scope_index_name(scope)}: {'ready' if built else 'skipped (not Postgres)'}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
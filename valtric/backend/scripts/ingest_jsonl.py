@@ -11,7 +11,8 @@ Each JSON line is expected to contain:
 
 The script will create a stub deal (name/industry inferred from meta) and
 attach a single chunk per line. OpenAI embeddings are generated using
-`text-embedding-3-small` by default.
+EMBEDDING_MODEL (`text-embedding-3-large` by default) at
+EMBEDDING_DIMENSIONS, matching the API's settings.
 """
 
 from __future__ import annotations
@@ -27,14 +28,16 @@ import httpx
 from openai import OpenAI
 
 
-DEFAULT_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
+# Defaults match app.settings; vectors from any other model fall outside the retrieval scope.
+DEFAULT_MODEL = os.getenv("EMBEDDING_MODEL") or os.getenv("EMBED_MODEL", "text-embedding-3-large")
+EMBED_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
 
 
 def hash_text(text: str) -> str:
     return hashlib.sha1(text.encode("utf-8")).hexdigest()
 
 
-def build_payload(record: dict[str, Any], client: OpenAI) -> dict[str, Any]:
+def build_payload(record: dict[str, Any], client: OpenAI, model: str = DEFAULT_MODEL) -> dict[str, Any]:
     deal_id = record.get("deal_id")
     meta = record.get("meta") or {}
     sector = meta.get("sector", "General")
@@ -45,8 +48,9 @@ def build_payload(record: dict[str, Any], client: OpenAI) -> dict[str, Any]:
         raise ValueError("content is required on each JSONL line")
 
     embedding = client.embeddings.create(
-        model=DEFAULT_MODEL,
+        model=model,
         input=text,
+        dimensions=EMBED_DIMENSIONS,
     ).data[0].embedding
 
     deal_payload = {
@@ -67,7 +71,7 @@ def build_payload(record: dict[str, Any], client: OpenAI) -> dict[str, Any]:
                 "text": text,
                 "meta": meta,
                 "hash": hash_text(text),
-                "embedding_model": DEFAULT_MODEL,
+                "embedding_model": model,
                 "embedding": embedding,
             }
         ],
@@ -105,7 +109,7 @@ def main() -> None:
             if not line:
                 continue
             record = json.loads(line)
-            payload = build_payload(record, client)
+            payload = build_payload(record, client, args.model)
             if args.dry_run:
                 print(json.dumps(payload, indent=2)[:400] + "...\n")
                 continue
@@ -0,0 +1,43 @@
+"""
+Embed every chunk that has no vector in an index snapshot, then optionally
+promote it. This is how existing chunks move to a new snapshot or embedding
+model: ingest only embeds the chunks it creates. Safe to re-run; each run only
+embeds chunks the snapshot is still missing (e.g. ones ingested meanwhile).
+
+Usage:
+    source .venv/bin/activate
+    EMBEDDING_MODEL=text-embedding-3-large python -m scripts.reembed_snapshot --create --promote
+    python -m scripts.reembed_snapshot <snapshot uuid> [--promote] [--batch-size 64]
+"""
+
+import argparse
+import asyncio
+
+from app.db import SessionLocal, engine
+from app.services.snapshots import create_snapshot, embed_snapshot, promote_snapshot
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("snapshot_id", nargs="?", help="snapshot UUID (generated with --create when omitted)")
+    parser.add_argument("--create", action="store_true", help="register the snapshot for EMBEDDING_MODEL first")
+    parser.add_argument("--promote", action="store_true", help="make the snapshot active once it is complete")
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    if not args.snapshot_id and not args.create:
+        parser.error("snapshot_id is required unless --create is given")
+
+    async with SessionLocal() as session:
+        snapshot_id = args.snapshot_id
+        if args.create:
+            snapshot_id = (await create_snapshot(session, snapshot_id, notes="scripts/reembed_snapshot.py")).id
+        written = await embed_snapshot(session, snapshot_id, batch_size=args.batch_size)
+        print(f"{snapshot_id}: embedded {written} chunks")
+        if args.promote:
+            await promote_snapshot(session, snapshot_id)
+            print(f"{snapshot_id}: promoted")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
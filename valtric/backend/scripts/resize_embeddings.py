@@ -0,0 +1,50 @@
+"""
+Truncate stored EMBEDDING_MODEL embeddings to EMBEDDING_DIMENSIONS (Matryoshka models only).
+
+Rewrites embeddings.vector and vector_half in place and rebuilds their HNSW
+indexes. The table is locked for the duration, so run it off-peak, and deploy
+the API with the new EMBEDDING_DIMENSIONS straight after; query vectors and
+stored vectors must agree. Measure first with scripts.bench_embedding_dims.
+
+Usage:
+    source .venv/bin/activate
+    EMBEDDING_DIMENSIONS=512 python -m scripts.resize_embeddings [--dry-run]
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy import text
+
+from app.db import engine
+from app.services.vector_dims import COLUMN_DIM_SQL, OTHER_MODEL_ROWS_SQL, resize_columns_ddl
+from app.settings import settings
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="print the statement without running it")
+    args = parser.parse_args()
+
+    target = settings.embedding_dimensions
+    model = settings.embedding_model
+    ddl = resize_columns_ddl(target, model)
+    async with engine.begin() as conn:
+        current = (await conn.execute(text(COLUMN_DIM_SQL))).scalar()
+        others = (await conn.execute(text(OTHER_MODEL_ROWS_SQL), {"model": model})).scalars().all()
+        if current == target:
+            print(f"embeddings already at {target} dimensions")
+        elif current is not None and 0 < current < target:
+            print(f"embeddings at {current} dimensions; growing to {target} needs a re-embed")
+        elif others:
+            print(f"refusing to resize: only {model} rows can be truncated; delete or re-embed {', '.join(others)} first")
+        elif args.dry_run:
+            print(ddl)
+        else:
+            await conn.execute(text(ddl))
+            print(f"embeddings resized {current} -> {target}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -24,7 +24,9 @@ import httpx
 from openai import OpenAI
 
 
-EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
+# Defaults match app.settings; vectors from any other model fall outside the retrieval scope.
+EMBED_MODEL = os.getenv("EMBEDDING_MODEL") or os.getenv("EMBED_MODEL", "text-embedding-3-large")
+EMBED_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
 
 SEED_DATA: list[dict[str, Any]] = [
     {
@@ -177,6 +179,7 @@ def build_payload(client: OpenAI, raw: dict[str, Any]) -> dict[str, Any]:
             embedding = client.embeddings.create(
                 model=EMBED_MODEL,
                 input=text,
+                dimensions=EMBED_DIMENSIONS,
             ).data[0].embedding
 
             chunks_payload.append(
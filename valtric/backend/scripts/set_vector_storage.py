@@ -0,0 +1,40 @@
+"""
+Swap the global HNSW index to match EMBEDDING_STORAGE (float32 | halfvec).
+
+Builds the index for the configured mode concurrently, then drops the other
+mode's, so only one ANN graph is ever kept. Run it before deploying the API
+with the new EMBEDDING_STORAGE.
+
+Usage:
+    source .venv/bin/activate
+    EMBEDDING_STORAGE=halfvec python -m scripts.set_vector_storage [--dry-run]
+"""
+
+import argparse
+import asyncio
+
+from app.db import engine
+from app.services.vector_storage import ann_index_ddl
+from app.settings import settings
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="print the statements without running them")
+    args = parser.parse_args()
+
+    statements = ann_index_ddl(settings.embedding_storage)
+    if args.dry_run:
+        print(";\n".join(statements) + ";")
+        return
+    async with engine.connect() as conn:
+        # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction.
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for statement in statements:
+            await conn.exec_driver_sql(statement)
+    await engine.dispose()
+    print(f"embeddings ANN index set for {settings.embedding_storage}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
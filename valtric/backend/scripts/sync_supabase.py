@@ -44,14 +44,15 @@ async def gather_records() -> tuple[list[dict[str, Any]], list[dict[str, Any]],
         if vector is None:
             continue
         values = list(vector)
-        embedding_rows.append(
-            {
-                "chunk_id": embedding.chunk_id,
-                "vector": vector_to_pg(values),
-                "model_name": settings.embedding_model,
-                "dim": len(values),
-            }
-        )
+        row = {
+            "chunk_id": embedding.chunk_id,
+            "vector": vector_to_pg(values),
+            "model_name": embedding.model_name or settings.embedding_model,
+            "dim": len(values),
+        }
+        if embedding.snapshot_id:
+            row["snapshot_id"] = embedding.snapshot_id
+        embedding_rows.append(row)
 
     return document_rows, chunk_rows, embedding_rows
 
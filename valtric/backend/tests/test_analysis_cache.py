@@ -0,0 +1,141 @@
+import asyncio
+
+from app.rag.hits import ChunkHit
+from app.services import analyzer
+from app.services.cache import SemanticAnalysisCache, TTLCache, make_analysis_cache_key
+from app.services.evidence_packs import EvidenceLookup
+
+
+def test_semantic_cache_matches_paraphrases_with_unchanged_evidence():
+    cache = SemanticAnalysisCache(threshold=0.95)
+    cache.store(7, [1.0, 0.0, 0.1], ("v1",), {"conclusion": "fair"})
+
+    value, similarity = cache.lookup(7, [0.98, 0.02, 0.1], ("v1",))
+    assert value == {"conclusion": "fair"} and similarity > 0.99
+    assert cache.lookup(7, [0.0, 1.0, 0.0], ("v1",)) is None  # different question
+    assert cache.lookup(7, [1.0, 0.0, 0.1], ("v2",)) is None  # new evidence ingested
+    assert cache.lookup(8, [1.0, 0.0, 0.1], ("v1",)) is None
+    assert cache.stats()["entries"] == 0  # the outdated entry was dropped
+
+
+def _patch_analysis(monkeypatch, question_vectors, *, pack_hits=None):
+    """Fake retrieval and LLM: the composed retrieval query embeds the same for every question."""
+    calls: list[str] = []
+    embedded: list[str] = []
+
+    async def fake_lookup(_deal, *, question, db):
+        return EvidenceLookup(hits=pack_hits, chunk_count=3, max_chunk_id=42)
+
+    async def fake_embed(_deal, question):
+        embedded.append(question)
+        return question_vectors[question], [1.0, 0.0]
+
+    async def fake_version(_db, _deal_id):
+        raise AssertionError("the pack lookup already read the evidence version")
+
+    async def fake_chunks(_deal, *, question, db, query_vector, pack_lookup):
+        assert query_vector == ([1.0, 0.0] if pack_hits is None else None)
+        return pack_lookup.hits or [{"chunk_id": 1, "text": "EBITDA margin at 18%.", "source": "Q2 MD&A"}]
+
+    async def fake_valuation(_deal, _comps, question, *, use_cache):
+        calls.append(question)
+        payload = {
+            "conclusion": "fair",
+            "implied_multiple": 8.0,
+            "range": [7.5, 8.5],
+            "reasoning": "In line with comps.",
+            "comps_used": [{"source_id": "chunk:1"}],
+            "risk_flags": [],
+            "confidence": 0.7,
+        }
+        return payload, {"path": "easy", "timings": {}}
+
+    monkeypatch.setattr(analyzer, "analyses_cache", TTLCache())
+    monkeypatch.setattr(analyzer, "semantic_analysis_cache", SemanticAnalysisCache(threshold=0.95))
+    monkeypatch.setattr(analyzer, "lookup_evidence_pack", fake_lookup)
+    monkeypatch.setattr(analyzer, "embed_question_and_query", fake_embed)
+    monkeypatch.setattr(analyzer, "deal_evidence_version", fake_version)
+    monkeypatch.setattr(analyzer, "get_similar_chunks", fake_chunks)
+    monkeypatch.setattr(analyzer, "analyze_valuation", fake_valuation)
+    return calls, embedded
+
+
+def _analyze_twice(first_question, second_question):
+    deal = {"id": 7, "name": "Acme", "industry": "SaaS", "price": 80.0, "ebitda": 10.0}
+
+    async def scenario():
+        first = await analyzer.analyze_core(deal, first_question, db=object())
+        second = await analyzer.analyze_core(deal, second_question, db=object())
+        return first + second
+
+    return asyncio.run(scenario())
+
+
+def test_analyze_core_serves_paraphrase_from_semantic_cache(monkeypatch):
+    vectors = {"Is this priced fairly?": [1.0, 0.0], "Is the valuation reasonable?": [0.99, 0.05]}
+    calls, _ = _patch_analysis(monkeypatch, vectors)
+
+    first, first_meta, second, second_meta = _analyze_twice(*vectors)
+
+    assert calls == ["Is this priced fairly?"]
+    assert first_meta["analysis_cache"] == "miss"
+    assert second_meta["analysis_cache"] == "semantic_hit"
+    assert second == first and second_meta["retrieval_hits"] == 1
+
+
+def test_analyze_core_keeps_distinct_questions_about_one_deal_apart(monkeypatch):
+    # Both retrieval queries embed identically (same deal fields); the questions do not.
+    vectors = {"Is this priced fairly?": [1.0, 0.0], "What is the customer churn risk?": [0.1, 0.99]}
+    calls, _ = _patch_analysis(monkeypatch, vectors)
+
+    _, first_meta, _, second_meta = _analyze_twice(*vectors)
+
+    assert calls == list(vectors)
+    assert first_meta["analysis_cache"] == second_meta["analysis_cache"] == "miss"
+
+
+def test_analyze_core_skips_the_semantic_probe_on_an_evidence_pack_hit(monkeypatch):
+    pack = [ChunkHit(chunk_id=1, text="EBITDA margin at 18%.", source="Q2 MD&A")]
+    calls, embedded = _patch_analysis(monkeypatch, {}, pack_hits=pack)
+
+    _, meta = asyncio.run(
+        analyzer.analyze_core({"id": 7, "price": 80.0, "ebitda": 10.0}, "Is this fair?", db=object())
+    )
+
+    assert embedded == [] and calls == ["Is this fair?"]
+    assert meta["retrieval_hits"] == 1
+
+
+def test_ttl_cache_serves_stale_entries_within_grace_and_invalidates_by_deal():
+    cache = TTLCache(ttl=-1.0, stale_ttl=60.0)
+    cache.set(make_analysis_cache_key(7, "Is this  fair?"), {"conclusion": "fair"})
+    cache.set(make_analysis_cache_key(70, "Is this fair?"), {"conclusion": "rich"})
+
+    assert cache.get(make_analysis_cache_key(7, "is this fair?")) is None
+    assert cache.lookup(make_analysis_cache_key(7, " is this fair? ")) == ({"conclusion": "fair"}, True)
+    assert cache.invalidate_prefix("7:") == 1
+    assert cache.lookup(make_analysis_cache_key(7, "Is this fair?")) is None
+    assert cache.stats()["entries"] == 1
+    assert (cache.stats()["stale_hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_analyze_core_serves_stale_hit_and_schedules_one_refresh(monkeypatch):
+    cache = TTLCache(ttl=-1.0, stale_ttl=60.0)
+    key = make_analysis_cache_key(7, "Is this fair?")
+    analysis = {
+        "conclusion": "fair",
+        "implied_multiple": 8.0,
+        "range": [7.5, 8.5],
+        "reasoning": "cached",
+        "comps_used": [{"source_id": "chunk:1"}],
+    }
+    cache.set(key, (analysis, {"path": "easy", "retrieval_hits": 1}))
+    refreshed: list[str] = []
+    monkeypatch.setattr(analyzer, "analyses_cache", cache)
+    monkeypatch.setattr(analyzer, "_schedule_refresh", lambda k, _deal, _q: refreshed.append(k))
+
+    result, meta = asyncio.run(analyzer.analyze_core({"id": 7, "price": 80.0, "ebitda": 10.0}, "Is this fair?", None))
+
+    assert result.reasoning == "cached"
+    assert meta["analysis_cache"] == "stale" and meta["retrieval_hits"] == 1
+    assert refreshed == [key]
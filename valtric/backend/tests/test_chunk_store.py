@@ -0,0 +1,50 @@
+import pytest
+
+from app.services import chunk_store
+
+
+@pytest.mark.asyncio
+async def test_hydrate_fetches_missing_text_once_and_keeps_scores(monkeypatch):
+    fetches = []
+
+    async def fake_fetch(db, chunk_ids):
+        fetches.append(list(chunk_ids))
+        return {
+            chunk_id: {"text": f"text {chunk_id}", "meta": {"section": "mda"}, "document_id": 1, "source": "s", "hash": "h"}
+            for chunk_id in chunk_ids
+            if chunk_id != 3
+        }
+
+    monkeypatch.setattr(chunk_store, "fetch_chunk_rows", fake_fetch)
+    monkeypatch.setattr(chunk_store, "chunk_text_cache", chunk_store.ChunkTextCache(maxsize=8))
+    monkeypatch.setattr(chunk_store.settings, "chunk_text_max_chars", None)
+    stubs = [{"chunk_id": 1, "score": 0.9}, {"chunk_id": 3, "score": 0.8}, {"chunk_id": 2, "score": 0.7}]
+
+    first = await chunk_store.hydrate_hits(object(), stubs)
+    second = await chunk_store.hydrate_hits(object(), [{"chunk_id": 2, "score": 0.5}])
+
+    # Chunk 3 vanished after the search; the cache serves the repeat lookup.
+    assert [(hit["chunk_id"], hit["score"], hit["text"]) for hit in first] == [(1, 0.9, "text 1"), (2, 0.7, "text 2")]
+    assert second[0]["text"] == "text 2" and second[0]["score"] == 0.5
+    assert fetches == [[1, 3, 2]]
+
+
+@pytest.mark.asyncio
+async def test_hydrate_applies_character_cap_to_every_hit(monkeypatch):
+    monkeypatch.setattr(chunk_store.settings, "chunk_text_max_chars", 4)
+
+    hits = await chunk_store.hydrate_hits(None, [{"chunk_id": 1, "text": "abcdefgh", "score": 1.0}])
+
+    assert hits == [{"chunk_id": 1, "text": "abcd", "score": 1.0}]
+
+
+def test_ids_only_search_leaves_text_out():
+    from sqlalchemy.dialects import postgresql
+
+    from app.services import retrieve
+
+    stmt = retrieve._nearest_chunks_select([0.1, 0.2], [0.1, 0.2], None, top_k=5, ids_only=True)
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    assert "chunks.text" not in sql
+    assert "chunks.meta" not in sql
@@ -1,7 +1,9 @@
+import json
 import math
 
 import pytest
 
+from app.rag.pack import pack_context
 from app.services.consultant import _should_escalate
 from app.services.validation import sanitize_analysis_payload
 
@@ -92,3 +94,20 @@ def test_sanitize_raises_when_hits_without_citations():
 )
 def test_should_escalate(complexity, payload, comps, expected):
     assert _should_escalate(complexity, payload, comps) is expected
+
+
+def test_pack_context_dedupes_and_fits_the_budget():
+    hits = [
+        {"chunk_id": 1, "text": "EBITDA margin at 18%.", "source": "Q2 MD&A", "score": 0.9, "meta": {"page": 3}},
+        {"chunk_id": 2, "text": "EBITDA  margin at 18%.", "source": "Deck"},
+        {"chunk_id": 3, "text": "word " * 400, "source": "Notes"},
+        {"chunk_id": 4, "text": "Revenue grew 25%.", "source": "Q2 MD&A"},
+    ]
+
+    packed = pack_context(hits, budget=120, snippet_max_tokens=400)
+
+    assert [s.handle for s in packed.snippets] == ["chunk:1", "chunk:3"]
+    assert packed.tokens <= 120 and packed.snippets[1].text.endswith("…")
+    assert packed.dropped == 1 and packed.truncated == 1
+    assert json.loads(packed.render())[0] == {"source_id": "chunk:1", "source": "Q2 MD&A", "text": "EBITDA margin at 18%."}
+    assert packed.usage("final")["final_context_budget"] == 120.0
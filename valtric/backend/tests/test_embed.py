@@ -0,0 +1,159 @@
+import asyncio
+
+import pytest
+
+from app.services import embed
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    cache = embed.EmbeddingCache(maxsize=8, ttl=60.0, max_bytes=1024)
+    monkeypatch.setattr(embed, "embedding_cache", cache)
+    monkeypatch.setattr(embed, "_INFLIGHT", {})
+    monkeypatch.setattr(embed.settings, "embedding_cache_enabled", True)
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_embed_texts_serves_repeats_from_cache(monkeypatch, fresh_cache):
+    calls: list[list[str]] = []
+
+    async def fake_request(texts):
+        calls.append(list(texts))
+        return [[float(len(t)), 0.5] for t in texts]
+
+    monkeypatch.setattr(embed, "_request_embeddings", fake_request)
+
+    first = await embed.embed_texts(["alpha", "beta"])
+    second = await embed.embed_texts(["beta", "alpha"])
+
+    assert first == [[5.0, 0.5], [4.0, 0.5]]
+    assert second == [[4.0, 0.5], [5.0, 0.5]]
+    assert calls == [["alpha", "beta"]]
+    stats = fresh_cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_embed_texts_single_flight_for_concurrent_misses(monkeypatch, fresh_cache):
+    calls = 0
+    release = asyncio.Event()
+
+    async def fake_request(texts):
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return [[1.0, 2.0] for _ in texts]
+
+    monkeypatch.setattr(embed, "_request_embeddings", fake_request)
+
+    tasks = [asyncio.create_task(embed.embed_texts(["same question"])) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert calls == 1
+    assert all(result == [[1.0, 2.0]] for result in results)
+    assert fresh_cache.stats()["coalesced"] == 4
+
+
+@pytest.mark.asyncio
+async def test_embed_texts_propagates_failure_to_followers(monkeypatch):
+    async def failing_request(texts):
+        await asyncio.sleep(0)
+        raise embed.EmbeddingError("upstream down")
+
+    monkeypatch.setattr(embed, "_request_embeddings", failing_request)
+
+    results = await asyncio.gather(
+        embed.embed_texts(["q"]),
+        embed.embed_texts(["q"]),
+        return_exceptions=True,
+    )
+    assert all(isinstance(result, embed.EmbeddingError) for result in results)
+    assert embed._INFLIGHT == {}
+
+
+def test_cache_enforces_byte_budget_and_ttl(monkeypatch):
+    cache = embed.EmbeddingCache(maxsize=10, ttl=10.0, max_bytes=64)
+    cache.set(("m", "a"), [0.0] * 4)  # 32 bytes
+    cache.set(("m", "b"), [0.0] * 4)
+    cache.set(("m", "c"), [0.0] * 4)
+
+    assert cache.get(("m", "a")) is None
+    assert cache.stats()["bytes"] == 64
+    assert cache.stats()["evictions"] == 1
+
+    now = embed.time.monotonic()
+    monkeypatch.setattr(embed.time, "monotonic", lambda: now + 11.0)
+    assert cache.get(("m", "c")) is None
+
+
+@pytest.mark.asyncio
+async def test_batcher_coalesces_concurrent_requests(monkeypatch):
+    calls: list[list[str]] = []
+
+    async def fake_request(texts):
+        calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+    monkeypatch.setattr(embed, "_request_embeddings", fake_request)
+    batcher = embed.EmbeddingBatcher(window_ms=5.0, max_batch_size=3, max_batch_tokens=10_000)
+
+    results = await asyncio.gather(
+        batcher.submit(["a"]),
+        batcher.submit(["bb", "ccc"]),
+        batcher.submit(["dddd"]),
+    )
+
+    assert results == [[[1.0]], [[2.0], [3.0]], [[4.0]]]
+    assert calls == [["a", "bb", "ccc"], ["dddd"]]
+    assert batcher.stats()["batches"] == 2
+
+
+@pytest.mark.asyncio
+async def test_batcher_splits_on_token_budget(monkeypatch):
+    calls: list[list[str]] = []
+
+    async def fake_request(texts):
+        calls.append(list(texts))
+        return [[0.0] for _ in texts]
+
+    monkeypatch.setattr(embed, "_request_embeddings", fake_request)
+    batcher = embed.EmbeddingBatcher(window_ms=1.0, max_batch_size=64, max_batch_tokens=30)
+
+    await batcher.submit(["x" * 80, "y" * 80])
+
+    assert calls == [["x" * 80], ["y" * 80]]
+
+
+def test_fit_embedding_truncates_matryoshka_vectors_only():
+    from app.services.vector_dims import DimensionMismatch, fit_embedding
+
+    fitted = fit_embedding([3.0, 4.0, 12.0], model="text-embedding-3-large", dim=2)
+    assert fitted == pytest.approx([0.6, 0.8])
+    assert fit_embedding([0.1, 0.2], model="bge-m3", dim=2) == [0.1, 0.2]
+    with pytest.raises(DimensionMismatch):
+        fit_embedding([0.1, 0.2, 0.3], model="bge-m3", dim=2)
+    with pytest.raises(DimensionMismatch):
+        fit_embedding([0.1], model="text-embedding-3-small", dim=2)
+
+
+def test_resize_ddl_truncates_only_the_active_model():
+    from app.services.vector_dims import DimensionMismatch, resize_columns_ddl
+
+    ddl = resize_columns_ddl(512, "text-embedding-3-large")
+    assert "CASE WHEN model_name = 'text-embedding-3-large' THEN l2_normalize(subvector(vector, 1, 512))" in ddl
+    assert "ELSE vector END" in ddl
+    with pytest.raises(DimensionMismatch):
+        resize_columns_ddl(512, "bge-m3")
+
+
+def test_ann_index_ddl_keeps_one_graph_per_storage_mode():
+    from app.services.vector_storage import ann_index_ddl
+
+    create, drop = ann_index_ddl("halfvec")
+    assert "ix_embeddings_vector_half_hnsw" in create and "vector_half halfvec_cosine_ops" in create
+    assert drop == "DROP INDEX CONCURRENTLY IF EXISTS ix_embeddings_vector_hnsw"
+    assert ann_index_ddl("float32")[1] == "DROP INDEX CONCURRENTLY IF EXISTS ix_embeddings_vector_half_hnsw"
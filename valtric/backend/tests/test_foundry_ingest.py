@@ -61,6 +61,7 @@ async def test_ingest_calls_supabase_bulk_upserts(monkeypatch):
 
     mock_client = AsyncMock()
     monkeypatch.setattr("app.services.foundry.pipeline.get_supabase_client", lambda: mock_client)
+    monkeypatch.setattr("app.services.foundry.pipeline.settings.embedding_dimensions", 3)
 
     result = await ingest_deal_payload(session, payload)
 
@@ -71,3 +72,29 @@ async def test_ingest_calls_supabase_bulk_upserts(monkeypatch):
     mock_client.bulk_upsert.assert_any_call("documents", ANY)
     mock_client.bulk_upsert.assert_any_call("chunks", ANY)
     mock_client.bulk_upsert.assert_any_call("embeddings", ANY, on_conflict="chunk_id")
+
+
+@pytest.mark.asyncio
+async def test_ingest_rejects_other_model_vectors_that_do_not_fit(monkeypatch):
+    session = DummySession()
+    payload = {
+        "deal": {"name": "Example", "industry": "SaaS", "price": 1.2, "ebitda": 0.2},
+        "documents": [
+            {
+                "source_name": "doc.txt",
+                "chunks": [
+                    {
+                        "ord": 0,
+                        "text": "Sample chunk",
+                        "embedding": [0.1, 0.2, 0.3, 0.4],
+                        "embedding_model": "bge-m3",
+                    }
+                ],
+            }
+        ],
+    }
+    monkeypatch.setattr("app.services.foundry.pipeline.get_supabase_client", lambda: None)
+    monkeypatch.setattr("app.services.foundry.pipeline.settings.embedding_dimensions", 3)
+
+    with pytest.raises(IngestError, match="bge-m3 embedding has 4 dimensions"):
+        await ingest_deal_payload(session, payload)
@@ -0,0 +1,29 @@
+import json
+
+import numpy as np
+
+from app.rag.hits import ChunkHit, HitBatch, as_hits
+
+
+def test_chunk_hit_reads_like_the_hit_dict_it_replaces():
+    stub = ChunkHit(chunk_id=4, score=0.8)
+    hit = stub.with_row({"text": "EBITDA 18%", "meta": {"section": "mda"}, "document_id": 2, "source": None, "hash": "h"})
+
+    assert "text" not in stub and stub.get("text") is None
+    assert hit["text"] == "EBITDA 18%" and hit.citation_name == "mda"
+    assert hit.replace(rerank_score=0.9)["rerank_score"] == 0.9 and "rerank_score" not in hit
+    assert as_hits([{"id": 4, "score": 0.8}]) == [stub]
+    assert json.loads(json.dumps(dict(hit)))["meta"] == {"section": "mda"}
+
+
+def test_hit_batch_splits_flat_arrays_by_offsets():
+    batch = HitBatch.from_ranked([(np.array([3, 1]), np.array([0.9, 0.5])), ([], []), ([1], [0.7])])
+
+    assert len(batch) == 3
+    assert batch.offsets.tolist() == [0, 2, 2, 3]
+    assert batch.unique_ids() == [3, 1]
+    assert [[(hit.chunk_id, round(hit.score, 3)) for hit in hits] for hits in batch.to_lists()] == [
+        [(3, 0.9), (1, 0.5)],
+        [],
+        [(1, 0.7)],
+    ]
@@ -0,0 +1,92 @@
+import asyncio
+
+import httpx
+
+from app import main
+from app.integrations import http_clients as http_clients_module
+from app.integrations.http_clients import HTTPClientRegistry, UPSTREAMS
+
+
+def test_registry_reuses_clients_per_loop_and_closes_replaced_ones():
+    registry = HTTPClientRegistry()
+
+    async def first_loop():
+        client = registry.get("openai")
+        assert registry.get("openai") is client
+        return client
+
+    async def second_loop(old):
+        client = registry.get("openai")
+        await asyncio.sleep(0)  # let the scheduled close of the old client run
+        return client, old.is_closed
+
+    old = asyncio.run(first_loop())
+    new, old_closed = asyncio.run(second_loop(old))
+
+    assert new is not old and old_closed
+    asyncio.run(registry.aclose())
+    assert new.is_closed
+
+
+def test_http2_warning_is_logged_once(monkeypatch):
+    warnings: list[str] = []
+    monkeypatch.setattr(http_clients_module.settings, "http2_enabled", True)
+    monkeypatch.setattr(http_clients_module.importlib.util, "find_spec", lambda _name: None)
+    monkeypatch.setattr(http_clients_module.logger, "warning", lambda event, **_kw: warnings.append(event))
+    http_clients_module._h2_installed.cache_clear()
+    try:
+        assert not http_clients_module._http2_enabled()
+        assert not http_clients_module._http2_enabled()
+    finally:
+        http_clients_module._h2_installed.cache_clear()
+
+    assert warnings == ["http2_unavailable"]
+
+
+def test_lifespan_opens_clients_and_closes_them_on_shutdown(monkeypatch):
+    registry = HTTPClientRegistry()
+
+    async def no_db():
+        return None
+
+    monkeypatch.setattr(main, "init_db", no_db)
+    monkeypatch.setattr(main, "http_clients", registry)
+
+    async def scenario():
+        async with main.lifespan(main.app):
+            opened = {name: entry["open"] for name, entry in registry.stats().items()}
+            clients = [registry.get(name) for name in UPSTREAMS]
+        return opened, clients
+
+    opened, clients = asyncio.run(scenario())
+
+    assert opened == {name: True for name in UPSTREAMS}
+    assert all(client.is_closed for client in clients)
+    assert not any(entry["open"] for entry in registry.stats().values())
+
+
+def test_health_upstreams_reports_pool_limits_and_counts(monkeypatch):
+    from app.routers import health
+
+    registry = HTTPClientRegistry()
+    monkeypatch.setattr(health, "http_clients", registry)
+
+    async def scenario():
+        upstream = registry.get("openai")
+        upstream._transport = httpx.MockTransport(lambda request: httpx.Response(200, json={}))
+        await upstream.get("https://api.openai.com/v1/models")
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/health/upstreams")
+        await registry.aclose()
+        return response
+
+    response = asyncio.run(scenario())
+
+    assert response.status_code == 200
+    stats = response.json()["upstreams"]
+    assert set(stats) == set(UPSTREAMS)
+    assert stats["openai"]["open"] is True
+    assert stats["openai"]["requests"] == 1 and stats["openai"]["responses"] == {"2xx": 1}
+    assert stats["openai"]["max_connections"] == UPSTREAMS["openai"].max_connections
+    assert stats["cohere"]["open"] is False and stats["cohere"]["requests"] == 0
@@ -0,0 +1,86 @@
+import asyncio
+
+from app.services.consultant import _is_json
+from app.services.llm_cache import CompletionCache, completion_key
+
+
+def test_completion_cache_survives_restart_and_honours_bypass(tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    key = completion_key(provider="openai", model="gpt-5-nano", effort="low", verbosity="low", system="s", prompt="p")
+    calls: list[str] = []
+
+    async def call(text: str):
+        calls.append(text)
+        return text
+
+    async def scenario():
+        first = CompletionCache(path)
+        assert await first.get_or_call(key, lambda: call('{"a": 1}')) == ('{"a": 1}', "miss")
+        assert await first.get_or_call(key, lambda: call("unused")) == ('{"a": 1}', "hit")
+
+        restarted = CompletionCache(path)
+        assert await restarted.get_or_call(key, lambda: call("unused")) == ('{"a": 1}', "hit")
+        assert restarted.disk_hits == 1
+        assert await restarted.get_or_call(key, lambda: call('{"a": 2}'), bypass=True) == ('{"a": 2}', "bypass")
+
+        other = completion_key(provider="openai", model="gpt-5-nano", effort="high", verbosity="low", system="s", prompt="p")
+        assert await restarted.get_or_call(other, lambda: call("not json"), cacheable=_is_json) == ("not json", "miss")
+        assert await CompletionCache(path).get(other) is None
+        return await CompletionCache(path).get(key)
+
+    assert asyncio.run(scenario()) == '{"a": 2}'
+    assert calls == ['{"a": 1}', '{"a": 2}', "not json"]
+
+
+def test_completion_cache_expires_entries(tmp_path):
+    cache = CompletionCache(str(tmp_path / "llm.sqlite3"), ttl=-1.0)
+
+    async def scenario():
+        await cache.set("k", "{}")
+        return await cache.get("k")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_completion_cache_purges_expired_rows_every_nth_write(tmp_path, monkeypatch):
+    import sqlite3
+
+    from app.services import llm_cache
+
+    path = str(tmp_path / "llm.sqlite3")
+    monkeypatch.setattr(llm_cache, "_PURGE_EVERY_WRITES", 3)
+    cache = CompletionCache(path, ttl=-1.0)
+
+    def rows() -> int:
+        with sqlite3.connect(path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    async def scenario():
+        await cache.set("a", "{}")
+        await cache.set("b", "{}")
+        for _ in range(64):
+            await cache.get("missing")  # lookups alone never trigger a purge
+        counts = [rows()]
+        await cache.set("c", "{}")
+        counts.append(rows())
+        return counts
+
+    assert asyncio.run(scenario()) == [2, 0]
+
+
+def test_completion_cache_falls_back_to_memory_when_the_directory_is_unusable(tmp_path):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    cache = CompletionCache(str(blocker / "llm.sqlite3"))
+
+    async def scenario():
+        assert await cache.get_or_call("k", lambda: _text('{"a": 1}')) == ('{"a": 1}', "miss")
+        return await cache.get_or_call("k", lambda: _text("unused"))
+
+    assert asyncio.run(scenario()) == ('{"a": 1}', "hit")
+    assert cache.path is None
+    cache.clear()
+
+
+async def _text(value: str) -> str:
+    return value
@@ -0,0 +1,34 @@
+import numpy as np
+
+from app.rag.mmr import hashed_term_vectors, mmr_select, normalize_relevance
+
+
+def test_mmr_prefers_diverse_candidate_over_near_duplicate():
+    vectors = np.array([[1.0, 0.0], [0.99, 0.05], [0.0, 1.0]], dtype=np.float32)
+    relevance = [1.0, 0.95, 0.6]
+
+    assert mmr_select(relevance, vectors, lambda_mult=0.5, max_items=2) == [0, 2]
+    assert mmr_select(relevance, vectors, lambda_mult=1.0, max_items=2) == [0, 1]
+
+
+def test_mmr_drops_duplicates_and_respects_token_budget():
+    vectors = np.array([[1.0, 0.0], [1.0, 0.0], [0.0, 1.0], [0.6, 0.8]], dtype=np.float32)
+
+    chosen = mmr_select(
+        [1.0, 0.9, 0.8, 0.7],
+        vectors,
+        token_counts=[100, 100, 500, 50],
+        token_budget=200,
+        duplicate_threshold=0.95,
+    )
+
+    assert chosen == [0, 3]
+
+
+def test_relevance_falls_back_to_rank_and_hashed_vectors_match_shared_terms():
+    assert normalize_relevance([0.5, 0.5, 0.5]).tolist() == [1.0, 0.5, 0.0]
+    assert normalize_relevance([None, 0.3]).tolist() == [1.0, 0.0]
+
+    vectors = hashed_term_vectors(["revenue grew", "revenue grew", "churn fell"])
+    assert np.allclose(vectors[0], vectors[1])
+    assert not np.allclose(vectors[0], vectors[2])
@@ -0,0 +1,102 @@
+import pytest
+
+from app.services import rerank
+
+
+@pytest.fixture(autouse=True)
+def cohere_with_fresh_cache(monkeypatch):
+    cache = rerank.RerankCache(maxsize=16, ttl=60.0)
+    monkeypatch.setattr(rerank, "rerank_cache", cache)
+    monkeypatch.setattr(rerank.settings, "rerank_provider", "cohere")
+    monkeypatch.setattr(rerank.settings, "cohere_api_key", "key")
+    monkeypatch.setattr(rerank.settings, "rerank_cache_enabled", True)
+    monkeypatch.setattr(rerank, "_bge_retry_at", 0.0)
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_repeat_query_is_served_from_cache(monkeypatch, cohere_with_fresh_cache):
+    sent: list[list[str]] = []
+
+    async def fake_scores(query, documents):
+        sent.append(list(documents))
+        return {idx: float(len(doc)) for idx, doc in enumerate(documents)}
+
+    monkeypatch.setattr(rerank, "_cohere_scores", fake_scores)
+
+    first = await rerank.rerank_documents("q", ["a", "ccc", "bb"], top_k=3, hashes=["h1", "h2", "h3"])
+    second = await rerank.rerank_documents("q", ["a", "ccc", "bb"], top_k=2, hashes=["h1", "h2", "h3"])
+
+    assert [item["index"] for item in first] == [1, 2, 0]
+    assert [item["index"] for item in second] == [1, 2]
+    assert sent == [["a", "ccc", "bb"]]
+    assert cohere_with_fresh_cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_partial_hit_only_sends_unseen_documents(monkeypatch, cohere_with_fresh_cache):
+    sent: list[list[str]] = []
+
+    async def fake_scores(query, documents):
+        sent.append(list(documents))
+        return {idx: {"old": 0.2, "new": 0.9}[doc] for idx, doc in enumerate(documents)}
+
+    monkeypatch.setattr(rerank, "_cohere_scores", fake_scores)
+
+    await rerank.rerank_documents("q", ["old"], top_k=1)
+    merged = await rerank.rerank_documents("q", ["old", "new"], top_k=2)
+
+    assert sent == [["old"], ["new"]]
+    assert [(item["document"], item["relevance_score"]) for item in merged] == [("new", 0.9), ("old", 0.2)]
+    assert cohere_with_fresh_cache.stats()["partial_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_bge_failure_reranks_locally_and_skips_bge_during_cooldown(monkeypatch, cohere_with_fresh_cache):
+    calls = 0
+
+    async def failing_scores(query, documents):
+        nonlocal calls
+        calls += 1
+        raise rerank.RerankError("down")
+
+    monkeypatch.setattr(rerank.settings, "rerank_provider", "bge")
+    monkeypatch.setattr(rerank, "_bge_scores", failing_scores)
+
+    docs = ["nothing relevant", "EBITDA margin was 12.5% in FY2023"]
+    first = await rerank.rerank_documents("EBITDA margin FY2023", docs, top_k=2)
+    second = await rerank.rerank_documents("EBITDA margin FY2023", docs, top_k=2)
+
+    assert [item["index"] for item in first] == [1, 0]
+    assert first == second
+    assert calls == 1
+    assert cohere_with_fresh_cache.stats()["entries"] == 0
+
+
+def test_local_scores_use_terms_numbers_entities_and_section_prior():
+    from app.rag.rerank import local_rerank, score_candidates
+
+    docs = [
+        "Revenue grew steadily across regions.",
+        "Acme revenue reached 1,500 units with EBITDA of 300.",
+        "Acme revenue reached 1,500 units with EBITDA of 300.",
+    ]
+    scores = score_candidates("Acme revenue 1500 EBITDA", docs, sections=[None, "Appendix", "Financial summary"])
+
+    assert scores[2] > scores[1] > scores[0]
+    assert [item["index"] for item in local_rerank("no overlap", docs, top_k=3)] == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_local_fallback_paths_apply_the_section_prior(monkeypatch):
+    async def failing_scores(query, documents):
+        raise rerank.RerankError("down")
+
+    monkeypatch.setattr(rerank, "_bge_scores", failing_scores)
+    docs = ["Acme EBITDA of 300.", "Acme EBITDA of 300."]
+    sections = ["Appendix", "Financial summary"]
+
+    for provider in ("local", "bge"):
+        monkeypatch.setattr(rerank.settings, "rerank_provider", provider)
+        ranked = await rerank.rerank_documents("Acme EBITDA", docs, top_k=2, sections=sections)
+        assert [item["index"] for item in ranked] == [1, 0]
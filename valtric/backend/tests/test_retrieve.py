@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 
 from app.services import retrieve
@@ -23,13 +25,13 @@ async def test_get_similar_chunks_uses_supabase(monkeypatch):
     async def fake_embed_texts(texts):
         return [[0.1, 0.2, 0.3]]
 
-    async def fake_supabase_vector_search(vector, top_k, deal_id=None):
+    async def fake_supabase_vector_search(vector, top_k, deal_id=None, meta_filter=None):
         return [
             {"chunk_id": 1, "text": "Doc 1", "meta": {}, "document_id": 10, "source": "source A", "score": 0.9},
             {"chunk_id": 2, "text": "Doc 2", "meta": {}, "document_id": 11, "source": "source B", "score": 0.8},
         ]
 
-    async def fake_rerank_documents(query, documents, top_k):
+    async def fake_rerank_documents(query, documents, top_k, **_kwargs):
         return [{"index": 1, "document": documents[1], "relevance_score": 0.95}]
 
     monkeypatch.setattr(retrieve, "embed_texts", fake_embed_texts)
@@ -47,3 +49,297 @@ async def test_get_similar_chunks_uses_supabase(monkeypatch):
     )
     assert len(result) == 2
     assert {r["chunk_id"] for r in result} == {1, 2}
+
+
+def test_search_params_raise_ef_search_to_cover_top_k(monkeypatch):
+    monkeypatch.setattr(retrieve.settings, "pgvector_hnsw_ef_search", None)
+    monkeypatch.setattr(retrieve.settings, "pgvector_ivfflat_probes", None)
+    assert retrieve._search_params(5) == {}
+    assert retrieve._search_params(60) == {"hnsw.ef_search": 60}
+
+    monkeypatch.setattr(retrieve.settings, "pgvector_hnsw_ef_search", 100)
+    monkeypatch.setattr(retrieve.settings, "pgvector_ivfflat_probes", 8)
+    assert retrieve._search_params(5) == {"hnsw.ef_search": 100, "ivfflat.probes": 8}
+
+
+def test_filtered_search_params_enable_iterative_scan(monkeypatch):
+    # A deal filter applied after the HNSW walk can leave fewer than top_k rows; iterative scan refills them.
+    monkeypatch.setattr(retrieve.settings, "pgvector_hnsw_ef_search", None)
+    monkeypatch.setattr(retrieve.settings, "pgvector_ivfflat_probes", None)
+    monkeypatch.setattr(retrieve.settings, "pgvector_iterative_scan", None)
+    monkeypatch.setattr(retrieve.settings, "pgvector_filtered_iterative_scan", "strict_order")
+    assert retrieve._search_params(5) == {}
+    assert retrieve._search_params(5, filtered=True) == {"hnsw.iterative_scan": "strict_order"}
+
+    monkeypatch.setattr(retrieve.settings, "pgvector_iterative_scan", "relaxed_order")
+    assert retrieve._search_params(5, filtered=True) == {"hnsw.iterative_scan": "relaxed_order"}
+    monkeypatch.setattr(retrieve.settings, "pgvector_iterative_scan", None)
+    monkeypatch.setattr(retrieve.settings, "pgvector_filtered_iterative_scan", None)
+    assert retrieve._search_params(5, filtered=True) == {}
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    vector_hits = [{"chunk_id": 1, "text": "a"}, {"chunk_id": 2, "text": "b"}, {"chunk_id": 3, "text": "c"}]
+    lexical_hits = [{"chunk_id": 3, "text": "c"}, {"chunk_id": 4, "text": "d"}, {"chunk_id": 1, "text": "a"}]
+
+    fused = retrieve._reciprocal_rank_fusion([vector_hits, lexical_hits], top_k=3, k=60)
+
+    assert [hit["chunk_id"] for hit in fused] == [1, 3, 2]
+    assert fused[0]["rrf_score"] > fused[2]["rrf_score"]
+
+
+def test_lexical_tsquery_sanitizes_terms():
+    assert retrieve._lexical_tsquery("EBITDA margin (GBP)? & margin!") == "ebitda | margin | gbp"
+    assert retrieve._lexical_tsquery("?!") == ""
+
+
+@pytest.mark.asyncio
+async def test_get_similar_chunks_falls_back_to_lexical_when_embedding_fails(monkeypatch):
+    async def failing_embed_texts(texts):
+        raise RuntimeError("embeddings unavailable")
+
+    async def fake_lexical_search(query_text, *, deal_id, top_k, db, meta_filter=None):
+        return [{"chunk_id": 7, "text": "EBITDA margin 18%", "meta": {}, "score": 0.4}]
+
+    monkeypatch.setattr(retrieve, "embed_texts", failing_embed_texts)
+    monkeypatch.setattr(retrieve, "_lexical_search", fake_lexical_search)
+    monkeypatch.setattr(retrieve.settings, "lexical_fallback_enabled", True)
+    monkeypatch.setattr(retrieve.settings, "rerank_provider", "none")
+
+    result = await retrieve.get_similar_chunks(
+        {"id": 3, "price": 1.2, "ebitda": 0.2, "industry": "SaaS", "name": "Deal"},
+        question="EBITDA margin",
+        db=None,
+    )
+    assert [hit["chunk_id"] for hit in result] == [7]
+
+
+@pytest.mark.asyncio
+async def test_hedged_vector_search_returns_first_usable_backend(monkeypatch):
+    supabase_cancelled = False
+
+    async def slow_supabase(vector, top_k, deal_id=None, meta_filter=None):
+        nonlocal supabase_cancelled
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            supabase_cancelled = True
+            raise
+        return [{"chunk_id": 1}]
+
+    async def fast_local(vector, *, deal_id, top_k, meta_filter=None):
+        return [{"chunk_id": 2, "text": "local"}]
+
+    monkeypatch.setattr(retrieve, "_supabase_vector_search", slow_supabase)
+    monkeypatch.setattr(retrieve, "_hedged_local_vector_search", fast_local)
+    monkeypatch.setattr(retrieve.settings, "vector_search_hedge_mode", "hedged")
+    monkeypatch.setattr(retrieve.settings, "vector_search_hedge_delay_ms", 10.0)
+
+    hits = await retrieve._hedged_vector_search([0.1, 0.2], deal_id=1, top_k=5)
+    await asyncio.sleep(0)
+
+    assert hits == [{"chunk_id": 2, "text": "local"}]
+    assert supabase_cancelled
+
+
+@pytest.mark.asyncio
+async def test_evidence_pack_hit_skips_embedding(monkeypatch):
+    cached = [{"chunk_id": 5, "text": "Cached", "meta": {}, "document_id": 1, "source": "s", "score": 0.7}]
+
+    async def fake_load(db, deal_id, key):
+        return retrieve.EvidenceLookup(hits=cached, chunk_count=3, max_chunk_id=5)
+
+    async def fail_embed(texts):
+        raise AssertionError("embedding should not run on a pack hit")
+
+    monkeypatch.setattr(retrieve.settings, "evidence_pack_cache_enabled", True)
+    monkeypatch.setattr(retrieve, "load_evidence_pack", fake_load)
+    monkeypatch.setattr(retrieve, "embed_texts", fail_embed)
+
+    result = await retrieve.get_similar_chunks({"id": 3, "name": "Deal"}, question="q", db=object())
+    assert result == cached
+
+
+@pytest.mark.asyncio
+async def test_evidence_pack_miss_saves_ranked_hits(monkeypatch):
+    saved = []
+
+    async def fake_load(db, deal_id, key):
+        return retrieve.EvidenceLookup(hits=None, chunk_count=2, max_chunk_id=9)
+
+    async def fake_vector_search(vector, *, deal_id, top_k, db, meta_filter=None):
+        return [{"chunk_id": 9, "text": "t", "meta": {}, "document_id": 1, "source": "s", "score": 0.5}]
+
+    async def fake_embed(texts):
+        return [[0.1, 0.2]]
+
+    monkeypatch.setattr(retrieve.settings, "evidence_pack_cache_enabled", True)
+    monkeypatch.setattr(retrieve.settings, "retrieval_mode", "vector")
+    monkeypatch.setattr(retrieve.settings, "rerank_provider", "none")
+    monkeypatch.setattr(retrieve, "load_evidence_pack", fake_load)
+    monkeypatch.setattr(retrieve, "embed_texts", fake_embed)
+    monkeypatch.setattr(retrieve, "_vector_search", fake_vector_search)
+    monkeypatch.setattr(
+        retrieve,
+        "schedule_save_evidence_pack",
+        lambda deal_id, key, lookup, hits: saved.append((deal_id, lookup.max_chunk_id, hits)),
+    )
+
+    result = await retrieve.get_similar_chunks({"id": 3, "name": "Deal"}, question="q", db=object())
+    assert saved == [(3, 9, result)]
+
+
+@pytest.mark.asyncio
+async def test_get_similar_chunks_many_embeds_once_and_searches_once(monkeypatch):
+    embed_calls = []
+    search_calls = []
+
+    async def fake_embed(texts):
+        embed_calls.append(list(texts))
+        return [[float(i), 1.0] for i in range(len(texts))]
+
+    async def fake_local_many(db, vectors, deal_ids, *, top_k):
+        search_calls.append(list(deal_ids))
+        return [[{"chunk_id": deal_id, "text": str(deal_id), "score": 0.5}] for deal_id in deal_ids]
+
+    monkeypatch.setattr(retrieve.settings, "retrieval_mode", "vector")
+    monkeypatch.setattr(retrieve.settings, "rerank_provider", "none")
+    monkeypatch.setattr(retrieve.settings, "supabase_url", None)
+    monkeypatch.setattr(retrieve, "embed_texts", fake_embed)
+    monkeypatch.setattr(retrieve, "_local_vector_search_many", fake_local_many)
+
+    results = await retrieve.get_similar_chunks_many(
+        [({"id": 1, "name": "A"}, "q1"), ({"id": 2, "name": "B"}, None), ({"id": 3, "name": "C"}, "q3")],
+        db=object(),
+    )
+
+    assert len(embed_calls) == 1 and len(embed_calls[0]) == 3
+    assert search_calls == [[1, 2, 3]]
+    assert [[hit["chunk_id"] for hit in hits] for hits in results] == [[1], [2], [3]]
+
+
+def test_batch_vector_statement_is_one_lateral_query():
+    from sqlalchemy.dialects import postgresql
+
+    stmt = retrieve._batch_vector_statement([[0.1, 0.2], [0.3, 0.4]], [7, None], top_k=4)
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    assert "LATERAL" in sql
+    assert "VALUES" in sql
+    assert sql.count("LIMIT") == 1
+
+
+@pytest.mark.asyncio
+async def test_rerank_over_fetches_candidates_and_returns_top_k(monkeypatch):
+    requested = {}
+
+    async def fake_embed(texts):
+        return [[0.1, 0.2]]
+
+    async def fake_vector_search(vector, *, deal_id, top_k, db, meta_filter=None):
+        requested["top_k"] = top_k
+        return [{"chunk_id": i, "text": f"doc {i}", "score": 0.9 - i * 0.001} for i in range(top_k)]
+
+    async def fake_rerank(query, documents, top_k, **_kwargs):
+        order = list(reversed(range(len(documents))))
+        return [{"index": idx, "relevance_score": 1.0 - rank * 0.01} for rank, idx in enumerate(order)]
+
+    monkeypatch.setattr(retrieve.settings, "retrieval_mode", "vector")
+    monkeypatch.setattr(retrieve.settings, "rerank_provider", "cohere")
+    monkeypatch.setattr(retrieve.settings, "rerank_candidate_k", 20)
+    monkeypatch.setattr(retrieve.settings, "rerank_skip_score_gap", 0.5)
+    monkeypatch.setattr(retrieve, "embed_texts", fake_embed)
+    monkeypatch.setattr(retrieve, "_vector_search", fake_vector_search)
+    monkeypatch.setattr(retrieve, "rerank_documents", fake_rerank)
+
+    result = await retrieve.get_similar_chunks({"name": "Deal"}, question="q", db=None, top_k=3)
+
+    assert requested["top_k"] == 20
+    assert [hit["chunk_id"] for hit in result] == [19, 18, 17]
+
+
+@pytest.mark.asyncio
+async def test_rerank_skipped_when_score_gap_is_decisive(monkeypatch):
+    async def fail_rerank(*args, **kwargs):
+        raise AssertionError("rerank should be skipped")
+
+    monkeypatch.setattr(retrieve.settings, "rerank_skip_score_gap", 0.1)
+    monkeypatch.setattr(retrieve, "rerank_documents", fail_rerank)
+    hits = [{"chunk_id": 1, "score": 0.9}, {"chunk_id": 2, "score": 0.85}, {"chunk_id": 3, "score": 0.6}]
+
+    ranked, info = await retrieve._maybe_rerank("q", hits, use_rerank=True, top_k=2)
+
+    assert [hit["chunk_id"] for hit in ranked] == [1, 2]
+    assert info["skipped"] == "decisive_gap"
+    assert info["candidate_k"] == 3
+
+
+def test_halfvec_storage_shortlists_on_half_precision_and_rescores(monkeypatch):
+    from sqlalchemy.dialects import postgresql
+
+    monkeypatch.setattr(retrieve.settings, "embedding_storage", "halfvec")
+    monkeypatch.setattr(retrieve.settings, "vector_rescore_factor", 4)
+    stmt = retrieve._nearest_chunks_select([0.1, 0.2], [0.1, 0.2], None, top_k=5)
+    compiled = stmt.compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+
+    assert "embeddings.vector_half <=>" in sql
+    assert "shortlist.vector <=>" in sql
+    assert sorted(v for v in compiled.params.values() if isinstance(v, int)) == [5, 20]
+    assert retrieve._search_params(retrieve._ann_limit(15)) == {"hnsw.ef_search": 60}
+
+
+def test_scoped_search_inlines_model_and_snapshot_for_partial_index():
+    from sqlalchemy.dialects import postgresql
+
+    from app.services.snapshots import RetrievalScope, scope_index_ddl
+
+    scope = RetrievalScope("text-embedding-3-large", "snap-2")
+    stmt = retrieve._nearest_chunks_select([0.1, 0.2], [0.1, 0.2], None, top_k=5, scope=scope)
+    sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"render_postcompile": True}))
+
+    assert "embeddings.model_name = 'text-embedding-3-large'" in sql
+    assert "embeddings.snapshot_id = 'snap-2'" in sql
+    assert "WHERE model_name = 'text-embedding-3-large' AND snapshot_id = 'snap-2'" in scope_index_ddl(scope)
+    assert scope.matches("text-embedding-3-large", "snap-2")
+    assert not scope.matches("text-embedding-3-small", "snap-2")
+
+
+def test_meta_filters_compile_to_indexable_jsonpath():
+    from sqlalchemy.dialects import postgresql
+
+    from app.rag.filters import meta_filter_path
+
+    path = meta_filter_path({"year": [2023, 2024], "sector": "SaaS"})
+    assert path == (
+        '$ ? (@."sector" == "SaaS" && '
+        '(@."year" == 2023 || @."year" == "2023" || @."year" == 2024 || @."year" == "2024"))'
+    )
+    assert meta_filter_path(None) is None
+    with pytest.raises(ValueError):
+        meta_filter_path({"sector') OR true": "x"})
+
+    sql = str(retrieve._meta_filter_clause(path).compile(dialect=postgresql.dialect()))
+    assert "chunks.meta @? " in sql
+
+
+@pytest.mark.asyncio
+async def test_mmr_compares_candidates_by_their_embeddings(monkeypatch):
+    from sqlalchemy.dialects import postgresql
+
+    monkeypatch.setattr(retrieve.settings, "mmr_enabled", True)
+    monkeypatch.setattr(retrieve.settings, "mmr_lambda", 0.5)
+    sql = str(retrieve._nearest_chunks_select([0.1, 0.2], [0.1, 0.2], None, top_k=5).compile(dialect=postgresql.dialect()))
+    assert "embeddings.vector AS vector" in sql
+
+    # Different wording, same meaning: only the embeddings show 1 and 2 are near-duplicates.
+    hits = [
+        retrieve.ChunkHit(chunk_id=1, score=0.9, text="EBITDA margin expanded", vector=[1.0, 0.0]),
+        retrieve.ChunkHit(chunk_id=2, score=0.85, text="profitability improved", vector=[0.99, 0.05]),
+        retrieve.ChunkHit(chunk_id=3, score=0.8, text="customer churn rose", vector=[0.0, 1.0]),
+    ]
+
+    chosen = await retrieve._diversify(None, hits, deal_id=None, top_k=2)
+
+    assert [hit.chunk_id for hit in chosen] == [1, 3]
+    assert "vector" not in hits[0] and "vector" not in hits[0].as_dict()
@@ -0,0 +1,110 @@
+import uuid
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import models
+from app.services import snapshots
+from app.services.foundry.pipeline import ingest_deal_payload
+from app.services.snapshots import SnapshotError, create_snapshot
+from app.settings import settings
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def session_maker():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", future=True)
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    maker = async_sessionmaker(engine, expire_on_commit=False)
+    try:
+        yield maker
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.anyio("asyncio")
+async def test_snapshot_ids_are_uuids(session_maker):
+    async with session_maker() as session:
+        with pytest.raises(SnapshotError):
+            await create_snapshot(session, "reembed-2025-10")
+        named = await create_snapshot(session, "6F9619FF-8B86-D011-B42D-00CF4FC964FF")
+        generated = await create_snapshot(session)
+
+    assert named.id == "6f9619ff-8b86-d011-b42d-00cf4fc964ff"
+    assert len(generated.id) == 36
+
+
+@pytest.mark.anyio("asyncio")
+async def test_unsnapshotted_embeddings_are_unique_per_chunk_and_model(session_maker):
+    vector = [0.0] * settings.embedding_dimensions
+    async with session_maker() as session:
+        session.add(models.Embedding(chunk_id=1, vector=vector, model_name="m", snapshot_id=None))
+        session.add(models.Embedding(chunk_id=1, vector=vector, model_name="m", snapshot_id=str(uuid.uuid4())))
+        await session.commit()
+
+        session.add(models.Embedding(chunk_id=1, vector=vector, model_name="m", snapshot_id=None))
+        with pytest.raises(IntegrityError):
+            await session.commit()
+
+
+def _payload(name: str, vector: list[float]) -> dict:
+    return {
+        "deal": {"name": name, "industry": "SaaS", "price": 10.0, "ebitda": 1.0},
+        "documents": [
+            {
+                "source_name": f"{name}.txt",
+                "chunks": [{"ord": 0, "text": f"{name} revenue grew 25%.", "embedding": vector}],
+            }
+        ],
+    }
+
+
+@pytest.mark.anyio("asyncio")
+async def test_deals_stay_searchable_across_snapshot_promotion(session_maker, monkeypatch):
+    dim = settings.embedding_dimensions
+    vector = [1.0] + [0.0] * (dim - 1)
+
+    async def fake_embed_texts(texts):
+        return [vector for _ in texts]
+
+    async def scoped_chunk_ids(session, deal_id):
+        scope = await snapshots.snapshot_registry.resolve(session)
+        rows = await session.execute(
+            select(models.Embedding.chunk_id)
+            .join(models.Chunk, models.Chunk.id == models.Embedding.chunk_id)
+            .join(models.Document, models.Document.id == models.Chunk.document_id)
+            .where(models.Document.deal_id == deal_id, scope.embedding_filter())
+        )
+        return rows.scalars().all()
+
+    monkeypatch.setattr(snapshots, "embed_texts", fake_embed_texts)
+    monkeypatch.setattr("app.services.foundry.pipeline.get_supabase_client", lambda: None)
+    monkeypatch.setattr(snapshots, "get_supabase_client", lambda: None)
+    snapshots.snapshot_registry.invalidate()
+    try:
+        async with session_maker() as session:
+            before = await ingest_deal_payload(session, _payload("Legacy", vector))
+            assert len(await scoped_chunk_ids(session, before["deal_id"])) == 1
+
+            snapshot = await create_snapshot(session)
+            with pytest.raises(snapshots.SnapshotIncomplete):
+                await snapshots.promote_snapshot(session, snapshot.id)
+            assert await snapshots.embed_snapshot(session, snapshot.id) == 1
+            assert await snapshots.embed_snapshot(session, snapshot.id) == 0
+            await snapshots.promote_snapshot(session, snapshot.id)
+
+            after = await ingest_deal_payload(session, _payload("Fresh", vector))
+
+            assert len(await scoped_chunk_ids(session, before["deal_id"])) == 1
+            assert len(await scoped_chunk_ids(session, after["deal_id"])) == 1
+            stamped = await session.scalar(select(models.Embedding.snapshot_id).order_by(models.Embedding.id.desc()))
+            assert stamped == snapshot.id
+    finally:
+        snapshots.snapshot_registry.invalidate()
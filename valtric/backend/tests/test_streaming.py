@@ -0,0 +1,52 @@
+import asyncio
+import json
+
+import httpx
+
+from app.services.consultant import _sse_payloads
+from app.services.streaming import EventStream, StreamError, emit
+
+
+def _frames(stream: EventStream, work, final_event: str) -> list[str]:
+    async def collect():
+        return [frame async for frame in stream.run(work, final_event=final_event)]
+
+    return asyncio.run(collect())
+
+
+def test_event_stream_yields_stage_events_then_the_result():
+    stream = EventStream()
+
+    async def work():
+        emit("retrieval", {"hits": 2})
+        stream.token("final", "EBITDA")
+        return {"summary": "ok"}
+
+    frames = _frames(stream, work, "analysis")
+
+    assert frames[0].startswith(":")
+    assert frames[1:] == [
+        'event: retrieval\ndata: {"hits": 2}\n\n',
+        'event: token\ndata: {"stage": "final", "text": "EBITDA"}\n\n',
+        'event: analysis\ndata: {"summary": "ok"}\n\n',
+    ]
+    emit("retrieval", {"hits": 0})  # outside a stream: ignored
+
+
+def test_event_stream_turns_failures_into_an_error_event():
+    async def work():
+        raise StreamError(409, "deal has no evidence")
+
+    frames = _frames(EventStream(), work, "analysis")
+
+    assert frames[-1] == 'event: error\ndata: {"status": 409, "detail": "deal has no evidence"}\n\n'
+
+
+def test_sse_payloads_parses_provider_stream():
+    body = 'data: {"type": "response.output_text.delta", "delta": "Hi"}\n\n: ping\n\ndata: [DONE]\n\n'
+    response = httpx.Response(200, content=body.encode())
+
+    async def collect():
+        return [payload async for payload in _sse_payloads(response)]
+
+    assert asyncio.run(collect()) == [json.loads(body.split("\n")[0][6:])]
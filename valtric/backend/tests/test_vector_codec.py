@@ -0,0 +1,26 @@
+import numpy as np
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.dialects.postgresql.asyncpg import PGDialect_asyncpg
+
+from app.integrations.supabase import vector_to_pg
+from app.integrations.vector_codec import HALFVEC, Vector
+
+
+def test_vector_to_pg_round_trips_float32_exactly():
+    values = np.random.default_rng(0).normal(size=64).astype(np.float32)
+
+    literal = vector_to_pg(values)
+    parsed = np.array([float(v) for v in literal[1:-1].split(",")], dtype=np.float32)
+
+    assert np.array_equal(parsed, values)
+    assert vector_to_pg([0.5, -1.0, 1e-05]) == "[0.5,-1,1e-05]"
+
+
+def test_vector_types_bind_float32_arrays_on_asyncpg_only():
+    asyncpg_bind = Vector(3).bind_processor(PGDialect_asyncpg())([0.1, 0.2, 0.3])
+    text_bind = Vector(3).bind_processor(sqlite.dialect())([0.5, 0.25, 1.0])
+
+    assert isinstance(asyncpg_bind, np.ndarray) and asyncpg_bind.dtype == np.float32
+    assert HALFVEC(3).bind_processor(PGDialect_asyncpg())([1, 2, 3]).tolist() == [1.0, 2.0, 3.0]
+    assert text_bind == "[0.5,0.25,1.0]"
+    assert isinstance(Vector(3).bind_processor(postgresql.dialect())([1, 2, 3]), str)
@@ -0,0 +1,131 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services import vector_index as vi
+
+
+def _random_vectors(n, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def test_search_matches_bruteforce_cosine():
+    vectors = _random_vectors(50)
+    index = vi.DealVectorIndex.from_vectors(list(range(100, 150)), vectors)
+    query = _random_vectors(1, seed=1)[0]
+
+    ids, scores = index.search(query, top_k=5)
+
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = np.argsort(-(normed @ (query / np.linalg.norm(query))))[:5] + 100
+    assert ids.tolist() == expected.tolist()
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_append_skips_existing_ids_and_extends_matrix():
+    vectors = _random_vectors(3)
+    index = vi.DealVectorIndex.from_vectors([1, 2, 3], vectors)
+
+    grown = index.append([3, 4], _random_vectors(2, seed=2))
+
+    assert len(index) == 3
+    assert grown.chunk_ids.tolist() == [1, 2, 3, 4]
+    assert grown.matrix.flags["C_CONTIGUOUS"]
+
+
+def test_registry_evicts_least_recently_used_under_memory_cap():
+    one = vi.DealVectorIndex.from_vectors([1, 2], _random_vectors(2))
+    registry = vi.VectorIndexRegistry(max_bytes=one.nbytes * 2)
+
+    registry._store("a", one)
+    registry._store("b", vi.DealVectorIndex.from_vectors([3, 4], _random_vectors(2)))
+    registry._indexes.move_to_end("a")
+    registry._store("c", vi.DealVectorIndex.from_vectors([5, 6], _random_vectors(2)))
+
+    assert set(registry._indexes) == {"a", "c"}
+    assert registry.stats()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_lookup_falls_back_while_building_and_merges_appends(monkeypatch):
+    registry = vi.VectorIndexRegistry(max_bytes=1 << 20)
+    release = asyncio.Event()
+
+    async def fake_build(deal_id):
+        await release.wait()
+        index = vi.DealVectorIndex.from_vectors([1], _random_vectors(1))
+        for chunk_ids, vectors in registry._pending_appends.pop(deal_id, []):
+            index = index.append(chunk_ids, vectors)
+        registry._building.pop(deal_id, None)
+        registry._store(deal_id, index)
+
+    monkeypatch.setattr(registry, "_build", fake_build)
+
+    assert registry.lookup(7) is None
+    build_task = registry._building[7]
+    registry.append(7, [2], _random_vectors(1, seed=3))
+    release.set()
+    await build_task
+
+    index = registry.lookup(7)
+    assert index is not None
+    assert index.chunk_ids.tolist() == [1, 2]
+
+
+def test_registry_drops_indexes_on_new_evidence_or_after_ttl(monkeypatch):
+    registry = vi.VectorIndexRegistry(max_bytes=1 << 20, ttl=60.0)
+    monkeypatch.setattr(registry, "schedule_build", lambda deal_id: None)
+    index = vi.DealVectorIndex.from_vectors([1, 2], _random_vectors(2))
+    assert registry.lookup(7) is None  # binds the registry to the active scope
+
+    registry._store(7, index, version=("m", "default", 2, 2))
+    registry.observe_version(7, ("m", "default", 2, 2))
+    assert registry.lookup(7) is index
+    # Another worker ingested a chunk for the deal.
+    registry.observe_version(7, ("m", "default", 3, 9))
+    assert registry.lookup(7) is None
+
+    registry._store(7, index, loaded_at=vi.time.monotonic() - 61.0)
+    assert registry.lookup(7) is None
+    assert registry.stats()["deals"] == 0
+
+
+@pytest.mark.asyncio
+async def test_build_does_not_cache_an_empty_index(monkeypatch):
+    registry = vi.VectorIndexRegistry(max_bytes=1 << 20)
+
+    class EmptySession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def execute(self, _stmt):
+            class Rows:
+                def all(self):
+                    return []
+
+            return Rows()
+
+    async def fake_version(_session, _deal_id):
+        return ("m", "default", 0, 0)
+
+    monkeypatch.setattr(vi, "SessionLocal", EmptySession)
+    monkeypatch.setattr(vi, "deal_evidence_version", fake_version)
+    registry._building[7] = None
+
+    await registry._build(7)
+
+    assert registry.peek(7) is None and not registry._building
+
+
+def test_rows_returns_normalised_vectors_in_requested_order():
+    index = vi.DealVectorIndex.from_vectors([10, 20, 30], [[3.0, 4.0], [1.0, 0.0], [0.0, 2.0]])
+
+    rows = index.rows([30, 10])
+
+    assert rows.tolist() == [[0.0, 1.0], [0.6000000238418579, 0.800000011920929]]
+    assert index.rows([10, 99]) is None
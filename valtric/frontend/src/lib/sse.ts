@@ -1 +1,79 @@
-// TODO: implement EventSource utilities.
+// Server-Sent Events over fetch. EventSource only issues GETs, while
+// /analyze/stream and /chat/stream take a JSON body, so frames are parsed here.
+
+export type SseEvent<T = unknown> = { event: string; data: T };
+
+export type StreamHandlers = {
+  onEvent?: (event: SseEvent) => void;
+  onToken?: (text: string, stage: string) => void;
+  signal?: AbortSignal;
+};
+
+export class StreamError extends Error {
+  constructor(public status: number, public detail: string) {
+    super(detail);
+  }
+}
+
+export async function* readEvents(response: Response): AsyncGenerator<SseEvent> {
+  if (!response.body) return;
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value.replace(/\r\n/g, "\n");
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const frame = parseFrame(buffer.slice(0, boundary));
+      buffer = buffer.slice(boundary + 2);
+      if (frame) yield frame;
+      boundary = buffer.indexOf("\n\n");
+    }
+  }
+}
+
+function parseFrame(raw: string): SseEvent | null {
+  let event = "message";
+  const data: string[] = [];
+  for (const line of raw.split("\n")) {
+    if (line.startsWith(":")) continue; // keep-alive comment
+    if (line.startsWith("event:")) event = line.slice(6).trim();
+    else if (line.startsWith("data:")) data.push(line.slice(5).trimStart());
+  }
+  if (!data.length) return null;
+  return { event, data: JSON.parse(data.join("\n")) };
+}
+
+// POST `body` to a streaming endpoint and resolve with the payload of its
+// terminal event (`analysis` for /analyze/stream, `message` for /chat/stream).
+export async function postEventStream<T>(
+  url: string,
+  body: unknown,
+  terminalEvent: string,
+  handlers: StreamHandlers = {},
+): Promise<T> {
+  const response = await fetch(url, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
+    body: JSON.stringify(body),
+    signal: handlers.signal,
+  });
+  if (!response.ok) {
+    const detail = await response.text();
+    throw new StreamError(response.status, detail);
+  }
+  for await (const frame of readEvents(response)) {
+    handlers.onEvent?.(frame);
+    if (frame.event === "token") {
+      const { text, stage } = frame.data as { text: string; stage: string };
+      handlers.onToken?.(text, stage);
+    } else if (frame.event === "error") {
+      const { status, detail } = frame.data as { status: number; detail: string };
+      throw new StreamError(status, detail);
+    } else if (frame.event === terminalEvent) {
+      return frame.data as T;
+    }
+  }
+  throw new StreamError(0, "stream ended without a result");
+}